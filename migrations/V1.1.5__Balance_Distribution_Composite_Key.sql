@@ -0,0 +1,10 @@
+-- V1.1.5__Balance_Distribution_Composite_Key.sql
+-- Key COINDESK.BLOCKCHAIN_BALANCEDISTRIBUTION on (TIME, FROM, TO) instead of the
+-- MERGE_KEY string that was built from the same three columns
+
+-- 1. Composite primary key (informational; fetch_coindesk.py MERGEs on these columns)
+ALTER TABLE COINDESK.BLOCKCHAIN_BALANCEDISTRIBUTION DROP PRIMARY KEY;
+ALTER TABLE COINDESK.BLOCKCHAIN_BALANCEDISTRIBUTION ADD PRIMARY KEY (TIME, "FROM", "TO");
+
+-- 2. Drop the redundant string key
+ALTER TABLE COINDESK.BLOCKCHAIN_BALANCEDISTRIBUTION DROP COLUMN MERGE_KEY;
@@ -0,0 +1,175 @@
+#!/usr/bin/env python3
+"""
+CryptoCompare Historical Backfill
+This script:
+1. Splits a date range into toTs-anchored windows of up to 2000 points
+2. Fetches the windows concurrently under the shared CryptoCompare rate limiter
+3. Dedups on TIME and loads each endpoint with one COPY/MERGE (same path as fetch_coindesk.py)
+4. Checkpoints finished windows so an interrupted run resumes where it stopped
+
+Usage:
+    python scripts/backfill_coindesk.py histohour --start 2018-01-01
+    python scripts/backfill_coindesk.py histoday hourly_social_data --start 2015-01-01 --workers 8 --rate 10
+"""
+
+import argparse
+import gzip
+import json
+import os
+import shutil
+import time
+from datetime import datetime, timezone
+from functools import partial
+
+from fetch_coindesk import (
+    CONFIG_FILE, OUTPUT_DIR, STATE_FILE, MAX_LIMIT, HISTO_INTERVALS,
+    load_config, get_api_key, get_snowflake_conn, make_client, build_url,
+    save_dataset, payload_rows, key_columns, logger
+)
+from utils.coindesk_endpoints import get_endpoint
+from utils.snowflake_session import SnowflakeSession
+from utils.state import StateStore
+
+CHECKPOINT_DIR = os.path.join(OUTPUT_DIR, '_backfill')
+CHECKPOINT_FILE = os.path.join(CHECKPOINT_DIR, 'checkpoint.json')
+
+
+def parse_day(value):
+    return int(datetime.strptime(value, '%Y-%m-%d').replace(tzinfo=timezone.utc).timestamp())
+
+
+def plan_windows(start_ts, end_ts, interval):
+    """
+    Returns [(to_ts, limit), ...] covering [start_ts, end_ts] newest first.
+    A request with limit=n returns the n+1 points ending at to_ts.
+    The API rejects limit=0, so a lone trailing point is fetched with limit=1
+    (one extra point before start_ts, dropped again by the TIME dedup).
+    """
+    windows = []
+    to_ts = end_ts // interval * interval
+    while to_ts >= start_ts:
+        limit = max(1, min(MAX_LIMIT, (to_ts - start_ts) // interval))
+        windows.append((to_ts, limit))
+        to_ts -= (limit + 1) * interval
+    return windows
+
+
+def window_path(key, to_ts):
+    return os.path.join(CHECKPOINT_DIR, key, f'{to_ts}.json.gz')
+
+
+def fetch_window(client, checkpoint, key, url, to_ts, limit):
+    """Fetches one window, stores its rows and marks it done in the checkpoint."""
+    payload = client.get_json(url.replace('{LIMIT}', str(limit)) + f"&toTs={to_ts}")
+    if isinstance(payload, dict) and payload.get('Response') == 'Error':
+        raise RuntimeError(payload.get('Message', 'CryptoCompare returned an error'))
+    rows = payload_rows(payload) or []
+
+    path = window_path(key, to_ts)
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    with gzip.open(path, 'wt') as f:
+        json.dump(rows, f)
+
+    checkpoint.add_to_set(key, 'done', to_ts)
+    checkpoint.save()
+    return len(rows)
+
+
+def load_windows(key, windows):
+    """Returns the stored rows of each window, oldest first."""
+    pages = []
+    for to_ts, _ in sorted(windows):
+        with gzip.open(window_path(key, to_ts), 'rt') as f:
+            pages.append(json.load(f))
+    return pages
+
+
+def backfill_endpoint(client, checkpoint, key, url, start_ts, end_ts, workers):
+    """
+    Fetches every missing window of one endpoint.
+    Returns the rows of every window, or None if some windows are still missing.
+    """
+    interval = HISTO_INTERVALS[key]
+    windows = plan_windows(start_ts, end_ts, interval)
+    done = set(checkpoint.get(key, 'done', []))
+    pending = [(to_ts, limit) for to_ts, limit in windows if to_ts not in done]
+    logger.info(f"[{key}] {len(windows)} windows ({len(windows) - len(pending)} already checkpointed)")
+
+    tasks = {
+        to_ts: partial(fetch_window, client, checkpoint, key, url, to_ts, limit)
+        for to_ts, limit in pending
+    }
+    started = time.monotonic()
+    results = client.gather(tasks, max_workers=workers)
+    fetched = sum(results.values())
+    logger.info(f"[{key}] Fetched {len(results)}/{len(pending)} windows ({fetched} rows) in {time.monotonic() - started:.1f}s")
+
+    if len(results) < len(pending):
+        logger.error(f"[{key}] {len(pending) - len(results)} windows failed. Re-run to resume from the checkpoint.")
+        return None
+    return load_windows(key, windows)
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Backfill CryptoCompare histo endpoints into Snowflake and data/coindesk/")
+    parser.add_argument('endpoints', nargs='+', choices=sorted(HISTO_INTERVALS), help="Config keys to backfill")
+    parser.add_argument('--start', required=True, help="First day to cover (YYYY-MM-DD, UTC)")
+    parser.add_argument('--end', help="Last day to cover (YYYY-MM-DD, UTC). Defaults to now, or the checkpointed end when resuming")
+    parser.add_argument('--workers', type=int, default=4, help="Concurrent window requests")
+    parser.add_argument('--rate', type=float, default=5.0, help="Max requests per second (minute/hour quotas come from the environment)")
+    parser.add_argument('--fetch-only', action='store_true', help="Only fetch and checkpoint windows, skip loading")
+    args = parser.parse_args()
+
+    config = load_config(CONFIG_FILE)
+    api_key = get_api_key()
+    start_ts = parse_day(args.start)
+    checkpoint = StateStore(CHECKPOINT_FILE)
+    state = StateStore(STATE_FILE)
+
+    with make_client(max_per_host=args.workers, per_second=args.rate) as client, SnowflakeSession(get_snowflake_conn) as session:
+        for key in args.endpoints:
+            url = build_url(key, config.get(key, ''), api_key)
+            if not url or '{LIMIT}' not in url:
+                logger.warning(f"Skipping {key}: no usable {{LIMIT}} URL in config.yml")
+                continue
+
+            # Resume with the same window grid as the interrupted run
+            if args.end:
+                end_ts = parse_day(args.end) + 86399
+            else:
+                end_ts = checkpoint.get(key, 'end') or int(datetime.now(timezone.utc).timestamp())
+            if checkpoint.get(key, 'start') != start_ts or checkpoint.get(key, 'end') != end_ts:
+                shutil.rmtree(os.path.join(CHECKPOINT_DIR, key), ignore_errors=True)
+                checkpoint.update(key, start=start_ts, end=end_ts, done=[])
+                checkpoint.save()
+
+            pages = backfill_endpoint(client, checkpoint, key, url, start_ts, end_ts, args.workers)
+            if pages is None or args.fetch_only:
+                continue
+
+            # All windows parsed as one batch
+            endpoint = get_endpoint(key)
+            df = endpoint.parse_many({'Data': {'Data': rows}} for rows in pages)
+            unique_key = endpoint.key_for(df)
+            if df is None or df.empty:
+                logger.warning(f"[{key}] No rows to load.")
+                continue
+
+            key_cols = [c for k in key_columns(unique_key) for c in df.columns if c.upper() == k]
+            if key_cols:
+                df = df.drop_duplicates(subset=key_cols, keep='last').sort_values(key_cols).reset_index(drop=True)
+            logger.info(f"[{key}] Loading {len(df)} unique rows...")
+            if not save_dataset(key, df, unique_key, session, state):
+                logger.error(f"[{key}] Load failed. Windows stay checkpointed; re-run to retry the load.")
+                continue
+
+            # Finished: drop the window files and the checkpoint entry
+            shutil.rmtree(os.path.join(CHECKPOINT_DIR, key), ignore_errors=True)
+            checkpoint.update(key, start=None, end=None, done=[])
+            checkpoint.save()
+
+    state.save()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,360 @@
+#!/usr/bin/env python3
+"""
+NewHedge Offline Replay Benchmark
+This script:
+1. Replays stored NewHedge HTML snapshots through every available parser backend
+2. Times each stage of the fetch_newhedge.py path (parse, selectors, tables, clean, write)
+   plus the cost of every individual selector
+3. Measures Python allocations and peak memory per stage with tracemalloc
+4. Fails if a backend's output differs from the BeautifulSoup reference
+5. Optionally writes the results as JSON and compares them against a baseline run
+6. With --workers, measures parse throughput (pages/s) of the process-pool parsing stage against one process
+
+By default the committed fixtures (tests/fixtures/newhedge_*.html.gz, also
+checked by tests/test_parsers.py) are replayed together with the snapshots
+saved by fetch_newhedge.py when NEWHEDGE_SAVE_SNAPSHOTS=true
+(data/newhedge/_snapshots/*.html.gz); any .html/.html.gz file works.
+
+Usage:
+    python scripts/benchmark_newhedge.py
+    python scripts/benchmark_newhedge.py saved_pages/ --repeat 5 --json bench.json
+    python scripts/benchmark_newhedge.py --baseline bench.json --tolerance 0.25
+    python scripts/benchmark_newhedge.py --workers 8 --batch 64
+"""
+
+import argparse
+import contextlib
+import gzip
+import hashlib
+import io
+import json
+import os
+import platform
+import sys
+import tempfile
+import time
+import tracemalloc
+from datetime import datetime, timezone
+
+try:
+    import resource
+except ImportError:  # Windows
+    resource = None
+
+from fetch_newhedge import (
+    SNAPSHOT_DIR, extract_raw_data, extract_tables, extract_pages, build_tables, save_tables
+)
+from utils.extractor import INDEX_TIMING_KEY
+from utils.parsers import BACKENDS, parse_html
+
+REFERENCE_BACKEND = 'bs4'
+FIXTURE_DIR = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), 'tests', 'fixtures')
+PAGE_SUFFIXES = ('.html', '.htm', '.html.gz')
+STAGES = ('parse', 'selectors', 'tables', 'clean', 'write')
+
+# Differences below these are treated as noise when comparing with a baseline
+MIN_SECONDS_DELTA = 0.005
+MIN_SELECTOR_DELTA = 0.002
+MIN_BYTES_DELTA = 256 * 1024
+
+
+def load_pages(paths):
+    """Returns [(name, html)] for the given files and directories."""
+    files = []
+    for path in paths:
+        if os.path.isdir(path):
+            files.extend(
+                os.path.join(path, name) for name in sorted(os.listdir(path))
+                if name.endswith(PAGE_SUFFIXES)
+            )
+        elif os.path.exists(path):
+            files.append(path)
+
+    pages = []
+    for path in files:
+        opener = gzip.open if path.endswith('.gz') else open
+        with opener(path, 'rt', encoding='utf-8') as f:
+            pages.append((os.path.basename(path), f.read()))
+    return pages
+
+
+def run_pipeline(html, backend, output_dir, selector_timings=None, probe=None):
+    """
+    Runs one snapshot through every stage.
+    probe(stage, fn) wraps each stage call and returns its result.
+    Returns (raw_data, scraped_tables).
+    """
+    timestamp = datetime(2000, 1, 1, tzinfo=timezone.utc)
+    doc = probe('parse', lambda: parse_html(html, backend))
+    raw_data = probe('selectors', lambda: extract_raw_data(doc, selector_timings))
+    scraped_tables = probe('tables', lambda: extract_tables(doc))
+    tables = probe('clean', lambda: build_tables(raw_data, timestamp))
+    # save_tables stamps the scraped rows, so write a copy
+    rows = {name: [dict(row) for row in data] for name, data in scraped_tables.items()}
+    with contextlib.redirect_stdout(io.StringIO()):
+        probe('write', lambda: save_tables(tables, rows, raw_data, timestamp, output_dir))
+    return raw_data, scraped_tables
+
+
+def time_page(html, backend, repeat):
+    """Returns ({stage: best seconds}, {selector: best seconds}, result)."""
+    stage_times = {stage: [] for stage in STAGES}
+    selector_times = {}
+    result = None
+
+    for _ in range(repeat):
+        def probe(stage, fn):
+            started = time.perf_counter()
+            value = fn()
+            stage_times[stage].append(time.perf_counter() - started)
+            return value
+
+        timings = {}
+        with tempfile.TemporaryDirectory() as output_dir:
+            result = run_pipeline(html, backend, output_dir, timings, probe)
+        for key, seconds in timings.items():
+            selector_times[key] = min(seconds, selector_times.get(key, seconds))
+
+    return {stage: min(times) for stage, times in stage_times.items()}, selector_times, result
+
+
+def measure_memory(html, backend):
+    """
+    Returns {stage: {'allocated_bytes', 'peak_bytes', 'blocks'}} from one traced run.
+    tracemalloc only sees Python allocations; libxml2 memory shows up in max RSS.
+    """
+    memory = {}
+
+    def probe(stage, fn):
+        start_current, _ = tracemalloc.get_traced_memory()
+        start_blocks = sys.getallocatedblocks()
+        tracemalloc.reset_peak()
+        value = fn()
+        current, peak = tracemalloc.get_traced_memory()
+        memory[stage] = {
+            'allocated_bytes': max(0, current - start_current),
+            'peak_bytes': max(0, peak - start_current),
+            'blocks': max(0, sys.getallocatedblocks() - start_blocks),
+        }
+        return value
+
+    tracemalloc.start()
+    try:
+        with tempfile.TemporaryDirectory() as output_dir:
+            run_pipeline(html, backend, output_dir, probe=probe)
+    finally:
+        tracemalloc.stop()
+    return memory
+
+
+def digest(result):
+    """Stable hash of a (raw_data, scraped_tables) result."""
+    return hashlib.sha256(json.dumps(result, sort_keys=True, default=str).encode()).hexdigest()[:16]
+
+
+def diff_results(reference, result):
+    """Returns human-readable differences between two pipeline results."""
+    differences = []
+    for part, expected, actual in zip(('raw_data', 'tables'), reference, result):
+        for key in sorted(set(expected) | set(actual)):
+            if expected.get(key) != actual.get(key):
+                differences.append(f"{part}[{key}]: {expected.get(key)!r} != {actual.get(key)!r}")
+    return differences
+
+
+def run_benchmark(pages, backends, repeat, trace_memory=True):
+    results = {
+        'created_at': datetime.now(timezone.utc).isoformat(),
+        'python': platform.python_version(),
+        'pages': [name for name, _ in pages],
+        'repeat': repeat,
+        'backends': {},
+        'outputs': {},
+        'mismatches': [],
+    }
+    references = {}
+
+    for backend in backends:
+        stages = {stage: {'seconds': 0.0, 'allocated_bytes': 0, 'peak_bytes': 0, 'blocks': 0} for stage in STAGES}
+        selectors = {}
+
+        for name, html in pages:
+            stage_times, selector_times, result = time_page(html, backend, repeat)
+            for stage, seconds in stage_times.items():
+                stages[stage]['seconds'] += seconds
+            for key, seconds in selector_times.items():
+                selectors[key] = selectors.get(key, 0.0) + seconds
+
+            if trace_memory:
+                for stage, memory in measure_memory(html, backend).items():
+                    stages[stage]['allocated_bytes'] = max(stages[stage]['allocated_bytes'], memory['allocated_bytes'])
+                    stages[stage]['peak_bytes'] = max(stages[stage]['peak_bytes'], memory['peak_bytes'])
+                    stages[stage]['blocks'] = max(stages[stage]['blocks'], memory['blocks'])
+
+            if backend == REFERENCE_BACKEND:
+                references[name] = result
+                results['outputs'][name] = digest(result)
+            elif name in references:
+                for line in diff_results(references[name], result):
+                    results['mismatches'].append(f"{name} ({backend}): {line}")
+
+        results['backends'][backend] = {
+            'total_seconds': sum(stage['seconds'] for stage in stages.values()),
+            'stages': stages,
+            'selectors': selectors,
+        }
+
+    if resource is not None:
+        results['max_rss_kb'] = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    return results
+
+
+def measure_throughput(pages, backend, workers, batch, chunk_size):
+    """
+    Parses batch documents (the snapshots repeated) through extract_pages in
+    one process and in `workers` processes. Returns pages/s of both, the
+    speedup and whether both produced the same results.
+    """
+    documents = [pages[i % len(pages)][1] for i in range(max(batch, len(pages)))]
+    rates, outputs = {}, {}
+    for count in sorted({1, workers}):
+        started = time.perf_counter()
+        outputs[count] = list(extract_pages(documents, workers=count, chunk_size=chunk_size, backend=backend))
+        rates[count] = len(documents) / (time.perf_counter() - started)
+    return {
+        'documents': len(documents),
+        'workers': workers,
+        'serial_pages_per_s': rates[1],
+        'parallel_pages_per_s': rates[workers],
+        'speedup': rates[workers] / rates[1],
+        'identical': outputs[workers] == outputs[1],
+    }
+
+
+def compare_to_baseline(results, baseline, tolerance):
+    """Returns a list of regressions of results against a baseline run."""
+    regressions = []
+    if sorted(baseline.get('pages', [])) != sorted(results['pages']):
+        print("\nBaseline was recorded on a different set of snapshots; only comparing extracted data.")
+        results = dict(results, backends={})
+
+    def slower(current, previous, min_delta):
+        return current > previous * (1 + tolerance) and current - previous > min_delta
+
+    for backend, current in results['backends'].items():
+        previous = baseline.get('backends', {}).get(backend)
+        if not previous:
+            continue
+        for stage, stats in current['stages'].items():
+            before = previous['stages'].get(stage)
+            if not before:
+                continue
+            if slower(stats['seconds'], before['seconds'], MIN_SECONDS_DELTA):
+                regressions.append(f"{backend}/{stage}: {before['seconds']:.4f}s -> {stats['seconds']:.4f}s")
+            if slower(stats['peak_bytes'], before['peak_bytes'], MIN_BYTES_DELTA):
+                regressions.append(f"{backend}/{stage}: peak {before['peak_bytes']:,} -> {stats['peak_bytes']:,} bytes")
+        for key, seconds in current['selectors'].items():
+            before = previous['selectors'].get(key)
+            if before is not None and slower(seconds, before, MIN_SELECTOR_DELTA):
+                regressions.append(f"{backend}/selector {key}: {before * 1000:.2f}ms -> {seconds * 1000:.2f}ms")
+
+    for name, output in results['outputs'].items():
+        before = baseline.get('outputs', {}).get(name)
+        if before and before != output:
+            regressions.append(f"{name}: extracted data changed since the baseline")
+    return regressions
+
+
+def print_report(results, top):
+    backends = list(results['backends'])
+    print(f"\n{len(results['pages'])} snapshots, best of {results['repeat']} runs")
+    print(f"{'stage':<10}" + ''.join(f"{b + ' (s)':>14}{b + ' peak':>14}" for b in backends))
+    for stage in STAGES:
+        row = f"{stage:<10}"
+        for backend in backends:
+            stats = results['backends'][backend]['stages'][stage]
+            row += f"{stats['seconds']:>14.4f}{stats['peak_bytes'] / 1024 / 1024:>12.1f}MB"
+        print(row)
+    print(f"{'total':<10}" + ''.join(f"{results['backends'][b]['total_seconds']:>14.4f}{'':>14}" for b in backends))
+
+    for backend in backends:
+        selectors = results['backends'][backend]['selectors']
+        slowest = sorted(selectors.items(), key=lambda item: item[1], reverse=True)[:top]
+        print(f"\nSlowest selectors ({backend}):")
+        for key, seconds in slowest:
+            label = 'label/id index build' if key == INDEX_TIMING_KEY else key
+            print(f"  {label:<32} {seconds * 1000:>8.2f}ms")
+
+    for backend, stats in results.get('throughput', {}).items():
+        print(f"\nParse throughput ({backend}, {stats['documents']} pages): "
+              f"1 process {stats['serial_pages_per_s']:.1f} pages/s, "
+              f"{stats['workers']} processes {stats['parallel_pages_per_s']:.1f} pages/s ({stats['speedup']:.2f}x)")
+
+    if 'max_rss_kb' in results:
+        print(f"\nMax RSS: {results['max_rss_kb'] / 1024:.1f}MB")
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Replay stored NewHedge snapshots through the extraction pipeline")
+    parser.add_argument('paths', nargs='*', default=[FIXTURE_DIR, SNAPSHOT_DIR],
+                        help="Snapshot files or directories (default: tests/fixtures and data/newhedge/_snapshots)")
+    parser.add_argument('--backend', action='append', choices=sorted(BACKENDS), help="Backend(s) to run (default: all available)")
+    parser.add_argument('--repeat', type=int, default=3, help="Timed runs per snapshot and backend (best time is kept)")
+    parser.add_argument('--top', type=int, default=10, help="Number of slowest selectors to list")
+    parser.add_argument('--no-memory', action='store_true', help="Skip the tracemalloc pass")
+    parser.add_argument('--json', help="Write machine-readable results to this file")
+    parser.add_argument('--baseline', help="Results JSON of a previous run to compare against")
+    parser.add_argument('--tolerance', type=float, default=0.25, help="Allowed relative slowdown before a stage counts as a regression")
+    parser.add_argument('--workers', type=int, default=0, help="Also measure process-pool parse throughput with this many processes")
+    parser.add_argument('--batch', type=int, default=32, help="Pages parsed per throughput measurement (snapshots are repeated)")
+    parser.add_argument('--chunk-size', type=int, default=4, help="Pages per process-pool task")
+    args = parser.parse_args()
+
+    pages = load_pages(args.paths)
+    if not pages:
+        print("No snapshots found. Run fetch_newhedge.py with NEWHEDGE_SAVE_SNAPSHOTS=true or pass saved pages.")
+        return 1
+
+    # The reference backend always runs so other backends can be checked against it
+    selected = args.backend or sorted(BACKENDS)
+    backends = [REFERENCE_BACKEND] + [b for b in selected if b != REFERENCE_BACKEND]
+    results = run_benchmark(pages, backends, args.repeat, trace_memory=not args.no_memory)
+    if args.workers > 1:
+        results['throughput'] = {
+            backend: measure_throughput(pages, backend, args.workers, args.batch, args.chunk_size)
+            for backend in backends
+        }
+        for backend, stats in results['throughput'].items():
+            if not stats['identical']:
+                results['mismatches'].append(f"{backend}: process-pool results differ from in-process parsing")
+    print_report(results, args.top)
+
+    failed = False
+    if results['mismatches']:
+        failed = True
+        print(f"\n{len(results['mismatches'])} differences from {REFERENCE_BACKEND}:")
+        for line in results['mismatches']:
+            print(f"  {line}")
+
+    if args.baseline:
+        with open(args.baseline, 'r') as f:
+            baseline = json.load(f)
+        regressions = compare_to_baseline(results, baseline, args.tolerance)
+        if regressions:
+            failed = True
+            print(f"\n{len(regressions)} regressions against {args.baseline}:")
+            for line in regressions:
+                print(f"  {line}")
+        else:
+            print(f"\nNo regressions against {args.baseline}.")
+
+    if args.json:
+        with open(args.json, 'w') as f:
+            json.dump(results, f, indent=2)
+        print(f"\nResults written to {args.json}")
+
+    return 1 if failed else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -1,13 +1,18 @@
 import os
-import requests
+import hashlib
 import pandas as pd
 import yaml
-import snowflake.connector
-from snowflake.connector.pandas_tools import write_pandas
 from datetime import datetime, timezone
+from functools import partial
 import uuid
 from dotenv import load_dotenv
 import logging
+from utils.coindesk_endpoints import ENDPOINTS, endpoints, get_endpoint, payload_rows
+from utils.http_client import HttpClient, RateLimiter, DEFAULT_MAX_PER_HOST
+from utils.snowflake_session import SnowflakeSession
+from utils.state import StateStore
+from utils.storage import HAS_PYARROW, save_local, load_local, copy_frame_into
+from utils.warehouse import connect, write_pandas
 
 # Load environment variables for local development
 load_dotenv()
@@ -23,6 +28,38 @@ logger = logging.getLogger(__name__)
 CONFIG_FILE = os.path.join(os.path.dirname(__file__), 'config.yml')
 OUTPUT_DIR = os.path.join(os.path.dirname(os.path.dirname(__file__)), 'data', 'coindesk')
 
+# Fetch concurrency (0 = one worker per endpoint)
+MAX_WORKERS = int(os.getenv('COINDESK_MAX_WORKERS', '0')) or None
+MAX_PER_HOST = int(os.getenv('COINDESK_MAX_PER_HOST', str(DEFAULT_MAX_PER_HOST)))
+
+# CryptoCompare quotas enforced client-side (0 disables a window)
+RATE_LIMIT_SECOND = float(os.getenv('CRYPTOCOMPARE_RATE_SECOND', '20'))
+RATE_LIMIT_MINUTE = float(os.getenv('CRYPTOCOMPARE_RATE_MINUTE', '300'))
+RATE_LIMIT_HOUR = float(os.getenv('CRYPTOCOMPARE_RATE_HOUR', '3000'))
+
+# CSV export: 'incremental' pulls only rows past the local high-water mark, 'full' re-downloads everything
+EXPORT_MODE = os.getenv('COINDESK_EXPORT_MODE', 'incremental').lower()
+WATERMARK_COLUMNS = ['TIMESTAMP', 'TIME', 'FETCHED_AT']
+
+# Watermark-driven fetch limits for the histo endpoints ({LIMIT} in config.yml)
+STATE_FILE = os.path.join(OUTPUT_DIR, '_state.json')
+# Last check of each unchanged snapshot endpoint. Kept out of git (and out of _state.json)
+# so that a cycle where nothing changed leaves the tree clean
+HEARTBEAT_FILE = os.path.join(OUTPUT_DIR, '_heartbeat.json')
+MAX_LIMIT = 2000
+FETCH_OVERLAP = int(os.getenv('COINDESK_FETCH_OVERLAP', '3'))
+HISTO_INTERVALS = {key: endpoint.interval for key, endpoint in ENDPOINTS.items() if endpoint.interval}
+
+# Columns ignored when fingerprinting snapshot payloads (fetch metadata)
+FINGERPRINT_EXCLUDE = {'FETCHED_AT'}
+
+def key_columns(unique_key) -> list:
+    """Upper-cased key columns of a unique key (one column name or a tuple of them)."""
+    if not unique_key:
+        return []
+    keys = (unique_key,) if isinstance(unique_key, str) else unique_key
+    return [k.upper() for k in keys]
+
 def load_config(path: str) -> dict:
     if not os.path.exists(path):
         logger.error(f"Config file not found at {path}")
@@ -37,54 +74,16 @@ def get_api_key():
 
 def get_snowflake_conn():
     try:
-        conn = snowflake.connector.connect(
-            user=os.getenv('SNOWFLAKE_USER'),
-            password=os.getenv('SNOWFLAKE_PASSWORD'),
-            account=os.getenv('SNOWFLAKE_ACCOUNT'),
-            warehouse=os.getenv('SNOWFLAKE_WAREHOUSE'),
-            database=os.getenv('SNOWFLAKE_DATABASE'),
-            schema=os.getenv('SNOWFLAKE_SCHEMA')
-        )
+        conn = connect(schema=os.getenv('SNOWFLAKE_SCHEMA'))
         return conn
     except Exception as e:
         logger.error(f"Could not connect to Snowflake: {e}")
         return None
 
-def check_table_status(conn, schema_name, table_name):
-    """
-    Returns (exists, row_count)
-    """
-    try:
-        cursor = conn.cursor()
-        # Check if table exists
-        cursor.execute(f"SHOW TABLES LIKE '{table_name.upper()}' IN SCHEMA {schema_name}")
-        if cursor.fetchone():
-            # Get count
-            cursor.execute(f"SELECT COUNT(*) FROM {schema_name}.{table_name}")
-            result = cursor.fetchone()
-            count = result[0] if result else 0
-            return True, count
-        return False, 0
-    except Exception as e:
-        logger.error(f"Error checking table status for {table_name}: {e}")
-        return False, 0
-
-def get_table_columns(conn, schema_name, table_name):
-    """
-    Returns a list of uppercase column names for the table.
-    """
-    try:
-        cursor = conn.cursor()
-        cursor.execute(f"DESCRIBE TABLE {schema_name}.{table_name}")
-        columns = [row[0].upper() for row in cursor.fetchall()]
-        return columns
-    except Exception as e:
-        logger.error(f"Error fetching columns for {table_name}: {e}")
-        return []
-
 def perform_merge(conn, df, schema_name, table_name, unique_key):
     """
     Performs a MERGE operation into the target table using a temporary staging table.
+    unique_key is one column or a tuple of columns (composite key).
     """
     # Create a temporary staging table name
     stage_table = f"{table_name}_STAGE_{uuid.uuid4().hex[:8]}".upper()
@@ -110,19 +109,21 @@ def perform_merge(conn, df, schema_name, table_name, unique_key):
         columns = [c for c in df.columns]
         
         # Ensure unique_key is in columns
-        if unique_key not in columns:
+        keys = key_columns(unique_key)
+        if not all(k in columns for k in keys):
             logger.error(f"Error: Unique key {unique_key} not in dataframe columns: {columns}")
             return
 
         # Quote column names to handle reserved keywords like TO, FROM
-        update_clause = ", ".join([f't."{col}" = s."{col}"' for col in columns if col != unique_key])
+        on_clause = " AND ".join([f't."{k}" = s."{k}"' for k in keys])
+        update_clause = ", ".join([f't."{col}" = s."{col}"' for col in columns if col not in keys])
         insert_cols = ", ".join([f'"{col}"' for col in columns])
         insert_vals = ", ".join([f's."{col}"' for col in columns])
 
         merge_sql = f"""
         MERGE INTO {schema_name}.{table_name} t
         USING PUBLIC.{stage_table} s
-        ON t."{unique_key}" = s."{unique_key}"
+        ON {on_clause}
         WHEN MATCHED THEN
             UPDATE SET {update_clause}
         WHEN NOT MATCHED THEN
@@ -144,29 +145,154 @@ def perform_merge(conn, df, schema_name, table_name, unique_key):
         except:
             pass
 
-def upload_and_fetch_from_snowflake(df, schema_name, table_name, unique_key=None):
+def _watermark_values(series):
+    """Returns the column as comparable values (numbers as-is, timestamps parsed to UTC)."""
+    if pd.api.types.is_numeric_dtype(series):
+        return series
+    return pd.to_datetime(series, utc=True, errors='coerce')
+
+def _bind_value(value):
+    """A watermark value as a query parameter (and JSON state value)."""
+    if isinstance(value, pd.Timestamp):
+        return value.isoformat()
+    return value.item() if hasattr(value, 'item') else value
+
+def watermark_column(table_cols):
+    return next((c for c in WATERMARK_COLUMNS if c in (table_cols or [])), None)
+
+def export_boundary(marks):
+    """
+    The mark the next incremental export pulls from: FETCH_OVERLAP distinct
+    marks before the newest one, so recent points the API may still revise
+    are always re-read.
+    """
+    distinct = marks.drop_duplicates().sort_values()
+    return distinct.iloc[max(0, len(distinct) - 1 - FETCH_OVERLAP)]
+
+def remote_hash(conn, schema_name, table_name, watermark_col, bind_value):
+    """HASH_AGG content hash of the distinct warehouse rows strictly below the mark."""
+    cursor = conn.cursor()
+    try:
+        cursor.execute(
+            f'SELECT HASH_AGG(*) FROM (SELECT DISTINCT * FROM {schema_name}.{table_name} WHERE "{watermark_col}" < %s)',
+            (bind_value,)
+        )
+        return int(cursor.fetchone()[0] or 0)
+    finally:
+        cursor.close()
+
+def record_export(conn, schema_name, table_name, watermark_col, df, state, state_key):
+    """
+    Stores the boundary of an exported dataset with the warehouse content hash
+    and the local row count below it, which the next incremental export checks.
+    """
+    if EXPORT_MODE != 'incremental' or state is None or not watermark_col or df.empty:
+        return
+    marks = _watermark_values(df[watermark_col])
+    if marks.isna().any():
+        return
+    boundary = export_boundary(marks)
+    bind_value = _bind_value(boundary)
+    state.update(state_key, export_column=watermark_col, export_mark=bind_value,
+                 export_hash=remote_hash(conn, schema_name, table_name, watermark_col, bind_value),
+                 export_rows=int((marks < boundary).sum()))
+
+def export_incremental(conn, schema_name, table_name, table_cols, local_path, state, state_key):
+    """
+    Rebuilds the full dataset from the local copy plus the rows from the
+    boundary stored by the last export on (see record_export), so only new,
+    re-merged and recent rows leave the warehouse.
+    Returns None when a full resync is needed (no local file, schema drift,
+    no watermark column or stored boundary, or the rows below the boundary
+    changed: warehouse content hash or local row count differ).
+    """
+    watermark_col = watermark_column(table_cols)
+    stored = state.get(state_key) if state is not None else {}
+    if not watermark_col or stored.get('export_column') != watermark_col or stored.get('export_hash') is None:
+        return None
+
+    local_df = load_local(local_path, 'coindesk')
+    if local_df is None or local_df.empty or local_df.columns.tolist() != table_cols:
+        logger.info(f"Local {os.path.basename(local_path)} does not match {table_name} columns. Full resync.")
+        return None
+
+    marks = _watermark_values(local_df[watermark_col])
+    if marks.isna().any():
+        return None
+    bind_value = stored['export_mark']
+    boundary = _watermark_values(pd.Series([bind_value])).iloc[0]
+
+    kept = local_df[(marks < boundary).to_numpy()]
+    if len(kept) != stored.get('export_rows'):
+        logger.warning(
+            f"Local {os.path.basename(local_path)} has {len(kept)} rows below {watermark_col}={bind_value}, "
+            f"the last export wrote {stored.get('export_rows')}. Full resync."
+        )
+        return None
+    if remote_hash(conn, schema_name, table_name, watermark_col, bind_value) != stored['export_hash']:
+        logger.warning(f"{table_name} rows below {watermark_col}={bind_value} changed since the last export. Full resync.")
+        return None
+
+    cursor = conn.cursor()
+    try:
+        logger.info(f"Fetching rows from {table_name} with {watermark_col} >= {bind_value}...")
+        cursor.execute(
+            f'SELECT DISTINCT * FROM {schema_name}.{table_name} WHERE "{watermark_col}" >= %s ORDER BY "{watermark_col}" ASC',
+            (bind_value,)
+        )
+        new_rows = cursor.fetch_pandas_all()
+    finally:
+        cursor.close()
+
+    logger.info(f"Retrieved {len(new_rows)} new/updated rows from Snowflake (kept {len(kept)} local rows).")
+    return pd.concat([kept, new_rows], ignore_index=True)
+
+def merge_with_local(df, local_path, unique_key=None):
+    """
+    Offline fallback: combines the fresh rows with the existing local copy so
+    that a small watermark-driven fetch never truncates the local history.
+    """
+    local_df = load_local(local_path, 'coindesk') if local_path else None
+    if local_df is None:
+        return df
+    combined = pd.concat([local_df, df], ignore_index=True)
+    keys = key_columns(unique_key)
+    if keys and all(k in combined.columns for k in keys):
+        combined = combined.drop_duplicates(subset=keys, keep='last')
+        combined = combined.sort_values(keys, kind='stable').reset_index(drop=True)
+    return combined
+
+def upload_and_fetch_from_snowflake(session, df, schema_name, table_name, unique_key=None, export_path=None,
+                                    state=None, state_key=None):
     """
     1. Uploads/Merges fresh df to Snowflake.
-    2. Downloads the full unique dataset.
+    2. Downloads the unique dataset, incrementally against export_path when possible.
+    Uses the run-scoped session, so no connection or metadata round-trips per table.
+    Returns (dataset, export mode: 'incremental' or 'full').
+    Returns None when the table is missing or the load/export failed: df only
+    holds the rows fetched since the watermark, so it must never replace the
+    exported history. The same goes for a full resync returning fewer rows
+    than the local copy holds.
+    state/state_key hold the export boundary and hash for incremental exports.
     """
-    conn = get_snowflake_conn()
+    # Standardize columns to uppercase for Snowflake consistency
+    df.columns = [c.upper().replace(' ', '_').replace('-', '_') for c in df.columns]
+
+    conn = session.conn
     if not conn:
-        logger.warning("Skipping Snowflake operations (no connection). Returning original DF.")
-        return df
+        logger.warning("Skipping Snowflake operations (no connection). Merging into the local copy instead.")
+        return merge_with_local(df, export_path, unique_key)
 
     try:
-        # Standardize columns to uppercase for Snowflake consistency
-        df.columns = [c.upper().replace(' ', '_').replace('-', '_') for c in df.columns]
-        
-        # Check if table exists and get row count
-        table_exists, row_count = check_table_status(conn, schema_name, table_name)
+        # Check if table exists and get row count (cached for the whole run)
+        table_exists, row_count = session.table_status(schema_name, table_name)
         
         if not table_exists:
             logger.error(f"Error: Table {table_name} does not exist. Please run schemachange first.")
-            return df
+            return None
 
         # Filter DF columns to match Snowflake table columns
-        table_cols = get_table_columns(conn, schema_name, table_name)
+        table_cols = session.table_columns(schema_name, table_name)
         if table_cols:
             original_cols = df.columns.tolist()
             matching_cols = [c for c in df.columns if c in table_cols]
@@ -177,62 +303,78 @@ def upload_and_fetch_from_snowflake(df, schema_name, table_name, unique_key=None
             logger.warning(f"Warning: No columns in {table_name} DataFrame match the Snowflake schema. Skipping upload.")
             logger.warning(f"DataFrame had columns: {original_cols if 'original_cols' in locals() else df.columns.tolist()}")
             logger.warning(f"Snowflake table expected: {table_cols if table_cols else 'Could not fetch table columns'}")
-            return df
+            return None
 
         # Logic for Bulk vs Delta
-        if row_count >= 1 and unique_key and unique_key.upper() in df.columns:
+        keys = key_columns(unique_key)
+        if row_count >= 1 and keys and all(k in df.columns for k in keys):
             # Incremental load: Merge
-            logger.info(f"Table {table_name} has {row_count} rows. Performing MERGE (Delta Load) on {unique_key}...")
-            perform_merge(conn, df, schema_name, table_name, unique_key.upper())
+            logger.info(f"Table {table_name} has {row_count} rows. Performing MERGE (Delta Load) on {', '.join(keys)}...")
+            perform_merge(conn, df, schema_name, table_name, keys)
         else:
             # Bulk load or Append (no unique key)
             load_type = "Bulk Load (Empty Table)" if row_count == 0 else "Append (No Unique Key)"
             logger.info(f"Table {table_name} has {row_count} rows. Performing {load_type}...")
             
-            # Use CSV upload method to avoid Windows temp file issues
-            import tempfile
-            import os as os_module
+            if HAS_PYARROW:
+                # Typed Parquet file, loaded with one COPY matched by column name
+                loaded = copy_frame_into(conn, df, schema_name, table_name)
+                logger.info(f"Uploaded {loaded} rows successfully to {schema_name}.{table_name}")
+            else:
+                # Use CSV upload method to avoid Windows temp file issues
+                import tempfile
+                import os as os_module
             
-            # Create a temporary CSV file
-            with tempfile.NamedTemporaryFile(mode='w', suffix='.csv', delete=False, newline='') as tmp_file:
-                tmp_path = tmp_file.name
-                df.to_csv(tmp_file, index=False, header=True)
+                # Create a temporary CSV file
+                with tempfile.NamedTemporaryFile(mode='w', suffix='.csv', delete=False, newline='') as tmp_file:
+                    tmp_path = tmp_file.name
+                    df.to_csv(tmp_file, index=False, header=True)
             
-            try:
-                cursor = conn.cursor()
+                try:
+                    cursor = conn.cursor()
                 
-                # Create internal stage if it doesn't exist
-                cursor.execute(f"CREATE TEMPORARY STAGE IF NOT EXISTS TEMP_STAGE")
+                    # Create internal stage if it doesn't exist
+                    cursor.execute(f"CREATE TEMPORARY STAGE IF NOT EXISTS TEMP_STAGE")
                 
-                # Upload file to stage (convert to forward slashes for Snowflake)
-                upload_path = tmp_path.replace('\\', '/')
-                cursor.execute(f"PUT 'file://{upload_path}' @TEMP_STAGE AUTO_COMPRESS=FALSE OVERWRITE=TRUE")
+                    # Upload file to stage (convert to forward slashes for Snowflake)
+                    upload_path = tmp_path.replace('\\', '/')
+                    cursor.execute(f"PUT 'file://{upload_path}' @TEMP_STAGE AUTO_COMPRESS=FALSE OVERWRITE=TRUE")
                 
-                # Get filename
-                filename = os_module.path.basename(tmp_path)
+                    # Get filename
+                    filename = os_module.path.basename(tmp_path)
                 
-                # Copy data from stage to table
-                columns = ', '.join([f'"{col}"' for col in df.columns])
+                    # Copy data from stage to table
+                    columns = ', '.join([f'"{col}"' for col in df.columns])
                 
-                copy_sql = f"""
-                COPY INTO {schema_name}.{table_name} ({columns})
-                FROM @TEMP_STAGE/{filename}
-                FILE_FORMAT = (TYPE = CSV SKIP_HEADER = 1 FIELD_OPTIONALLY_ENCLOSED_BY = '"')
-                ON_ERROR = CONTINUE
-                """
+                    copy_sql = f"""
+                    COPY INTO {schema_name}.{table_name} ({columns})
+                    FROM @TEMP_STAGE/{filename}
+                    FILE_FORMAT = (TYPE = CSV SKIP_HEADER = 1 FIELD_OPTIONALLY_ENCLOSED_BY = '"')
+                    ON_ERROR = CONTINUE
+                    """
                 
-                cursor.execute(copy_sql)
-                result = cursor.fetchone()
-                logger.info(f"Uploaded {result[1]} rows successfully to {schema_name}.{table_name}")
+                    cursor.execute(copy_sql)
+                    result = cursor.fetchone()
+                    logger.info(f"Uploaded {result[1]} rows successfully to {schema_name}.{table_name}")
                 
-            finally:
-                # Clean up temp file
-                try:
-                    os_module.unlink(tmp_path)
-                except:
-                    pass
+                finally:
+                    # Clean up temp file
+                    try:
+                        os_module.unlink(tmp_path)
+                    except:
+                        pass
+
+        # The cached row count is stale now: a second load in this run must MERGE, not append
+        session.refresh(schema_name, table_name)
+
+        # 2. Export (Incremental when the local copy is consistent, otherwise Full Dataset)
+        watermark_col = watermark_column(table_cols)
+        if EXPORT_MODE == 'incremental' and export_path:
+            result_df = export_incremental(conn, schema_name, table_name, table_cols, export_path, state, state_key)
+            if result_df is not None:
+                record_export(conn, schema_name, table_name, watermark_col, result_df, state, state_key)
+                return result_df, 'incremental'
 
-        # 2. Export (Full Dataset)
         sort_col = "TIMESTAMP" if "TIMESTAMP" in df.columns else ("TIME" if "TIME" in df.columns else df.columns[0])
         query = f'SELECT DISTINCT * FROM {schema_name}.{table_name} ORDER BY "{sort_col}" ASC'
 
@@ -242,174 +384,198 @@ def upload_and_fetch_from_snowflake(df, schema_name, table_name, unique_key=None
         result_df = cursor.fetch_pandas_all()
 
         logger.info(f"Retrieved {len(result_df)} rows from Snowflake.")
-        return result_df
+
+        local_df = load_local(export_path, 'coindesk') if export_path else None
+        if local_df is not None and len(result_df) < len(local_df):
+            logger.error(
+                f"{table_name} returned {len(result_df)} rows but {os.path.basename(export_path)} holds {len(local_df)}. "
+                "Not replacing the larger local copy (delete it to accept the warehouse copy)."
+            )
+            return None
+
+        record_export(conn, schema_name, table_name, watermark_col, result_df, state, state_key)
+        return result_df, 'full'
 
     except Exception as e:
         logger.error(f"Snowflake Error for {table_name}: {e}")
-        return df 
-    finally:
-        conn.close()
+        return None
 
-def process_and_save(key: str, url: str, api_key: str):
-    # --- Always use limit 2000 and merge strategy ---
-    limit_val = 2000
-    table_name = f"COINDESK_{key.upper()}"
-    logger.info(f"[{key}] Fetching with limit: {limit_val}")
-    
+def make_client(max_per_host: int = MAX_PER_HOST, per_second: float = RATE_LIMIT_SECOND) -> HttpClient:
+    """Pooled CryptoCompare client with the configured quotas, retries and circuit breaker."""
+    limiter = RateLimiter(per_second=per_second, per_minute=RATE_LIMIT_MINUTE, per_hour=RATE_LIMIT_HOUR)
+    return HttpClient(max_per_host=max_per_host, rate_limiter=limiter)
+
+def build_url(key: str, url: str, api_key: str):
+    """
+    Fills the {API_KEY} placeholder of a config URL ({LIMIT} is filled per request).
+    Returns None when the endpoint needs an API key we don't have.
+    """
     # Inject API Key
     if '{API_KEY}' in url:
         if not api_key:
             logger.warning(f"Skipping {key}: API key required but not found.")
-            return
+            return None
         url = url.replace('{API_KEY}', api_key)
 
-    # Inject Limit
-    if '{LIMIT}' in url:
-        url = url.replace('{LIMIT}', str(limit_val))
+    return url
 
-    try:
-        response = requests.get(url)
-        response.raise_for_status()
-        data = response.json()
-        
-        df = None
-        unique_key = None
-        
-        # --- Parsing Logic ---
-        if key == 'pricemultifull':
-            # Structure: {"RAW":{"BTC":{"USD":{...}}}}
-            try:
-                raw_data = data.get('RAW', {}).get('BTC', {}).get('USD', {})
-                if raw_data:
-                    df = pd.DataFrame([raw_data])
-                    # No unique key for price log, we just append snapshots
-            except AttributeError:
-                pass
-
-        elif key in ['histoday', 'histohour', 'hourly_social_data']:
-            # Structure: {"Data": {"Data": [...]}}
-            try:
-                if 'Data' in data and isinstance(data['Data'], dict) and 'Data' in data['Data']:
-                     df = pd.DataFrame(data['Data']['Data'])
-                elif 'Data' in data and isinstance(data['Data'], list):
-                     df = pd.DataFrame(data['Data'])
-                
-                # Identify Merge Key
-                if df is not None:
-                     # OHLC Specific: Map volumeto -> volume
-                     if key in ['histoday', 'histohour']:
-                         if 'volumeto' in df.columns:
-                             df['volume'] = df['volumeto']
-                         
-                         # Remove original volume and conversion columns
-                         cols_to_drop = [c for c in ['volumeto', 'volumefrom', 'conversionType', 'conversionSymbol'] if c in df.columns]
-                         if cols_to_drop:
-                             df.drop(columns=cols_to_drop, inplace=True)
-
-                     if 'time' in df.columns: unique_key = 'TIME' # Will be uppercased later
-            except Exception:
-                pass
-
-        elif key == 'blockchain_balancedistribution':
-             try:
-                 if 'Data' in data and isinstance(data['Data'], dict) and 'Data' in data['Data']:
-                     items_list = data['Data']['Data']
-                     if items_list and isinstance(items_list, list) and len(items_list) > 0:
-                         # Check if first item has balance_distribution
-                         if 'balance_distribution' in items_list[0]:
-                             df = pd.json_normalize(
-                                 items_list,
-                                 record_path=['balance_distribution'],
-                                 meta=['id', 'symbol', 'partner_symbol', 'time'],
-                                 errors='ignore'
-                             )
-                             logger.info(f"Blockchain balance distribution: Parsed {len(df)} rows with columns: {list(df.columns)}")
-                             # Handle unique key for exploded data
-                             if 'time' in df.columns and 'from' in df.columns and 'to' in df.columns:
-                                 df['merge_key'] = df['time'].astype(str) + "_" + df['from'].astype(str) + "_" + df['to'].astype(str)
-                                 unique_key = 'MERGE_KEY'
-                                 logger.info(f"Created merge_key for blockchain data with {len(df)} records")
-                         else:
-                             df = pd.DataFrame(items_list)
-             except Exception as e:
-                 logger.error(f"Error parsing blockchain_balancedistribution: {e}")
-                 
-        elif key in ['tadingsignals', 'tradingsignals']:
-             try:
-                 if 'Data' in data and isinstance(data['Data'], dict):
-                    flat_data = {}
-
-                    # Map new API field names to old Snowflake column names
-                    field_mapping = {
-                        'addressesNetGrowth': 'ltHandsTh',
-                        'concentrationVar': 'concentration',
-                        'largetxsVar': 'largeSurplus',
-                        'inOutVar': 'inOutVar'  # This one stays the same
-                    }
-
-                    for signal_name, signal_data in data['Data'].items():
-                        # Map to old field name if available
-                        mapped_name = field_mapping.get(signal_name, signal_name)
-
-                        if isinstance(signal_data, dict):
-                             for k, v in signal_data.items():
-                                 # Skip metadata fields, only keep sentiment and value
-                                 if k in ['sentiment', 'value']:
-                                     flat_data[f"{mapped_name}_{k}"] = v if v is not None else None
-                        else:
-                             flat_data[mapped_name] = signal_data if signal_data is not None else None
-
-                    # Add fetched_at timestamp
-                    flat_data['fetched_at'] = datetime.now(timezone.utc).isoformat()
-                    df = pd.DataFrame([flat_data])
-                    logger.info(f"Trading signals parsed successfully with {len(flat_data)} fields")
-             except Exception as e:
-                 logger.error(f"Error parsing tradingsignals: {e}")
-                 pass
-
-        elif key == 'news':
-            if 'Data' in data and isinstance(data['Data'], list):
-                df = pd.DataFrame(data['Data'])
-                # News might have an ID
-                if 'id' in df.columns: unique_key = 'ID'
-        
-        else:
-            # Fallback
-            if 'Data' in data:
-                 if isinstance(data['Data'], list):
-                     df = pd.DataFrame(data['Data'])
-                 elif isinstance(data['Data'], dict) and 'Data' in data['Data']:
-                      df = pd.DataFrame(data['Data']['Data'])
-                 else:
-                      df = pd.DataFrame([data['Data']]) if isinstance(data['Data'], dict) else pd.DataFrame([data])
-            else:
-                 if isinstance(data, list):
-                     df = pd.DataFrame(data)
-                 else:
-                     df = pd.DataFrame([data])
+def get_last_time(state: StateStore, key: str):
+    """
+    Returns the last ingested TIME for a histo endpoint, seeding it from the
+    exported dataset the first time an endpoint is seen.
+    """
+    last_time = state.get(key, 'last_time')
+    if last_time is None:
+        file_path = os.path.join(OUTPUT_DIR, f'{key}.csv')
+        try:
+            local_df = load_local(file_path, 'coindesk', columns=['TIME'])
+            if local_df is not None and not local_df.empty:
+                last_time = int(local_df['TIME'].max())
+        except (ValueError, KeyError):
+            pass
+    return last_time
 
-        # --- Snowflake & Saving Logic ---
-        
-        if df is not None and not df.empty:
-            # Add timestamp if completely missing
-            if 'timestamp' not in df.columns and 'time' not in df.columns and 'TIMESTAMP' not in df.columns:
-                df['fetched_at'] = datetime.now(timezone.utc).isoformat()
-            
-            # Prepare Table Name
-            schema_name = "COINDESK"
-            table_name = f"{key.upper()}"
-            
-            # Upload to Snowflake and get back the FULL updated table
-            final_df = upload_and_fetch_from_snowflake(df, schema_name,table_name, unique_key)
-            
-            os.makedirs(OUTPUT_DIR, exist_ok=True)
-            file_path = os.path.join(OUTPUT_DIR, f'{key}.csv')
-            
-            final_df.to_csv(file_path, index=False)
-            logger.info(f"Exported {len(final_df)} rows to {file_path} (Full Dataset).")
+def compute_limit(key: str, last_time, now: int = None) -> int:
+    """
+    Number of points needed to cover the gap since last_time plus FETCH_OVERLAP.
+    May exceed MAX_LIMIT, in which case fetch_endpoint pages backwards with toTs.
+    """
+    interval = HISTO_INTERVALS.get(key)
+    if not interval or last_time is None:
+        return MAX_LIMIT
+    now = now or int(datetime.now(timezone.utc).timestamp())
+    gap = max(0, (now - int(last_time)) // interval)
+    return gap + FETCH_OVERLAP
+
+def fetch_endpoint(client: HttpClient, key: str, url: str, last_time=None) -> dict:
+    """
+    Fetches one endpoint. {LIMIT} endpoints only request the points missing
+    since last_time; gaps larger than MAX_LIMIT are paged backwards with toTs
+    and the older pages are prepended to the first payload's rows.
+    """
+    if '{LIMIT}' not in url:
+        return client.get_json(url)
+
+    limit = compute_limit(key, last_time)
+    logger.info(f"[{key}] Fetching with limit: {limit} (last TIME: {last_time})")
+
+    payload = client.get_json(url.replace('{LIMIT}', str(min(limit, MAX_LIMIT))))
+    rows = payload_rows(payload)
+    remaining = limit - MAX_LIMIT
+    interval = HISTO_INTERVALS.get(key)
+
+    earliest = min((r['time'] for r in rows or [] if 'time' in r), default=None)
+    while remaining > 0 and earliest is not None and interval:
+        if last_time is not None and earliest <= last_time:
+            break
+        page_url = url.replace('{LIMIT}', str(min(remaining, MAX_LIMIT))) + f"&toTs={earliest - interval}"
+        page_rows = payload_rows(client.get_json(page_url))
+        page_earliest = min((r['time'] for r in page_rows or [] if 'time' in r), default=None)
+        if page_earliest is None or page_earliest >= earliest:
+            break
+        earliest = page_earliest
+        rows[:0] = page_rows
+        remaining -= len(page_rows)
+        logger.info(f"[{key}] Paged back to toTs={earliest - interval} ({len(rows)} rows so far)")
+
+    return payload
+
+def fetch_all(config: dict, api_key: str, client: HttpClient, state: StateStore) -> dict:
+    """
+    Fetches every configured endpoint concurrently over one pooled session.
+    Returns {key: payload} for the endpoints that answered.
+    """
+    tasks = {}
+    for key, endpoint in endpoints(config).items():
+        full_url = build_url(key, endpoint.url, api_key)
+        if full_url:
+            tasks[key] = partial(fetch_endpoint, client, key, full_url, get_last_time(state, key))
 
-        else:
+    logger.info(f"Fetching {len(tasks)} endpoints (max {MAX_WORKERS or len(tasks)} workers, {client.max_per_host} per host)...")
+    return client.gather(tasks, max_workers=MAX_WORKERS)
+
+def parse_payload(key: str, data: dict):
+    """
+    Turns a CryptoCompare payload into (df, unique_key) for the endpoint
+    (see utils.coindesk_endpoints). df is None when nothing usable was found.
+    """
+    endpoint = get_endpoint(key)
+    df = endpoint.parse(data)
+    return df, endpoint.key_for(df)
+
+def save_dataset(key: str, df, unique_key, session: SnowflakeSession, state: StateStore):
+    """
+    Loads a parsed frame into the endpoint's table (COINDESK.<KEY>), exports the resulting dataset to
+    data/coindesk/<key>.csv (and/or Parquet, see DATA_FORMAT) and advances the endpoint's TIME watermark.
+    Returns False (local copy and watermark untouched, so the next run fetches the gap again) if the
+    warehouse step failed.
+    """
+    # Add timestamp if completely missing
+    if 'timestamp' not in df.columns and 'time' not in df.columns and 'TIMESTAMP' not in df.columns:
+        df['fetched_at'] = datetime.now(timezone.utc).isoformat()
+
+    # Target table declared in the endpoint registry (COINDESK.<KEY> by default)
+    endpoint = get_endpoint(key)
+    schema_name = endpoint.schema
+    table_name = endpoint.table
+
+    os.makedirs(OUTPUT_DIR, exist_ok=True)
+    file_path = os.path.join(OUTPUT_DIR, f'{key}.csv')
+
+    # Upload to Snowflake and get back the full updated dataset
+    exported = upload_and_fetch_from_snowflake(session, df, schema_name, table_name, unique_key, file_path,
+                                               state=state, state_key=key)
+    if exported is None:
+        logger.error(f"Warehouse step failed for {key}. Keeping {file_path} and the watermark unchanged.")
+        return False
+    final_df, export_mode = exported
+
+    save_local(final_df, file_path, 'coindesk', key=key_columns(unique_key) or None)
+    logger.info(f"Exported {len(final_df)} rows to {file_path} ({export_mode} export).")
+
+    # Remember the newest ingested point so the next run only asks for the gap
+    time_col = next((c for c in final_df.columns if c.upper() == 'TIME'), None)
+    if time_col and key in HISTO_INTERVALS and not final_df[time_col].dropna().empty:
+        state.update(key, last_time=int(final_df[time_col].max()),
+                     updated_at=datetime.now(timezone.utc).isoformat())
+    return True
+
+def payload_fingerprint(df) -> str:
+    """Content hash of a parsed payload, ignoring fetch metadata and column order."""
+    columns = sorted(c for c in df.columns if str(c).upper() not in FINGERPRINT_EXCLUDE)
+    content = df[columns].to_json(orient='split', index=False, date_format='iso', double_precision=15)
+    return hashlib.sha256(content.encode('utf-8')).hexdigest()
+
+def process_and_save(key: str, data: dict, session: SnowflakeSession, state: StateStore,
+                     heartbeat: StateStore = None):
+    """
+    Parses and saves one payload. Snapshot endpoints whose content matches the
+    fingerprint in state are skipped; their checks are only recorded in
+    heartbeat (see HEARTBEAT_FILE), so state changes only with the data.
+    """
+    try:
+        df, unique_key = parse_payload(key, data)
+
+        if df is None or df.empty:
             logger.warning(f"Warning: No valid data extracted for {key}")
+            return
+
+        # Snapshot endpoints (no unique key) are appended as-is: skip identical ones
+        fingerprint = payload_fingerprint(df) if not unique_key else None
+        now = datetime.now(timezone.utc).isoformat()
+        if fingerprint and state.get(key, 'fingerprint') == fingerprint:
+            unchanged = ((heartbeat.get(key, 'unchanged_runs') if heartbeat else 0) or 0) + 1
+            if heartbeat:
+                heartbeat.update(key, checked_at=now, unchanged_runs=unchanged)
+            logger.info(f"{key} unchanged since {state.get(key, 'changed_at')} ({unchanged} checks). Skipping upload and export.")
+            return
+
+        # A failed load must not be fingerprinted, or the retry would be skipped as unchanged
+        if save_dataset(key, df, unique_key, session, state) and fingerprint:
+            state.update(key, fingerprint=fingerprint, changed_at=now)
+            state.remove(key, 'checked_at', 'unchanged_runs')  # heartbeat fields of earlier versions
+            if heartbeat:
+                heartbeat.update(key, checked_at=now, unchanged_runs=0)
 
     except Exception as e:
         logger.error(f"Error processing {key}: {e}")
@@ -419,6 +585,17 @@ if __name__ == "__main__":
     config = load_config(CONFIG_FILE)
 
     api_key = get_api_key()
+    state = StateStore(STATE_FILE)
+    heartbeat = StateStore(HEARTBEAT_FILE)
+
+    with make_client() as client:
+        payloads = fetch_all(config, api_key, client, state)
+
+    with SnowflakeSession(get_snowflake_conn) as session:
+        for key in config:
+            if key in payloads:
+                # Drop each decoded payload once it has been parsed and saved
+                process_and_save(key, payloads.pop(key), session, state, heartbeat)
 
-    for key, url in config.items():
-        process_and_save(key, url, api_key)
+    state.save()
+    heartbeat.save()
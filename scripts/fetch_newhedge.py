@@ -1,12 +1,27 @@
+import argparse
 import os
 import re
+import gzip
 import json
-from datetime import datetime, timezone
+import time
+from datetime import datetime, timedelta, timezone
+from functools import partial
 import pandas as pd
-from firecrawl import FirecrawlApp
-from bs4 import BeautifulSoup
+try:
+    from firecrawl import FirecrawlApp
+    HAS_FIRECRAWL = True
+except ImportError:
+    HAS_FIRECRAWL = False
 from dotenv import load_dotenv
 from utils.selectors import SELECTORS, TABLE_SELECTORS
+from utils.parsers import parse_html
+from utils.extractor import CompiledExtractor
+from utils.http_client import HttpClient
+from utils.page_cache import PageCache
+from utils.state import StateStore
+from utils.storage import run_partition, save_local, write_partition
+from utils.newhedge_schema import COMPILED_SCHEMA
+from utils.parallel import map_chunks
 
 # Load environment variables
 load_dotenv()
@@ -15,6 +30,33 @@ load_dotenv()
 FIRECRAWL_API_KEY = os.getenv('FIRECRAWL_API_KEY')
 URL = "https://newhedge.io/bitcoin"
 OUTPUT_DIR = os.path.join(os.path.dirname(os.path.dirname(__file__)), 'data', 'newhedge')
+# Raw pages kept for offline replay (scripts/benchmark_newhedge.py)
+SNAPSHOT_DIR = os.path.join(OUTPUT_DIR, '_snapshots')
+# One immutable partition per table and run, picked up incrementally by load_newhedge_to_snowflake.py
+RUNS_DIR = os.path.join(OUTPUT_DIR, '_runs')
+# Append-only archive of every run's raw extraction, replayed by scripts/reprocess_newhedge.py
+ARCHIVE_DIR = os.path.join(OUTPUT_DIR, '_archive')
+SAVE_SNAPSHOTS = os.getenv('NEWHEDGE_SAVE_SNAPSHOTS', 'false').lower() == 'true'
+# Scraped pages are reused for NEWHEDGE_CACHE_TTL seconds (0 disables), so re-runs don't re-scrape
+CACHE_DIR = os.path.join(OUTPUT_DIR, '_cache')
+CACHE_TTL = int(os.getenv('NEWHEDGE_CACHE_TTL', '3600'))
+CACHE_MAX_BYTES = int(float(os.getenv('NEWHEDGE_CACHE_MAX_MB', '200')) * 2**20)
+# Tiered fetch: a plain HTTP GET first, Firecrawl only when the static page lacks sections
+# (auto), or a single tier (http / firecrawl)
+FETCH_TIER = os.getenv('NEWHEDGE_FETCH_TIER', 'auto').lower()
+# Selectors that must resolve for the plain page to count as the dashboard
+REQUIRED_ANCHORS = ['MARKET_CAP', 'BTC_DOMINANCE']
+HTTP_HEADERS = {
+    'User-Agent': 'Mozilla/5.0 (X11; Linux x86_64) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/120.0 Safari/537.36',
+    'Accept': 'text/html,application/xhtml+xml',
+}
+# Tier that served each metric and table last run ('missing' when every tier was tried and none did)
+TIERS_FILE = os.path.join(OUTPUT_DIR, '_tiers.json')
+# Sections recorded as missing are re-probed with the next tier after this many hours
+TIER_RECHECK_HOURS = float(os.getenv('NEWHEDGE_TIER_RECHECK_HOURS', '24'))
+
+# Label selectors are resolved from one indexed pass over the page
+EXTRACTOR = CompiledExtractor(SELECTORS)
 
 def clean_extracted_value(value, key):
     """Post-process extracted values to clean up duplicates and errors."""
@@ -34,94 +76,7 @@ def clean_extracted_value(value, key):
     
     return value
 
-# ===== UTILITY FUNCTIONS =====
-
-def clean_numeric_value(value):
-    """Cleans numeric values by removing currency symbols, commas, percentages, and units."""
-    if value is None or value == '':
-        return None
-    
-    try:
-        cleaned = str(value).strip()
-        cleaned = re.sub(r'[$€£¥,]', '', cleaned)
-        
-        is_percentage = '%' in cleaned
-        cleaned = cleaned.replace('%', '')
-        
-        multiplier = 1
-        if 'T' in cleaned and 'BTC' not in cleaned:
-            multiplier = 1_000_000_000_000
-            cleaned = cleaned.replace('T', '')
-        elif 'B' in cleaned and 'BTC' not in cleaned:
-            multiplier = 1_000_000_000
-            cleaned = cleaned.replace('B', '')
-        elif 'M' in cleaned:
-            multiplier = 1_000_000
-            cleaned = cleaned.replace('M', '')
-        elif 'K' in cleaned:
-            multiplier = 1_000
-            cleaned = cleaned.replace('K', '')
-        
-        if 'EH/s' in cleaned:
-            cleaned = cleaned.replace('EH/s', '').strip()
-        
-        cleaned = re.sub(r'[^\d.\-]', '', cleaned)
-        
-        if not cleaned or cleaned == '.':
-            return None
-            
-        result = float(cleaned) * multiplier
-        return result
-    except (ValueError, AttributeError):
-        return None
-
-def clean_integer_value(value):
-    """Cleans integer values."""
-    numeric = clean_numeric_value(value)
-    return int(numeric) if numeric is not None else None
-
-def clean_percentage(value):
-    """Cleans percentage values."""
-    return clean_numeric_value(value)
-
-def parse_date(date_str):
-    """Parses date strings in various formats."""
-    if not date_str:
-        return None
-    
-    try:
-        date_str = date_str.strip()
-        for fmt in ['%B %d, %Y', '%A, %B %d, %Y', '%b %d, %Y', '%A, %b %d, %Y']:
-            try:
-                cleaned = re.sub(r'\s+', ' ', date_str)
-                return datetime.strptime(cleaned, fmt).date()
-            except ValueError:
-                continue
-        return None
-    except Exception:
-        return None
-
-def extract_btc_amount(value):
-    """Extracts BTC amount from strings like '1,036,543.54 BTC'."""
-    if not value:
-        return None
-    cleaned = value.replace('BTC', '').strip()
-    return clean_numeric_value(cleaned)
-
-def extract_usd_with_percentage(value):
-    """Extracts USD amount and percentage from strings like '$1.72B (7.43%)'."""
-    if not value:
-        return None, None
-    
-    amount_match = re.search(r'[\$€£¥]?[\d,.]+(B|M|K|T)?', value)
-    amount = clean_numeric_value(amount_match.group(0)) if amount_match else None
-    
-    pct_match = re.search(r'\(([\d.]+)%\)', value)
-    percentage = float(pct_match.group(1)) if pct_match else None
-    
-    return amount, percentage
-
-def extract_element(soup, selector):
+def extract_element(doc, selector):
     """Extracts text based on various selector types."""
     try:
         # Handle dictionary selectors (new format)
@@ -131,7 +86,7 @@ def extract_element(soup, selector):
             if selector_type == 'css':
                 # Direct CSS selector
                 css_selector = selector.get('selector')
-                element = soup.select_one(css_selector)
+                element = doc.select_one(css_selector)
                 return element.get_text().strip() if element else None
             
             elif selector_type == 'next_sibling':
@@ -139,7 +94,7 @@ def extract_element(soup, selector):
                 search_text = selector.get('text')
                 context = selector.get('context')  # Optional context to narrow search
                 
-                elements = soup.find_all(string=lambda x: x and search_text in x)
+                elements = doc.find_all(string=lambda x: x and search_text in x)
                 
                 for elem in elements:
                     # If context is provided, check if we're in the right section
@@ -177,7 +132,7 @@ def extract_element(soup, selector):
                 # Find dashboard primary text in context
                 context = selector.get('context')
                 # Find section containing context
-                section = soup.find(string=lambda x: x and context in x)
+                section = doc.find(string=lambda x: x and context in x)
                 if section:
                     container = section.find_parent().find_parent()
                     if container:
@@ -189,7 +144,7 @@ def extract_element(soup, selector):
             elif selector_type == 'dashboard_secondary':
                 # Find dashboard secondary text in context
                 context = selector.get('context')
-                section = soup.find(string=lambda x: x and context in x)
+                section = doc.find(string=lambda x: x and context in x)
                 if section:
                     container = section.find_parent().find_parent()
                     if container:
@@ -209,7 +164,7 @@ def extract_element(soup, selector):
                     return None
                 search_text = match.group(1)
                 
-                elements = soup.select(base_tag) if base_tag else soup.find_all()
+                elements = doc.select(base_tag) if base_tag else doc.find_all()
                 
                 for el in elements:
                     if search_text in el.get_text():
@@ -222,7 +177,7 @@ def extract_element(soup, selector):
                 return None
             else:
                 # Standard CSS selector
-                element = soup.select_one(selector)
+                element = doc.select_one(selector)
                 return element.get_text().strip() if element else None
             
         return None
@@ -230,7 +185,7 @@ def extract_element(soup, selector):
         # print(f"Error extracting {selector}: {e}")
         return None
 
-def scrape_table(soup, table_config):
+def scrape_table(doc, table_config):
     """Scrapes a table dynamically based on configuration."""
     try:
         find_method = table_config.get("find_method")
@@ -238,7 +193,7 @@ def scrape_table(soup, table_config):
         if find_method == "id":
             # Direct table ID lookup
             table_id = table_config.get("table_id")
-            table = soup.find('table', id=table_id)
+            table = doc.find('table', id=table_id)
             
             if not table:
                 return []
@@ -271,10 +226,10 @@ def scrape_table(soup, table_config):
             parent_levels = table_config.get("parent_levels", 2)
             
             # Find element containing the search text (header)
-            header = soup.find(string=lambda x: x and search_text == x.strip())
+            header = doc.find(string=lambda x: x and search_text == x.strip())
             if not header:
                 # Try partial match
-                header = soup.find(string=lambda x: x and search_text in x)
+                header = doc.find(string=lambda x: x and search_text in x)
             
             if not header:
                 return []
@@ -319,7 +274,7 @@ def scrape_table(soup, table_config):
         
         # Old method (container selector)
         else:
-            container = soup.select_one(table_config.get("container", ""))
+            container = doc.select_one(table_config.get("container", ""))
             if not container:
                 return []
             
@@ -341,416 +296,310 @@ def scrape_table(soup, table_config):
         traceback.print_exc()
         return []
 
-# ===== MAIN SCRAPING FUNCTION =====
+def extract_raw_data(doc, timings=None):
+    """Returns {key: cleaned text} for every selector (per-selector seconds go into timings)."""
+    extracted = EXTRACTOR.extract_all(doc, extract_element, timings)
+    return {key: clean_extracted_value(extracted[key], key) for key in SELECTORS}
+
+def extract_tables(doc):
+    """Returns {table_name: [row dicts]} for every TABLE_SELECTORS entry."""
+    return {
+        table_name: scrape_table(doc, table_config)
+        for table_name, table_config in TABLE_SELECTORS.items()
+    }
+
+def extract_page(doc):
+    """Returns (raw_data, scraped_tables) for a parsed NewHedge page."""
+    return extract_raw_data(doc), extract_tables(doc)
+
+def tables_to_columns(scraped_tables):
+    """{table: [row dicts]} as {table: {column: values}} (rows of a table share their columns)."""
+    return {
+        name: {column: [row.get(column) for row in rows] for column in (rows[0] if rows else [])}
+        for name, rows in scraped_tables.items()
+    }
+
+def columns_to_tables(columns):
+    """Inverse of tables_to_columns."""
+    return {
+        name: [dict(zip(table, values)) for values in zip(*table.values())]
+        for name, table in columns.items()
+    }
 
-def fetch_data():
+def extract_chunk(pages, backend=None, load=None):
+    """
+    Process-pool worker: parses and extracts a chunk of pages (HTML, or
+    anything load() turns into HTML, such as snapshot paths). Returns
+    [(raw_data, {table: {column: values}})]: only plain strings are pickled
+    back, never a parsed document.
+    """
+    results = []
+    for page in pages:
+        raw_data, scraped_tables = extract_page(parse_html(load(page) if load else page, backend))
+        results.append((raw_data, tables_to_columns(scraped_tables)))
+    return results
+
+def extract_pages(pages, workers=1, chunk_size=4, backend=None, load=None):
+    """
+    Yields (raw_data, scraped_tables) for each page, in order. Pages are
+    parsed in `workers` processes, chunk_size pages per task (see
+    utils/parallel.py), so replays and multi-page scrapes use every core.
+    """
+    worker = partial(extract_chunk, backend=backend, load=load)
+    for raw_data, columns in map_chunks(worker, pages, workers, chunk_size):
+        yield raw_data, columns_to_tables(columns)
+
+def build_tables(raw_data, timestamp):
+    """Cleans raw_data into the one-row {table_name: DataFrame} of each core metric table (see utils/newhedge_schema.py)."""
+    return COMPILED_SCHEMA.transform([raw_data], [timestamp])
+
+def save_tables(tables, scraped_tables, raw_data, timestamp, output_dir=OUTPUT_DIR, sources=None):
+    """
+    Appends one run to the tables in output_dir (CSV and/or Parquet, see
+    DATA_FORMAT), writes it as its own partition under <output_dir>/_runs/
+    and writes raw_data.json (with the fetch tier of each section, if given).
+    """
+    os.makedirs(output_dir, exist_ok=True)
+    runs_dir = os.path.join(output_dir, os.path.basename(RUNS_DIR))
+    # Parquet datasets go to data/parquet/newhedge, or next to the CSVs for another output_dir
+    parquet_root = None if output_dir == OUTPUT_DIR else os.path.join(output_dir, 'parquet')
+    
+    print("\nSaving core metrics to CSV files...")
+    for table_name, df in tables.items():
+        output_file = os.path.join(output_dir, f'{table_name}.csv')
+        
+        save_local(df, output_file, 'newhedge', time_column='TIMESTAMP', append=True, root=parquet_root)
+        write_partition(df, runs_dir, table_name, timestamp)
+        print(f"  ✓ {table_name}.csv")
+    
+    # Save table data (companies, ETFs, etc.)
+    print("\nSaving table data...")
+    for table_name, data in scraped_tables.items():
+        if data:
+            output_file = os.path.join(output_dir, f'{table_name.lower()}.csv')
+            
+            # Add timestamp to each row
+            for row in data:
+                row['TIMESTAMP'] = timestamp
+            
+            df = pd.DataFrame(data)
+            save_local(df, output_file, 'newhedge', time_column='TIMESTAMP', append=True, root=parquet_root)
+            write_partition(df, runs_dir, table_name, timestamp)
+            print(f"  ✓ {table_name.lower()}.csv ({len(data)} rows)")
+    
+    # Save raw data for debugging, and append it to the archive
+    record = {
+        'timestamp': timestamp.isoformat(),
+        'raw_data': raw_data,
+        'scraped_tables': {k: v for k, v in scraped_tables.items()},
+        'sources': sources or {}
+    }
+    raw_output_file = os.path.join(output_dir, 'raw_data.json')
+    with open(raw_output_file, 'w') as f:
+        json.dump(record, f, indent=2, default=str)
+    print(f"  ✓ raw_data.json")
+    archive_file = archive_snapshot(record, timestamp, os.path.join(output_dir, os.path.basename(ARCHIVE_DIR)))
+    print(f"  ✓ {os.path.relpath(archive_file, output_dir)}")
+
+def archive_snapshot(record, timestamp, archive_dir=ARCHIVE_DIR):
+    """
+    Appends one run's raw extraction as a JSON line to
+    <archive_dir>/raw_<YYYY-MM>.jsonl.gz. Each append is its own gzip member,
+    so earlier runs are never rewritten.
+    """
+    os.makedirs(archive_dir, exist_ok=True)
+    path = os.path.join(archive_dir, f"raw_{timestamp.strftime('%Y-%m')}.jsonl.gz")
+    with gzip.open(path, 'at', encoding='utf-8') as f:
+        f.write(json.dumps(record, default=str) + '\n')
+    return path
+
+def save_snapshot(html_content, timestamp, snapshot_dir=SNAPSHOT_DIR, suffix=''):
+    """Stores the fetched page as <snapshot_dir>/<UTC timestamp><suffix>.html.gz."""
+    os.makedirs(snapshot_dir, exist_ok=True)
+    path = os.path.join(snapshot_dir, f"{timestamp.strftime('%Y%m%dT%H%M%SZ')}{suffix}.html.gz")
+    with gzip.open(path, 'wt', encoding='utf-8') as f:
+        f.write(html_content)
+    return path
+
+def read_snapshot(path):
+    """Reads a stored page (.html or .html.gz)."""
+    opener = gzip.open if path.endswith('.gz') else open
+    with opener(path, 'rt', encoding='utf-8') as f:
+        return f.read()
+
+def run_exists(timestamp, output_dir=OUTPUT_DIR):
+    """True if the run scraped at timestamp already has partitions under <output_dir>/_runs/."""
+    runs_dir = os.path.join(output_dir, os.path.basename(RUNS_DIR))
+    if not os.path.isdir(runs_dir):
+        return False
+    partition = run_partition(timestamp)
+    return any(os.path.isdir(os.path.join(runs_dir, table, partition)) for table in os.listdir(runs_dir))
+
+def fetch_http(client):
+    """Plain GET of the dashboard (no JavaScript rendering)."""
+    return client.get(URL, headers=HTTP_HEADERS).text
+
+def fetch_firecrawl(client=None):
+    """Headless-browser render of the dashboard through Firecrawl."""
     if not FIRECRAWL_API_KEY:
         print("Error: FIRECRAWL_API_KEY not found.")
-        return
-
+        return None
     print("Initializing Firecrawl...")
+    if not HAS_FIRECRAWL:
+        raise ImportError("The firecrawl tier needs firecrawl-py (pip install -r requirements.txt)")
     app = FirecrawlApp(api_key=FIRECRAWL_API_KEY)
-    
-    print(f"Scraping {URL}...")
+    scrape_result = app.scrape(URL, formats=['html'])
+    return scrape_result.html if hasattr(scrape_result, 'html') else None
+
+FETCHERS = {'http': fetch_http, 'firecrawl': fetch_firecrawl}
+
+def scrape_page(cache, tier, client=None, from_cache=False, refresh=False):
+    """
+    Returns (html, fetched_at) for URL from one tier ('http' or 'firecrawl'):
+    the cached page of the current TTL bucket unless refresh is set, the
+    newest cached page with from_cache, otherwise a fresh fetch (stored in
+    the cache). (None, None) when the tier has nothing.
+    """
+    cache_key = f"{tier}:{URL}"
+    if from_cache:
+        cached = cache.latest(cache_key)
+        if not cached:
+            print(f"[{tier}] No cached page for {URL} in {CACHE_DIR}.")
+            return None, None
+        print(f"[{tier}] Replaying cached page fetched at {cached[1].isoformat()}")
+        return cached
+
+    if not refresh:
+        cached = cache.get(cache_key)
+        if cached:
+            print(f"[{tier}] Using cached page fetched at {cached[1].isoformat()} (TTL {CACHE_TTL}s, --refresh to fetch again)")
+            return cached
+
+    print(f"[{tier}] Fetching {URL}...")
+    started = time.perf_counter()
     try:
-        scrape_result = app.scrape(URL, formats=['html'])
-        html_content = scrape_result.html if hasattr(scrape_result, 'html') else None
-        
-        if not html_content:
+        html_content = FETCHERS[tier](client)
+    except Exception as e:
+        print(f"[{tier}] Fetch failed: {e}")
+        return None, None
+    timestamp = datetime.now(timezone.utc)
+    print(f"[{tier}] {len(html_content or '')} bytes in {time.perf_counter() - started:.2f}s")
+    if html_content and CACHE_TTL > 0:
+        cache.put(cache_key, html_content, timestamp)
+    return html_content, timestamp
+
+def missing_sections(raw_data, scraped_tables):
+    """Metric keys and table names the page did not yield."""
+    return [key for key, value in raw_data.items() if value is None] + \
+        [name for name, rows in scraped_tables.items() if not rows]
+
+def known_missing(tiers, name, now):
+    """True if every tier missed the section less than TIER_RECHECK_HOURS ago."""
+    entry = tiers.get(name)
+    if entry.get('tier') != 'missing' or not entry.get('checked_at'):
+        return False
+    return now - datetime.fromisoformat(entry['checked_at']) < timedelta(hours=TIER_RECHECK_HOURS)
+
+def needs_escalation(raw_data, scraped_tables, tiers, now=None):
+    """
+    True if the plain page is not the rendered dashboard (an anchor is
+    missing) or lacks a section that is not known to be missing from every
+    tier (see TIERS_FILE and known_missing).
+    """
+    if any(raw_data.get(key) is None for key in REQUIRED_ANCHORS):
+        return True
+    now = now or datetime.now(timezone.utc)
+    return any(not known_missing(tiers, name, now) for name in missing_sections(raw_data, scraped_tables))
+
+def record_tiers(tiers, sources, tried, order, now=None):
+    """
+    Records the tier that served each section. A section is only recorded as
+    'missing' when every tier in order returned a page (tried); otherwise it
+    keeps the last tier that served it, so a failed or skipped render does
+    not stop escalation for it.
+    """
+    checked_at = (now or datetime.now(timezone.utc)).isoformat()
+    complete = all(tier in tried for tier in order)
+    for name, tier in sources.items():
+        if tier != 'missing' or complete:
+            tiers.update(name, tier=tier, checked_at=checked_at)
+
+def merge_tiers(results):
+    """
+    Combines the extractions of each tier (in order of preference) into
+    (raw_data, scraped_tables, sources): every metric and table comes from
+    the first tier that yielded it, and sources maps it to that tier
+    ('missing' when none did).
+    """
+    raw_data, scraped_tables, sources = {}, {}, {}
+    for tier, (tier_raw, tier_tables) in results.items():
+        for key, value in tier_raw.items():
+            if raw_data.get(key) is None:
+                raw_data[key] = value
+                sources[key] = tier if value is not None else 'missing'
+        for name, rows in tier_tables.items():
+            if not scraped_tables.get(name):
+                scraped_tables[name] = rows
+                sources[name] = tier if rows else 'missing'
+    return raw_data, scraped_tables, sources
+
+# ===== MAIN SCRAPING FUNCTION =====
+
+def fetch_data(from_cache=False, refresh=False):
+    cache = PageCache(CACHE_DIR, ttl=CACHE_TTL, max_bytes=CACHE_MAX_BYTES)
+    tiers = StateStore(TIERS_FILE)
+    order = ['http', 'firecrawl'] if FETCH_TIER == 'auto' else [FETCH_TIER]
+    try:
+        with HttpClient(max_per_host=1, max_retries=1) as client:
+            results = {}
+            timestamp = None
+            for tier in order:
+                if results and not needs_escalation(*merge_tiers(results)[:2], tiers):
+                    break
+                if results:
+                    missing = missing_sections(*merge_tiers(results)[:2])
+                    print(f"Escalating to {tier} for {len(missing)} sections: {', '.join(missing[:5])}{', ...' if len(missing) > 5 else ''}")
+                html_content, fetched_at = scrape_page(cache, tier, client, from_cache, refresh)
+                if not html_content:
+                    continue
+
+                # The run is stamped with the first page's fetch time, so a cached page maps to the run it produced
+                if timestamp is None:
+                    timestamp = fetched_at
+                    if run_exists(timestamp):
+                        print(f"Run {run_partition(timestamp)} is already saved. Nothing to do.")
+                        return
+
+                if SAVE_SNAPSHOTS:
+                    print(f"Saved snapshot to {save_snapshot(html_content, timestamp, suffix='' if tier == 'firecrawl' else f'.{tier}')}")
+
+                doc = parse_html(html_content)
+                print(f"[{tier}] Parsed page with the {doc.name} backend")
+                results[tier] = extract_page(doc)
+
+        if not results:
             print("No HTML content returned.")
             return
 
-        soup = BeautifulSoup(html_content, 'html.parser')
-        timestamp = datetime.now(timezone.utc)
-        
-        # Extract all raw data points
+        raw_data, scraped_tables, sources = merge_tiers(results)
+        record_tiers(tiers, sources, results, order)
+        served = {tier: sum(1 for t in sources.values() if t == tier) for tier in order + ['missing']}
+        print("Sections served: " + ", ".join(f"{tier} {count}" for tier, count in served.items()))
+
         print("Extracting data points...")
-        raw_data = {}
-        for key, selector in SELECTORS.items():
-            value = extract_element(soup, selector)
-            # Clean up the value
-            value = clean_extracted_value(value, key)
-            raw_data[key] = value
+        for key, value in raw_data.items():
             if value:
                 print(f"  {key}: {value}")
         
-        # Extract table data
         print("\nExtracting table data...")
-        scraped_tables = {}
-        for table_name, table_config in TABLE_SELECTORS.items():
-            scraped_tables[table_name] = scrape_table(soup, table_config)
-            print(f"  {table_name}: {len(scraped_tables[table_name])} rows")
+        for table_name, rows in scraped_tables.items():
+            print(f"  {table_name}: {len(rows)} rows")
         
         # ===== STRUCTURED DATA TABLES =====
-        
-        # 1. Market Overview
-        market_overview = {
-            'TIMESTAMP': timestamp,
-            '24H_HIGH': clean_numeric_value(raw_data.get('24H_HIGH')),
-            '24H_LOW': clean_numeric_value(raw_data.get('24H_LOW')),
-            '24H_VOL_BTC': clean_numeric_value(raw_data.get('24H_VOL_BTC')),
-            '24H_VOL_USD': clean_numeric_value(raw_data.get('24H_VOL_USD')),
-            'LIVE_PRICE': clean_numeric_value(raw_data.get('LIVE_PRICE')),
-            'MARKET_CAP': clean_numeric_value(raw_data.get('MARKET_CAP')),
-            'BTC_DOMINANCE_PCT': clean_percentage(raw_data.get('BTC_DOMINANCE')),
-            'SATS_PER_DOLLAR': clean_integer_value(raw_data.get('SATS_PER_DOLLAR'))
-        }
-        
-        # 2. Blockchain Metrics
-        blockchain_metrics = {
-            'TIMESTAMP': timestamp,
-            'BLOCK_HEIGHT': clean_integer_value(raw_data.get('BLOCK_HEIGHT')),
-            'TIME_SINCE_LAST_BLOCK': raw_data.get('TIME_SINCE_LAST_BLOCK'),
-            'BLOCK_SPEED': clean_numeric_value(raw_data.get('BLOCK_SPEED')),
-            'BLOCKS_24HRS': clean_integer_value(raw_data.get('BLOCKS_24HRS')),
-            'OUTPUTS_24HRS': clean_integer_value(raw_data.get('OUTPUTS_24HRS'))
-        }
-        
-        # 3. Difficulty Adjustment
-        difficulty_adjustment = {
-            'TIMESTAMP': timestamp,
-            'PREVIOUS_DIFFICULTY': clean_numeric_value(raw_data.get('PREVIOUS_DIFFICULTY')),
-            'PREVIOUS_DIFFICULTY_CHANGE_PCT': clean_percentage(raw_data.get('PREVIOUS_DIFFICULTY_CHANGE')),
-            'CURRENT_DIFFICULTY': clean_numeric_value(raw_data.get('CURRENT_DIFFICULTY')),
-            'NEXT_DIFFICULTY_ESTIMATE': clean_numeric_value(raw_data.get('NEXT_DIFFICULTY_ESTIMATE')),
-            'NEXT_DIFFICULTY_CHANGE_PCT': clean_percentage(raw_data.get('NEXT_DIFFICULTY_CHANGE_PCT')),
-            'NEXT_RETARGET': raw_data.get('NEXT_RETARGET'),
-            'EPOCH': clean_integer_value(raw_data.get('EPOCH'))
-        }
-        
-        # 4. Fear & Greed Index
-        fear_greed = {
-            'TIMESTAMP': timestamp,
-            'INDEX_VALUE': clean_numeric_value(raw_data.get('FEAR_GREED_INDEX')),
-            'LABEL': raw_data.get('FEAR_GREED_LABEL')
-        }
-        
-        # 5. Mining Metrics
-        mining_metrics = {
-            'TIMESTAMP': timestamp,
-            'HASHRATE_EHS': clean_numeric_value(raw_data.get('HASHRATE')),
-            'HASHPRICE_USD': clean_numeric_value(raw_data.get('HASHPRICE')),
-            'REVENUE_BTC_24H': clean_numeric_value(raw_data.get('REVENUE_BTC_24HRS')),
-            'REVENUE_USD_24H': clean_numeric_value(raw_data.get('REVENUE_USD_24HRS')),
-            'REWARD_PER_BLOCK_BTC': clean_numeric_value(raw_data.get('REWARD_PER_BLOCK_BTC')),
-            'REWARD_PER_BLOCK_USD': clean_numeric_value(raw_data.get('REWARD_PER_BLOCK_USD')),
-            'REWARD_BTC_24HRS': clean_numeric_value(raw_data.get('REWARD_BTC_24HRS')),
-            'REWARD_USD_24HRS': clean_numeric_value(raw_data.get('REWARD_USD_24HRS')),
-            'FEES_VS_REWARD_PCT': clean_percentage(raw_data.get('FEES_VS_REWARD_PCT')),
-            'CURRENT_MONTH_SUBSIDY_USD': clean_numeric_value(raw_data.get('CURRENT_MONTH_SUBSIDY_USD')),
-            'CURRENT_MONTH_FEES_USD': clean_numeric_value(raw_data.get('CURRENT_MONTH_FEES_USD')),
-            'CURRENT_MONTH_TOTAL_USD': clean_numeric_value(raw_data.get('CURRENT_MONTH_TOTAL_USD'))
-        }
-        
-        # 6. Fees
-        fee_metrics = {
-            'TIMESTAMP': timestamp,
-            'PER_TRANSACTION_SATS': clean_numeric_value(raw_data.get('PER_TRANSACTION_SATS')),
-            'PER_TRANSACTION_USD': clean_numeric_value(raw_data.get('PER_TRANSACTION_USD')),
-            'FEES_BTC_24HRS': clean_numeric_value(raw_data.get('FEES_BTC_24HRS')),
-            'FEES_USD_24HRS': clean_numeric_value(raw_data.get('FEES_USD_24HRS'))
-        }
-        
-        # 7. Supply Metrics
-        supply_metrics = {
-            'TIMESTAMP': timestamp,
-            'CIRCULATING_SUPPLY': clean_numeric_value(raw_data.get('CIRCULATING_SUPPLY')),
-            'PERCENTAGE_ISSUED_PCT': clean_percentage(raw_data.get('PERCENTAGE_ISSUED')),
-            'ISSUANCE_REMAINING': clean_numeric_value(raw_data.get('ISSUANCE_REMAINING')),
-            'TOTAL_MINED_BLOCKS': clean_integer_value(raw_data.get('TOTAL_MINED_BLOCKS')),
-            'ISSUANCE_BTC_24HRS': clean_numeric_value(raw_data.get('ISSUANCE_BTC_24HRS'))
-        }
-        
-        # 8. Corporate Holdings
-        corporate_holdings = {
-            'TIMESTAMP': timestamp,
-            'PUBLIC_COMPANIES_COUNT': clean_integer_value(raw_data.get('PUBLIC_COMPANIES_COUNT')),
-            'PUBLIC_HOLDINGS_BTC': clean_numeric_value(raw_data.get('PUBLIC_HOLDINGS_BTC')),
-            'PUBLIC_HOLDINGS_USD': clean_numeric_value(raw_data.get('PUBLIC_HOLDINGS_USD')),
-            'PRIVATE_COMPANIES_COUNT': clean_integer_value(raw_data.get('PRIVATE_COMPANIES_COUNT')),
-            'PRIVATE_HOLDINGS_BTC': clean_numeric_value(raw_data.get('PRIVATE_HOLDINGS_BTC')),
-            'PRIVATE_HOLDINGS_USD': clean_numeric_value(raw_data.get('PRIVATE_HOLDINGS_USD')),
-            'TOTAL_CORPORATE_BTC': clean_numeric_value(raw_data.get('TOTAL_CORPORATE_BTC')),
-            'TOTAL_CORPORATE_USD': clean_numeric_value(raw_data.get('TOTAL_CORPORATE_USD')),
-            'CORPORATE_PCT_TOTAL_SUPPLY': clean_percentage(raw_data.get('CORPORATE_PCT_TOTAL_SUPPLY'))
-        }
-        
-        # 9. Government Holdings
-        government_holdings = {
-            'TIMESTAMP': timestamp,
-            'GOVERNMENTS_COUNT': clean_integer_value(raw_data.get('GOVERNMENTS_COUNT')),
-            'GOVERNMENT_TREASURY_BTC': clean_numeric_value(raw_data.get('GOVERNMENT_BTC_TREASURIES')),
-            'GOVERNMENT_TREASURY_USD': clean_numeric_value(raw_data.get('GOVERNMENT_USD_TREASURIES')),
-            'GOVERNMENT_PCT_TOTAL_SUPPLY': clean_percentage(raw_data.get('GOVERNMENT_PCT_TOTAL_SUPPLY'))
-        }
-        
-        # 10. Transaction Metrics
-        transaction_metrics = {
-            'TIMESTAMP': timestamp,
-            'TRANSACTIONS_PER_SECOND': clean_numeric_value(raw_data.get('TRANSACTIONS_PER_SECOND')),
-            'TRANSACTIONS_PER_BLOCK': clean_numeric_value(raw_data.get('TRANSACTIONS_PER_BLOCK')),
-            'TRANSACTIONS_PER_DAY': clean_numeric_value(raw_data.get('TRANSACTIONS_PER_DAY')),
-            'TRANSACTIONS_CURRENT_MONTH': clean_numeric_value(raw_data.get('TRANSACTIONS_CURRENT_MONTH')),
-            'TOTAL_TRANSACTIONS_ALL_TIME': clean_integer_value(raw_data.get('TOTAL_TRANSACTIONS_ALL_TIME'))
-        }
-        
-        # 11. UTXO Metrics
-        utxo_metrics = {
-            'TIMESTAMP': timestamp,
-            'UTXOS_IN_PROFIT': clean_numeric_value(raw_data.get('UTXOS_IN_PROFIT')),
-            'UTXOS_IN_LOSS': clean_numeric_value(raw_data.get('UTXOS_IN_LOSS')),
-            'UTXOS_IN_PROFIT_PCT': clean_percentage(raw_data.get('UTXOS_IN_PROFIT_PCT'))
-        }
-        
-        # 12. Profitable Days
-        profitable_days = {
-            'TIMESTAMP': timestamp,
-            'TOTAL_DAYS': clean_integer_value(raw_data.get('TOTAL_DAYS')),
-            'PROFITABLE_DAYS': clean_integer_value(raw_data.get('PROFITABLE_DAYS')),
-            'UNPROFITABLE_DAYS': clean_integer_value(raw_data.get('UNPROFITABLE_DAYS')),
-            'PERCENTAGE_PROFITABLE_PCT': clean_percentage(raw_data.get('PERCENTAGE_PROFITABLE'))
-        }
-        
-        # 13. Macro & Liquidity
-        macro_liquidity = {
-            'TIMESTAMP': timestamp,
-            'GLOBAL_M2_SUPPLY': clean_numeric_value(raw_data.get('GLOBAL_M2_SUPPLY')),
-            'GLOBAL_M2_GROWTH': clean_numeric_value(raw_data.get('GLOBAL_M2_GROWTH')),
-            'GLOBAL_M2_YOY_GROWTH_PCT': clean_percentage(raw_data.get('GLOBAL_M2_YOY_GROWTH')),
-            'GLOBAL_M2_10WEEK_LEAD': clean_numeric_value(raw_data.get('GLOBAL_M2_10WEEK_LEAD')),
-            'US_M2_SUPPLY': clean_numeric_value(raw_data.get('US_M2_SUPPLY')),
-            'FEDERAL_FUNDS_RATE_PCT': clean_percentage(raw_data.get('FEDERAL_FUNDS_RATE'))
-        }
-        
-        # 14. ATH Details
-        ath_details = {
-            'TIMESTAMP': timestamp,
-            'ATH_PRICE_USD': clean_numeric_value(raw_data.get('ATH_PRICE')),
-            'ATH_DATE': parse_date(raw_data.get('ATH_DATE')),
-            'DAYS_SINCE_ATH': clean_integer_value(raw_data.get('DAYS_SINCE_ATH')),
-            'PRICE_DRAWDOWN_PCT': clean_percentage(raw_data.get('PRICE_DRAWDOWN_SINCE_ATH'))
-        }
-        
-        # 15. Trading Metrics
-        us_vol, us_pct = extract_usd_with_percentage(raw_data.get('US_CRYPTO_TRADING_VOL'))
-        offshore_vol, offshore_pct = extract_usd_with_percentage(raw_data.get('OFFSHORE_CRYPTO_TRADING_VOL'))
-        
-        trading_metrics = {
-            'TIMESTAMP': timestamp,
-            'DAILY_BTC_TRADING_VOL_USD': clean_numeric_value(raw_data.get('DAILY_BTC_TRADING_VOL')),
-            'MONTHLY_BTC_TRADING_VOL_USD': clean_numeric_value(raw_data.get('MONTHLY_BTC_TRADING_VOL')),
-            'BINANCE_DOMINANCE_PCT': clean_percentage(raw_data.get('BINANCE_TRADING_DOMINANCE')),
-            'BTC_PAIRS_DOMINANCE_PCT': clean_percentage(raw_data.get('BTC_PAIRS_TRADING_DOMINANCE')),
-            'US_TRADING_VOL_USD': us_vol,
-            'US_TRADING_VOL_PCT': us_pct,
-            'OFFSHORE_TRADING_VOL_USD': offshore_vol,
-            'OFFSHORE_TRADING_VOL_PCT': offshore_pct
-        }
-        
-        # 16. Price Performance
-        price_performance = {
-            'TIMESTAMP': timestamp,
-            'DAILY_PERFORMANCE_PCT': clean_percentage(raw_data.get('DAILY_PRICE_PERFORMANCE')),
-            'WEEKLY_PERFORMANCE_PCT': clean_percentage(raw_data.get('WEEKLY_PRICE_PERFORMANCE')),
-            'MONTHLY_PERFORMANCE_PCT': clean_percentage(raw_data.get('MONTHLY_PRICE_PERFORMANCE')),
-            'QUARTERLY_PERFORMANCE_PCT': clean_percentage(raw_data.get('QUARTERLY_PRICE_PERFORMANCE'))
-        }
-        
-        # 17. Gold Comparison
-        gold_comparison = {
-            'TIMESTAMP': timestamp,
-            'GOLD_PRICE_USD': clean_numeric_value(raw_data.get('GOLD_PRICE')),
-            'GOLD_MARKETCAP_USD': clean_numeric_value(raw_data.get('GOLD_MARKETCAP')),
-            'BTC_VS_GOLD_MARKETCAP_PCT': clean_percentage(raw_data.get('BTC_VS_GOLD_MARKETCAP')),
-            'GOLD_CORRELATION': clean_numeric_value(raw_data.get('GOLD_CORRELATION')),
-            'GOLD_SUPPLY_TONNES': clean_numeric_value(raw_data.get('GOLD_SUPPLY_TONNES'))
-        }
-        
-        # 18. Realized Price Metrics
-        realized_price = {
-            'TIMESTAMP': timestamp,
-            'REALIZED_PRICE_USD': clean_numeric_value(raw_data.get('REALIZED_PRICE')),
-            'REALIZED_MARKETCAP_USD': clean_numeric_value(raw_data.get('REALIZED_MARKETCAP')),
-            'STH_REALIZED_PRICE_USD': clean_numeric_value(raw_data.get('STH_REALIZED_PRICE')),
-            'LTH_REALIZED_PRICE_USD': clean_numeric_value(raw_data.get('LTH_REALIZED_PRICE'))
-        }
-        
-        # 19. Address Balances
-        address_balances = {
-            'TIMESTAMP': timestamp,
-            'NEW_ADDRESSES': clean_integer_value(raw_data.get('NEW_ADDRESSES')),
-            'BALANCE_1SAT_TO_001BTC': clean_integer_value(raw_data.get('BALANCE_1SAT_TO_001BTC')),
-            'BALANCE_001_TO_1BTC': clean_integer_value(raw_data.get('BALANCE_001_TO_1BTC')),
-            'BALANCE_1_TO_10BTC': clean_integer_value(raw_data.get('BALANCE_1_TO_10BTC')),
-            'BALANCE_10_TO_100BTC': clean_integer_value(raw_data.get('BALANCE_10_TO_100BTC')),
-            'BALANCE_100_TO_1000BTC': clean_integer_value(raw_data.get('BALANCE_100_TO_1000BTC'))
-        }
-        
-        # 20. Correlations
-        correlations = {
-            'TIMESTAMP': timestamp,
-            'CORRELATION_SPX': clean_numeric_value(raw_data.get('CORRELATION_SPX')),
-            'CORRELATION_GOLD': clean_numeric_value(raw_data.get('CORRELATION_GOLD')),
-            'CORRELATION_IWM': clean_numeric_value(raw_data.get('CORRELATION_IWM')),
-            'CORRELATION_QQQ': clean_numeric_value(raw_data.get('CORRELATION_QQQ')),
-            'CORRELATION_TLT': clean_numeric_value(raw_data.get('CORRELATION_TLT'))
-        }
-        
-        # 21. Onchain Supply
-        onchain_supply = {
-            'TIMESTAMP': timestamp,
-            'LONG_TERM_HOLDER_SUPPLY': clean_numeric_value(raw_data.get('LONG_TERM_HOLDER_SUPPLY')),
-            'SHORT_TERM_HOLDER_SUPPLY': clean_numeric_value(raw_data.get('SHORT_TERM_HOLDER_SUPPLY')),
-            'SUPPLY_IN_PROFIT_PCT': clean_percentage(raw_data.get('PERCENT_SUPPLY_IN_PROFIT')),
-            'TOTAL_SUPPLY_IN_PROFIT': clean_numeric_value(raw_data.get('TOTAL_SUPPLY_IN_PROFIT')),
-            'TOTAL_SUPPLY_IN_LOSS': clean_numeric_value(raw_data.get('TOTAL_SUPPLY_IN_LOSS'))
-        }
-        
-        # 22. Halving Metrics
-        halving_metrics = {
-            'TIMESTAMP': timestamp,
-            'PROJECTED_HALVING_DATE': parse_date(raw_data.get('PROJECTED_HALVING_DATE')),
-            'HALVING_BLOCK_HEIGHT': clean_integer_value(raw_data.get('HALVING_AT_BLOCK')),
-            'BLOCKS_REMAINING': clean_integer_value(raw_data.get('BLOCKS_REMAINING')),
-            'BTC_UNTIL_HALVING': clean_numeric_value(raw_data.get('BTC_UNTIL_HALVING')),
-            'CURRENT_EPOCH_PCT': clean_percentage(raw_data.get('CURRENT_EPOCH_PCT'))
-        }
-        
-        # 23. Onchain Indicators
-        onchain_indicators = {
-            'TIMESTAMP': timestamp,
-            'COIN_DAYS_DESTROYED': clean_numeric_value(raw_data.get('COIN_DAYS_DESTROYED')),
-            'MVRV_Z_SCORE': clean_numeric_value(raw_data.get('MVRV_Z_SCORE')),
-            'NVT_RATIO': clean_numeric_value(raw_data.get('NVT_RATIO')),
-            'RHODL_RATIO': clean_numeric_value(raw_data.get('RHODL_RATIO')),
-            'RESERVE_RISK': clean_numeric_value(raw_data.get('RESERVE_RISK')),
-            'VDD_MULTIPLE': clean_numeric_value(raw_data.get('VDD_MULTIPLE')),
-            'NET_REALIZED_PROFIT_LOSS': clean_numeric_value(raw_data.get('NET_REALIZED_PROFIT_LOSS')),
-            'NUPL': clean_numeric_value(raw_data.get('NUPL')),
-            'ASOL': clean_numeric_value(raw_data.get('ASOL')),
-            'MSOL': clean_numeric_value(raw_data.get('MSOL'))
-        }
-        
-        # 24. Node Metrics
-        node_metrics = {
-            'TIMESTAMP': timestamp,
-            'TOTAL_NODES': clean_integer_value(raw_data.get('TOTAL_NODES')),
-            'TOR_NODES': clean_integer_value(raw_data.get('TOR_NODES')),
-            'TOR_NODES_PCT': None,  # Calculate if needed
-            'US_NODES': clean_integer_value(raw_data.get('US_NODES')),
-            'GERMANY_NODES': clean_integer_value(raw_data.get('GERMANY_NODES')),
-            'FRANCE_NODES': clean_integer_value(raw_data.get('FRANCE_NODES')),
-            'CANADA_NODES': clean_integer_value(raw_data.get('CANADA_NODES')),
-            'FINLAND_NODES': clean_integer_value(raw_data.get('FINLAND_NODES')),
-            'NETHERLANDS_NODES': clean_integer_value(raw_data.get('NETHERLANDS_NODES')),
-            'UK_NODES': clean_integer_value(raw_data.get('UK_NODES')),
-            'SWITZERLAND_NODES': clean_integer_value(raw_data.get('SWITZERLAND_NODES')),
-            'AUSTRALIA_NODES': clean_integer_value(raw_data.get('AUSTRALIA_NODES')),
-            'RUSSIA_NODES': clean_integer_value(raw_data.get('RUSSIA_NODES'))
-        }
-        
-        # 25. Futures Open Interest
-        futures_oi = {
-            'TIMESTAMP': timestamp,
-            'TOTAL_OPEN_INTEREST': clean_numeric_value(raw_data.get('TOTAL_OPEN_INTEREST')),
-            'BINANCE_OI': clean_numeric_value(raw_data.get('BINANCE_OI')),
-            'OKX_OI': clean_numeric_value(raw_data.get('OKX_OI')),
-            'DERIBIT_OI': clean_numeric_value(raw_data.get('DERIBIT_OI')),
-            'BYBIT_OI': clean_numeric_value(raw_data.get('BYBIT_OI')),
-            'BITMEX_OI': clean_numeric_value(raw_data.get('BITMEX_OI')),
-            'BITGET_OI': clean_numeric_value(raw_data.get('BITGET_OI')),
-            'CRYPTOCOM_OI': clean_numeric_value(raw_data.get('CRYPTOCOM_OI')),
-            'KUCOIN_OI': clean_numeric_value(raw_data.get('KUCOIN_OI')),
-            'GATEIO_OI': clean_numeric_value(raw_data.get('GATEIO_OI')),
-            'HUOBI_OI': clean_numeric_value(raw_data.get('HUOBI_OI')),
-            'BITFINEX_OI': clean_numeric_value(raw_data.get('BITFINEX_OI')),
-            'KRAKEN_OI': clean_numeric_value(raw_data.get('KRAKEN_OI'))
-        }
-        
-        # 26. ETF Trading
-        etf_trading = {
-            'TIMESTAMP': timestamp,
-            'SPOT_TRADING_VOLUME': clean_numeric_value(raw_data.get('SPOT_TRADING_VOLUME')),
-            'FUTURES_TRADING_VOLUME': clean_numeric_value(raw_data.get('FUTURES_TRADING_VOLUME')),
-            'TOTAL_SPOT_AUM': clean_numeric_value(raw_data.get('TOTAL_SPOT_AUM')),
-            'TOTAL_BTC_HOLDINGS': clean_numeric_value(raw_data.get('TOTAL_BTC_HOLDINGS'))
-        }
-        
-        # 27. ETF Holdings (Major ones)
-        etf_holdings = {
-            'TIMESTAMP': timestamp,
-            'IBIT_BLACKROCK_BTC': clean_numeric_value(raw_data.get('IBIT_BLACKROCK')),
-            'FBTC_FIDELITY_BTC': clean_numeric_value(raw_data.get('FBTC_FIDELITY')),
-            'GBTC_GRAYSCALE_BTC': clean_numeric_value(raw_data.get('GBTC_GRAYSCALE'))
-        }
+        tables = build_tables(raw_data, timestamp)
         
         # ===== SAVE TO CSV FILES =====
-        os.makedirs(OUTPUT_DIR, exist_ok=True)
-        
-        # Core metric tables
-        tables = {
-            'market_overview': market_overview,
-            'blockchain_metrics': blockchain_metrics,
-            'difficulty_adjustment': difficulty_adjustment,
-            'fear_greed': fear_greed,
-            'mining_metrics': mining_metrics,
-            'fee_metrics': fee_metrics,
-            'supply_metrics': supply_metrics,
-            'corporate_holdings': corporate_holdings,
-            'government_holdings': government_holdings,
-            'transaction_metrics': transaction_metrics,
-            'utxo_metrics': utxo_metrics,
-            'profitable_days': profitable_days,
-            'macro_liquidity': macro_liquidity,
-            'ath_details': ath_details,
-            'trading_metrics': trading_metrics,
-            'price_performance': price_performance,
-            'gold_comparison': gold_comparison,
-            'realized_price': realized_price,
-            'address_balances': address_balances,
-            'correlations': correlations,
-            'onchain_supply': onchain_supply,
-            'halving_metrics': halving_metrics,
-            'onchain_indicators': onchain_indicators,
-            'node_metrics': node_metrics,
-            'futures_oi': futures_oi,
-            'etf_trading': etf_trading,
-            'etf_holdings': etf_holdings,
-        }
-        
-        print("\nSaving core metrics to CSV files...")
-        for table_name, table_data in tables.items():
-            output_file = os.path.join(OUTPUT_DIR, f'{table_name}.csv')
-            file_exists = os.path.isfile(output_file)
-            
-            df = pd.DataFrame([table_data])
-            df.to_csv(output_file, mode='a', header=not file_exists, index=False)
-            print(f"  ✓ {table_name}.csv")
-        
-        # Save table data (companies, ETFs, etc.)
-        print("\nSaving table data...")
-        for table_name, data in scraped_tables.items():
-            if data:
-                output_file = os.path.join(OUTPUT_DIR, f'{table_name.lower()}.csv')
-                
-                # Add timestamp to each row
-                for row in data:
-                    row['TIMESTAMP'] = timestamp
-                
-                df = pd.DataFrame(data)
-                file_exists = os.path.isfile(output_file)
-                df.to_csv(output_file, mode='a', header=not file_exists, index=False)
-                print(f"  ✓ {table_name.lower()}.csv ({len(data)} rows)")
-        
-        # Save raw data for debugging
-        raw_output_file = os.path.join(OUTPUT_DIR, 'raw_data.json')
-        with open(raw_output_file, 'w') as f:
-            json.dump({
-                'timestamp': timestamp.isoformat(),
-                'raw_data': raw_data,
-                'scraped_tables': {k: v for k, v in scraped_tables.items()}
-            }, f, indent=2, default=str)
-        print(f"  ✓ raw_data.json")
+        save_tables(tables, scraped_tables, raw_data, timestamp, sources=sources)
         
         print(f"\n✓ All data saved to {OUTPUT_DIR}")
         
@@ -758,6 +607,13 @@ def fetch_data():
         print(f"An error occurred: {e}")
         import traceback
         traceback.print_exc()
+    finally:
+        cache.save()
+        tiers.save()
 
 if __name__ == "__main__":
-    fetch_data()
+    parser = argparse.ArgumentParser(description="Scrape newhedge.io and append the run to data/newhedge/")
+    parser.add_argument('--from-cache', action='store_true', help="Replay the newest cached page instead of scraping")
+    parser.add_argument('--refresh', action='store_true', help="Scrape even if the current TTL bucket is cached")
+    args = parser.parse_args()
+    fetch_data(from_cache=args.from_cache, refresh=args.refresh)
@@ -1,129 +1,60 @@
+import argparse
 import os
+import shutil
+import tempfile
+import uuid
+from concurrent.futures import ThreadPoolExecutor
 import pandas as pd
-import snowflake.connector
-from snowflake.connector.pandas_tools import write_pandas
 from dotenv import load_dotenv
-from datetime import datetime
+from datetime import datetime, timezone
+from utils.snowflake_session import SnowflakeSession
+from utils.state import StateStore
+from utils.storage import (
+    HAS_PYARROW, PARQUET_FILE_FORMAT, csv_enabled, parquet_enabled, load_local, list_partitions,
+    read_partitions, stream_batches, write_parquet
+)
+from utils.warehouse import connect
 
 load_dotenv()
 
 DATA_DIR = os.path.join(os.path.dirname(os.path.dirname(__file__)), 'data')
 NEWHEDGE_DIR = os.path.join(DATA_DIR, 'newhedge')
+RUNS_DIR = os.path.join(NEWHEDGE_DIR, '_runs')
+# Partitions already merged into Snowflake, per source table
+MANIFEST_FILE = os.path.join(RUNS_DIR, '_manifest.json')
+
+# Bulk load: one PUT for all files, then COPY + MERGE per target table in parallel
+LOAD_STAGE = 'NEWHEDGE_LOAD_STAGE'
+LOAD_WORKERS = int(os.getenv('NEWHEDGE_LOAD_WORKERS', '4'))
+MERGE_KEYS = {'ADDRESS_DISTRIBUTION': ['TIMESTAMP', 'CATEGORY']}
+
+# Export: tables streamed to data/newhedge_export/ in parallel, skipped when unchanged
+EXPORT_WORKERS = int(os.getenv('NEWHEDGE_EXPORT_WORKERS', '4'))
+EXPORT_TABLES_QUERY = """
+SELECT TABLE_NAME, LAST_ALTERED
+FROM INFORMATION_SCHEMA.TABLES
+WHERE TABLE_SCHEMA = 'NEWHEDGE' AND TABLE_TYPE = 'BASE TABLE'
+ORDER BY TABLE_NAME
+"""
 
 def get_snowflake_conn():
     """Create Snowflake connection."""
     try:
-        conn = snowflake.connector.connect(
-            user=os.getenv('SNOWFLAKE_USER'),
-            password=os.getenv('SNOWFLAKE_PASSWORD'),
-            account=os.getenv('SNOWFLAKE_ACCOUNT'),
-            warehouse=os.getenv('SNOWFLAKE_WAREHOUSE'),
-            database=os.getenv('SNOWFLAKE_DATABASE'),
-            schema='NEWHEDGE'
-        )
+        conn = connect(schema='NEWHEDGE')
         return conn
     except Exception as e:
         print(f"Could not connect to Snowflake: {e}")
         return None
 
-def load_csv_to_table(conn, csv_file, table_name, normalize_columns=True):
-    """Load a CSV file into a Snowflake table."""
-    try:
-        df = pd.read_csv(csv_file)
-        
-        if df.empty:
-            print(f"  ⚠️  {csv_file} is empty, skipping...")
-            return False
-        
-        # Normalize column names
-        if normalize_columns:
-            df.columns = [c.upper().replace(' ', '_').replace('(', '').replace(')', '').replace('-', '_') for c in df.columns]
-        
-        # Convert timestamp columns
-        if 'TIMESTAMP' in df.columns:
-            df['TIMESTAMP'] = pd.to_datetime(df['TIMESTAMP'])
-        
-        # Use MERGE to upsert data (update if exists, insert if not)
-        # For simplicity, we'll use write_pandas with overwrite=False (append mode)
-        # In production, you'd want proper MERGE logic
-        
-        success, n_chunks, n_rows, _ = write_pandas(
-            conn,
-            df,
-            table_name,
-            auto_create_table=False,  # Tables already created by migration
-            overwrite=False,  # Append mode
-            quote_identifiers=False
-        )
-        
-        if success:
-            print(f"  ✓ Loaded {n_rows} rows into NEWHEDGE.{table_name}")
-            return True
-        else:
-            print(f"  ✗ Failed to load into {table_name}")
-            return False
-            
-    except Exception as e:
-        print(f"  ✗ Error loading {csv_file} to {table_name}: {e}")
-        return False
-
-def merge_data_to_table(conn, df, table_name, merge_key='TIMESTAMP'):
-    """Merge data into table using MERGE statement."""
-    try:
-        cursor = conn.cursor()
-        
-        # Create temp table
-        temp_table = f"{table_name}_TEMP_{datetime.now().strftime('%Y%m%d%H%M%S')}"
-        
-        # Write to temp table
-        success, n_chunks, n_rows, _ = write_pandas(
-            conn,
-            df,
-            temp_table,
-            auto_create_table=True,
-            quote_identifiers=False
-        )
-        
-        if not success:
-            print(f"  ✗ Failed to create temp table {temp_table}")
-            return False
-        
-        # Build column list
-        columns = df.columns.tolist()
-        col_list = ', '.join(columns)
-        update_list = ', '.join([f"TARGET.{col} = SOURCE.{col}" for col in columns if col != merge_key])
-        insert_cols = ', '.join(columns)
-        insert_vals = ', '.join([f"SOURCE.{col}" for col in columns])
-        
-        # Execute MERGE
-        merge_sql = f"""
-        MERGE INTO NEWHEDGE.{table_name} AS TARGET
-        USING {temp_table} AS SOURCE
-        ON TARGET.{merge_key} = SOURCE.{merge_key}
-        WHEN MATCHED THEN
-            UPDATE SET {update_list}
-        WHEN NOT MATCHED THEN
-            INSERT ({insert_cols})
-            VALUES ({insert_vals})
-        """
-        
-        cursor.execute(merge_sql)
-        rows_merged = cursor.rowcount
-        
-        # Drop temp table
-        cursor.execute(f"DROP TABLE IF EXISTS {temp_table}")
-        
-        print(f"  ✓ Merged {rows_merged} rows into NEWHEDGE.{table_name}")
-        
-        cursor.close()
-        return True
-        
-    except Exception as e:
-        print(f"  ✗ Error merging into {table_name}: {e}")
-        return False
-
-def load_newhedge_data(conn):
-    """Load all NewHedge CSV files into Snowflake tables."""
+def load_newhedge_data(conn, full=False):
+    """
+    Load the NewHedge runs not yet in the manifest into Snowflake tables.
+    full=True reloads the whole history from the flat tables (Parquet when
+    available, else CSV) and marks every existing run partition as loaded.
+    Requires pyarrow: every target is staged as a Parquet file.
+    """
+    if not HAS_PYARROW:
+        raise ImportError("pyarrow is required to load NewHedge data (pip install -r requirements.txt)")
     
     # Mapping of CSV files to table names
     file_table_mapping = {
@@ -158,79 +89,233 @@ def load_newhedge_data(conn):
     
     print("Loading NewHedge data into Snowflake...")
     
-    # Process files that can be directly loaded
+    manifest = StateStore(MANIFEST_FILE)
+    batches = collect_batches(file_table_mapping, manifest, full)
+    if not batches:
+        return
+    
+    # One wide frame per target, so each target row is written by a single MERGE
+    frames = {table_name: coalesce_sources(table_name, items) for table_name, items in batches.items()}
+    
+    loaded_targets = bulk_load(conn, frames)
+    
+    # Only record the runs of targets whose MERGE went through
+    for table_name in loaded_targets:
+        for source, _, pending in batches[table_name]:
+            loaded = set(manifest.get(source, 'loaded', []))
+            manifest.update(source, loaded=sorted(loaded | set(pending)),
+                            loaded_at=datetime.now(timezone.utc).isoformat())
+    manifest.save()
+
+def normalize_frame(df):
+    """Upper-cases and sanitizes column names and parses TIMESTAMP."""
+    df.columns = [c.upper().replace(' ', '_').replace('(', '').replace(')', '').replace('-', '_') for c in df.columns]
+    if 'TIMESTAMP' in df.columns:
+        df['TIMESTAMP'] = pd.to_datetime(df['TIMESTAMP'])
+    return df
+
+def collect_batches(file_table_mapping, manifest, full=False):
+    """
+    Reads the data to load for every source file.
+    Returns {table_name: [(source, df, partitions), ...]} for the targets with new data.
+    """
+    batches = {}
     for csv_file, table_name in file_table_mapping.items():
-        csv_path = os.path.join(NEWHEDGE_DIR, csv_file)
+        source = csv_file.replace('.csv', '')
+        partitions = list_partitions(RUNS_DIR, source)
+        loaded = set(manifest.get(source, 'loaded', []))
+        pending = partitions if full else [p for p in partitions if p not in loaded]
         
-        if not os.path.exists(csv_path):
-            print(f"  ⚠️  {csv_file} not found, skipping...")
+        if not full and not pending:
+            print(f"  ✓ {csv_file} up to date ({len(loaded)} runs loaded)")
             continue
         
-        print(f"Processing {csv_file} -> {table_name}...")
-        
         try:
-            df = pd.read_csv(csv_path)
+            if full:
+                df = load_local(os.path.join(NEWHEDGE_DIR, csv_file), 'newhedge')
+            else:
+                df = read_partitions(RUNS_DIR, source, pending)
+            
+            if df is None:
+                print(f"  ⚠️  {csv_file} not found, skipping...")
+                continue
             
             if df.empty:
                 print(f"  ⚠️  {csv_file} is empty, skipping...")
                 continue
             
-            # Normalize columns
-            df.columns = [c.upper().replace(' ', '_').replace('(', '').replace(')', '').replace('-', '_') for c in df.columns]
-            
-            # Convert timestamp
-            if 'TIMESTAMP' in df.columns:
-                df['TIMESTAMP'] = pd.to_datetime(df['TIMESTAMP'])
-            
-            # Merge data
-            merge_data_to_table(conn, df, table_name)
+            print(f"  {csv_file} -> {table_name}: {len(df)} rows ({'full history' if full else f'{len(pending)} new runs'})")
+            batches.setdefault(table_name, []).append((source, normalize_frame(df), pending))
             
         except Exception as e:
-            print(f"  ✗ Error processing {csv_file}: {e}")
+            print(f"  ✗ Error reading {csv_file}: {e}")
+    return batches
+
+def coalesce_sources(table_name, items):
+    """
+    Joins the frames of every source feeding one target on its merge keys.
+    Returns one row per key holding the last non-null value of each column.
+    """
+    frames = [df for _, df, _ in items]
+    combined = frames[0] if len(frames) == 1 else pd.concat(frames, ignore_index=True, sort=False)
+    keys = [c for c in MERGE_KEYS.get(table_name, ['TIMESTAMP']) if c in combined.columns]
+    if not keys or (len(frames) == 1 and not combined.duplicated(keys).any()):
+        return combined
+    return combined.groupby(keys, sort=True).last().reset_index()
+
+def bulk_load(conn, frames):
+    """
+    Stages one Parquet file per target in a single PUT, then loads each
+    target with one COPY into a temporary staging table and one set-based
+    MERGE. Targets are independent and run concurrently.
+    Returns the set of targets that were merged.
+    """
+    session = SnowflakeSession(lambda: conn, schemas=('NEWHEDGE',))
+    prefix = uuid.uuid4().hex
+    tmp_dir = tempfile.mkdtemp()
+    cursor = conn.cursor()
+    try:
+        for table_name, df in frames.items():
+            write_parquet(df, os.path.join(tmp_dir, f"{table_name}.parquet"))
+        
+        cursor.execute(f"CREATE TEMPORARY STAGE IF NOT EXISTS {LOAD_STAGE}")
+        upload_path = os.path.join(tmp_dir, '*.parquet').replace('\\', '/')
+        cursor.execute(f"PUT 'file://{upload_path}' @{LOAD_STAGE}/{prefix}/ AUTO_COMPRESS=FALSE OVERWRITE=TRUE")
+        print(f"  ✓ Staged {len(frames)} tables ({sum(len(df) for df in frames.values())} rows)")
+        
+        with ThreadPoolExecutor(max_workers=LOAD_WORKERS) as pool:
+            futures = {
+                table_name: pool.submit(
+                    merge_staged_table, conn, table_name, prefix,
+                    session.table_columns('NEWHEDGE', table_name), set(df.columns)
+                )
+                for table_name, df in frames.items()
+            }
+        loaded = set()
+        for table_name, future in futures.items():
+            try:
+                if future.result():
+                    loaded.add(table_name)
+            except Exception as e:
+                print(f"  ✗ Error merging into {table_name}: {e}")
+        return loaded
+    finally:
+        try:
+            cursor.execute(f"REMOVE @{LOAD_STAGE}/{prefix}/")
+        except Exception:
+            pass
+        cursor.close()
+        shutil.rmtree(tmp_dir, ignore_errors=True)
+
+def merge_staged_table(conn, table_name, prefix, table_columns, batch_columns):
+    """COPYs the staged file of one target into a staging table and MERGEs it."""
+    columns = [c for c in table_columns if c in batch_columns]
+    keys = [c for c in MERGE_KEYS.get(table_name, ['TIMESTAMP']) if c in columns]
+    if not keys:
+        print(f"  ⚠️  No {'/'.join(MERGE_KEYS.get(table_name, ['TIMESTAMP']))} column for NEWHEDGE.{table_name}, skipping...")
+        return False
+    
+    staging_table = f"NEWHEDGE.{table_name}_STAGE_{uuid.uuid4().hex[:8]}"
+    cursor = conn.cursor()
+    try:
+        cursor.execute(f"CREATE TEMPORARY TABLE {staging_table} LIKE NEWHEDGE.{table_name}")
+        cursor.execute(f"""
+        COPY INTO {staging_table}
+        FROM @{LOAD_STAGE}/{prefix}/
+        FILES = ('{table_name}.parquet')
+        FILE_FORMAT = {PARQUET_FILE_FORMAT}
+        MATCH_BY_COLUMN_NAME = CASE_INSENSITIVE
+        """)
+        
+        # The staged frame is already one row per key (coalesce_sources)
+        values = [c for c in columns if c not in keys]
+        on_clause = ' AND '.join(f'TARGET."{c}" = SOURCE."{c}"' for c in keys)
+        update_list = ', '.join(f'TARGET."{c}" = COALESCE(SOURCE."{c}", TARGET."{c}")' for c in values)
+        insert_cols = ', '.join(f'"{c}"' for c in columns)
+        insert_vals = ', '.join(f'SOURCE."{c}"' for c in columns)
+        
+        merge_sql = f"""
+        MERGE INTO NEWHEDGE.{table_name} AS TARGET
+        USING {staging_table} AS SOURCE
+        ON {on_clause}
+        {f'WHEN MATCHED THEN UPDATE SET {update_list}' if values else ''}
+        WHEN NOT MATCHED THEN
+            INSERT ({insert_cols})
+            VALUES ({insert_vals})
+        """
+        cursor.execute(merge_sql)
+        print(f"  ✓ Merged {cursor.rowcount} rows into NEWHEDGE.{table_name}")
+        return True
+    finally:
+        cursor.close()
+
+def export_paths(table_name, export_dir):
+    """(csv_path, parquet_path) of a table export; None for a format that is not enabled."""
+    csv_path = os.path.join(export_dir, f"{table_name.lower()}.csv") if csv_enabled() else None
+    parquet_path = os.path.join(export_dir, f"{table_name.lower()}.parquet") if parquet_enabled() else None
+    return csv_path, parquet_path
+
+def export_table(conn, table_name, export_dir):
+    """Streams one table to export_dir batch by batch. Returns the number of rows written."""
+    csv_path, parquet_path = export_paths(table_name, export_dir)
+    cursor = conn.cursor()
+    try:
+        cursor.execute(f"SELECT * FROM NEWHEDGE.{table_name} ORDER BY TIMESTAMP DESC")
+        return stream_batches(cursor.fetch_arrow_batches(), csv_path, parquet_path)
+    finally:
+        cursor.close()
 
 def export_snowflake_to_csv(conn):
-    """Export all NewHedge tables from Snowflake to CSV files."""
+    """
+    Export all NewHedge tables from Snowflake to CSV (and/or Parquet, see DATA_FORMAT).
+    Tables are exported concurrently, each streamed to disk in Arrow batches;
+    tables whose LAST_ALTERED has not moved since the previous export are skipped.
+    """
     
     print("\nExporting Snowflake tables to CSV...")
     
+    export_dir = os.path.join(DATA_DIR, 'newhedge_export')
+    os.makedirs(export_dir, exist_ok=True)
+    state = StateStore(os.path.join(export_dir, '_export_state.json'))
+    
+    # Get list of tables in NEWHEDGE schema, with their last modification
     cursor = conn.cursor()
+    cursor.execute(EXPORT_TABLES_QUERY)
+    tables = {row[0]: str(row[1]) for row in cursor.fetchall()}
+    cursor.close()
     
-    # Get list of tables in NEWHEDGE schema
-    cursor.execute("SHOW TABLES IN SCHEMA NEWHEDGE")
-    tables = [row[1] for row in cursor.fetchall()]
+    pending = []
+    for table_name, last_altered in tables.items():
+        exported = all(os.path.exists(path) for path in export_paths(table_name, export_dir) if path)
+        if exported and state.get(table_name, 'last_altered') == last_altered:
+            print(f"  ✓ NEWHEDGE.{table_name} unchanged since the last export, skipping...")
+        else:
+            pending.append(table_name)
     
-    export_dir = os.path.join(DATA_DIR, 'newhedge_export')
-    os.makedirs(export_dir, exist_ok=True)
+    with ThreadPoolExecutor(max_workers=EXPORT_WORKERS) as pool:
+        futures = {table_name: pool.submit(export_table, conn, table_name, export_dir) for table_name in pending}
     
-    for table_name in tables:
+    for table_name, future in futures.items():
         try:
-            print(f"Exporting NEWHEDGE.{table_name}...")
-            
-            # Query all data from table
-            query = f"SELECT * FROM NEWHEDGE.{table_name} ORDER BY TIMESTAMP DESC"
-            cursor.execute(query)
-            
-            # Fetch results
-            df = cursor.fetch_pandas_all()
-            
-            if df.empty:
+            rows = future.result()
+            if not rows:
                 print(f"  ⚠️  {table_name} is empty, skipping...")
                 continue
-            
-            # Export to CSV
-            output_file = os.path.join(export_dir, f"{table_name.lower()}.csv")
-            df.to_csv(output_file, index=False)
-            
-            print(f"  ✓ Exported {len(df)} rows to {output_file}")
-            
+            state.update(table_name, last_altered=tables[table_name], rows=rows,
+                         exported_at=datetime.now(timezone.utc).isoformat())
+            print(f"  ✓ Exported {rows} rows of NEWHEDGE.{table_name}")
         except Exception as e:
             print(f"  ✗ Error exporting {table_name}: {e}")
     
-    cursor.close()
+    state.save()
     print(f"\n✓ All tables exported to {export_dir}")
 
 def main():
     """Main execution function."""
+    parser = argparse.ArgumentParser(description="Load NewHedge runs into Snowflake and export the tables to CSV")
+    parser.add_argument('--full', action='store_true', help="Reload the whole history instead of only the new runs")
+    args = parser.parse_args()
+
     conn = get_snowflake_conn()
     
     if not conn:
@@ -240,7 +325,7 @@ def main():
     print("✓ Connected to Snowflake")
     
     # Load data into Snowflake
-    load_newhedge_data(conn)
+    load_newhedge_data(conn, full=args.full)
     
     # Export data back to CSV
     export_snowflake_to_csv(conn)
@@ -0,0 +1,226 @@
+#!/usr/bin/env python3
+"""
+NewHedge Bulk Reprocessing
+This script:
+1. Streams the raw snapshot archive written by fetch_newhedge.py (data/newhedge/_archive/raw_*.jsonl.gz)
+   and, if given, stored HTML pages (data/newhedge/_snapshots/, re-extracted with the current selectors)
+2. Parses and cleans the snapshots in parallel worker processes with the current cleaners and table
+   schema (scripts/utils/utils.py, scripts/utils/newhedge_schema.py), one chunk of snapshots per task
+3. Rebuilds every core metric and scraped table from scratch, ordered by run timestamp
+   (runs are identified by their timestamp to the second, as in the run partitions: a run archived
+   twice is kept once and a re-extracted HTML page replaces the archived record), so the output only
+   depends on the inputs
+4. Reports throughput in snapshots per second
+
+The rebuilt tables are written to --output-dir (CSV and/or Parquet, see
+DATA_FORMAT), never over data/newhedge/, so they can be compared before
+being swapped in.
+
+Usage:
+    python scripts/reprocess_newhedge.py
+    python scripts/reprocess_newhedge.py --workers 8 --chunk-size 1000 --output-dir /tmp/newhedge
+    python scripts/reprocess_newhedge.py data/newhedge/_archive/raw_2025-01.jsonl.gz data/newhedge/raw_data.json
+    python scripts/reprocess_newhedge.py data/newhedge/_archive data/newhedge/_snapshots --backend lxml
+"""
+
+import argparse
+import gzip
+import os
+import re
+import time
+from datetime import datetime, timezone
+from functools import partial
+from itertools import chain
+
+import pandas as pd
+
+from fetch_newhedge import (
+    ARCHIVE_DIR, extract_chunk, columns_to_tables, merge_tiers, read_snapshot
+)
+from utils.columnar import rows_to_frame
+from utils.http_client import json_loads
+from utils.newhedge_schema import COMPILED_SCHEMA
+from utils.parallel import chunked, map_ordered
+from utils.parsers import BACKENDS
+from utils.storage import DATA_DIR, save_local
+
+DEFAULT_OUTPUT_DIR = os.path.join(DATA_DIR, 'newhedge_reprocessed')
+ARCHIVE_SUFFIXES = ('.jsonl.gz', '.jsonl', '.json')
+SNAPSHOT_SUFFIXES = ('.html.gz', '.html')
+# <UTC timestamp>[.<tier>].html[.gz], as written by fetch_newhedge.save_snapshot (no tier: a Firecrawl render)
+SNAPSHOT_NAME = re.compile(r'^(\d{8}T\d{6}Z)(?:\.(\w+))?\.html(?:\.gz)?$')
+TIER_ORDER = ['http', 'firecrawl']
+
+
+def archive_files(paths):
+    """The archive and HTML snapshot files under the given files and directories, oldest first."""
+    files = []
+    for path in paths:
+        if os.path.isdir(path):
+            files.extend(
+                os.path.join(path, name) for name in sorted(os.listdir(path))
+                if name.endswith(ARCHIVE_SUFFIXES + SNAPSHOT_SUFFIXES)
+            )
+        elif os.path.exists(path):
+            files.append(path)
+        else:
+            print(f"Warning: {path} does not exist, skipping.")
+    return files
+
+
+def read_snapshots(files):
+    """
+    Yields the encoded snapshots of each file without decoding them (workers
+    do). A .json file (e.g. raw_data.json) is one snapshot.
+    """
+    for path in files:
+        opener = gzip.open if path.endswith('.gz') else open
+        with opener(path, 'rb') as f:
+            if path.endswith('.json'):
+                yield f.read()
+                continue
+            for line in f:
+                if line.strip():
+                    yield line
+
+
+def snapshot_runs(files):
+    """
+    Groups HTML snapshot files by run: [(timestamp, [(tier, path)])], oldest
+    run first and the plain HTTP page before the Firecrawl render, as merged
+    by fetch_newhedge.merge_tiers.
+    """
+    runs = {}
+    for path in files:
+        match = SNAPSHOT_NAME.match(os.path.basename(path))
+        if not match:
+            print(f"Warning: {path} is not named <timestamp>[.<tier>].html[.gz], skipping.")
+            continue
+        stamp, tier = match.group(1), match.group(2) or 'firecrawl'
+        runs.setdefault(stamp, []).append((tier, path))
+    return [
+        (datetime.strptime(stamp, '%Y%m%dT%H%M%SZ').replace(tzinfo=timezone.utc),
+         sorted(pages, key=lambda page: TIER_ORDER.index(page[0]) if page[0] in TIER_ORDER else len(TIER_ORDER)))
+        for stamp, pages in sorted(runs.items())
+    ]
+
+
+def clean_records(records):
+    """
+    Cleans a chunk of raw records into {table: DataFrame} (core metric
+    tables through the compiled schema, scraped tables stamped with their
+    run timestamp). Returns (run timestamps, frames).
+    """
+    runs = {}
+    for record in records:
+        timestamp = datetime.fromisoformat(record['timestamp'])
+        runs[timestamp.replace(microsecond=0)] = (timestamp, record)  # a run recorded twice: the last one
+    timestamps = [timestamp for timestamp, _ in runs.values()]
+    records = [record for _, record in runs.values()]
+    frames = COMPILED_SCHEMA.transform((record.get('raw_data') or {} for record in records), timestamps)
+
+    scraped = {}
+    for record, timestamp in zip(records, timestamps):
+        for table_name, rows in (record.get('scraped_tables') or {}).items():
+            scraped.setdefault(table_name.lower(), []).extend({**row, 'TIMESTAMP': timestamp} for row in rows or [])
+    for table_name, rows in scraped.items():
+        if rows and table_name not in frames:
+            frames[table_name] = rows_to_frame(rows)
+    return timestamps, frames
+
+
+def process_task(task, backend=None):
+    """
+    Worker: one chunk of archived JSON lines ('json') or of HTML snapshot
+    runs ('html', parsed and extracted here, tiers merged per run).
+    """
+    kind, chunk = task
+    if kind == 'json':
+        return clean_records([json_loads(line) for line in chunk])
+
+    extracted = iter(extract_chunk([path for _, pages in chunk for _, path in pages], backend, load=read_snapshot))
+    records = []
+    for timestamp, pages in chunk:
+        results = {tier: (raw_data, columns_to_tables(columns)) for (tier, _), (raw_data, columns) in zip(pages, extracted)}
+        raw_data, scraped_tables, sources = merge_tiers(results)
+        records.append({
+            'timestamp': timestamp.isoformat(), 'raw_data': raw_data,
+            'scraped_tables': scraped_tables, 'sources': sources
+        })
+    return clean_records(records)
+
+
+def run_key(timestamp):
+    return pd.Timestamp(timestamp).floor('s')
+
+
+def finalize(frames, latest):
+    """
+    Concatenates a table's (chunk number, frame) pairs, keeps each run's rows
+    only from the last chunk that recorded the run (latest: {run: chunk
+    number}) and orders them by run.
+    """
+    df = pd.concat([frame.assign(_CHUNK=seq) for seq, frame in frames], ignore_index=True)
+    df = df[df['_CHUNK'] == df['TIMESTAMP'].dt.floor('s').map(latest)].drop(columns='_CHUNK')
+    return df.sort_values('TIMESTAMP', kind='stable').reset_index(drop=True)
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Rebuild every NewHedge table from the raw snapshot archive")
+    parser.add_argument('inputs', nargs='*', default=[ARCHIVE_DIR],
+                        help="Archive files or directories (.jsonl.gz, .jsonl, raw_data.json, .html[.gz] snapshots). "
+                             "Defaults to data/newhedge/_archive/")
+    parser.add_argument('--output-dir', default=DEFAULT_OUTPUT_DIR, help="Directory the rebuilt tables are written to")
+    parser.add_argument('--workers', type=int, default=os.cpu_count() or 1, help="Worker processes (1 cleans in-process)")
+    parser.add_argument('--chunk-size', type=int, default=500, help="Archived snapshots per worker task")
+    parser.add_argument('--html-chunk-size', type=int, default=4, help="HTML snapshot runs per worker task")
+    parser.add_argument('--backend', choices=sorted(BACKENDS), help="Parser backend for HTML snapshots (default: NEWHEDGE_PARSER)")
+    args = parser.parse_args()
+
+    files = archive_files(args.inputs)
+    archives = [path for path in files if path.endswith(ARCHIVE_SUFFIXES)]
+    runs = snapshot_runs([path for path in files if path.endswith(SNAPSHOT_SUFFIXES)])
+    if not archives and not runs:
+        print("No archived snapshots found.")
+        return
+    print(f"Reprocessing {len(archives)} archive file(s) and {len(runs)} HTML snapshot run(s) with {args.workers} worker(s)...")
+
+    # HTML runs come last, so a re-extracted page replaces the archived record of the same run
+    tasks = chain(
+        (('json', chunk) for chunk in chunked(read_snapshots(archives), args.chunk_size)),
+        (('html', chunk) for chunk in chunked(runs, args.html_chunk_size)),
+    )
+    tables = {}
+    latest = {}
+    total = 0
+    started = time.perf_counter()
+    results = map_ordered(partial(process_task, backend=args.backend), tasks, args.workers)
+    for seq, (timestamps, frames) in enumerate(results):
+        total += len(timestamps)
+        latest.update((run_key(timestamp), seq) for timestamp in timestamps)
+        for table_name, df in frames.items():
+            tables.setdefault(table_name, []).append((seq, df))
+    elapsed = time.perf_counter() - started
+    print(f"Parsed and cleaned {total} snapshots in {elapsed:.2f}s ({total / elapsed if elapsed else 0:.0f} snapshots/s)")
+    if not total:
+        return
+
+    print(f"\nWriting tables to {args.output_dir}...")
+    os.makedirs(args.output_dir, exist_ok=True)
+    write_started = time.perf_counter()
+    for table_name, frames in tables.items():
+        df = finalize(frames, latest)
+        if df.empty:
+            continue
+        output_file = os.path.join(args.output_dir, f'{table_name}.csv')
+        save_local(df, output_file, 'newhedge', time_column='TIMESTAMP',
+                   root=os.path.join(args.output_dir, 'parquet'))
+        print(f"  ✓ {table_name}.csv ({len(df)} rows)")
+
+    total_elapsed = time.perf_counter() - started
+    print(f"\n✓ Rebuilt {len(tables)} tables from {total} snapshots in {total_elapsed:.2f}s "
+          f"(write {time.perf_counter() - write_started:.2f}s, {total / total_elapsed:.0f} snapshots/s overall)")
+
+
+if __name__ == "__main__":
+    main()
@@ -7,6 +7,7 @@ This script:
 3. Exports the updated Snowflake tables back to CSV files
 """
 
+import argparse
 import os
 import sys
 import subprocess
@@ -39,6 +40,11 @@ def run_step(step_name, command, description):
 
 def main():
     """Run the complete NewHedge data pipeline."""
+    parser = argparse.ArgumentParser(description="Fetch, load and export NewHedge data")
+    parser.add_argument('--from-cache', action='store_true', help="Replay the newest cached page instead of scraping")
+    parser.add_argument('--refresh', action='store_true', help="Scrape even if the current TTL bucket is cached")
+    args = parser.parse_args()
+    fetch_flags = ''.join(flag for flag, enabled in [(' --from-cache', args.from_cache), (' --refresh', args.refresh)] if enabled)
     
     print("""
     ╔════════════════════════════════════════════════════════════════╗
@@ -53,7 +59,7 @@ def main():
     # Step 1: Fetch NewHedge data
     success = run_step(
         "1/3",
-        "python scripts/fetch_newhedge.py",
+        f"python scripts/fetch_newhedge.py{fetch_flags}",
         "Fetching data from NewHedge.io"
     )
     
@@ -1,8 +1,8 @@
 import os
 import pandas as pd
-import snowflake.connector
-from snowflake.connector.pandas_tools import write_pandas
 from dotenv import load_dotenv
+from utils.storage import list_tables, load_local, parquet_columns, parquet_files, copy_parquet_into
+from utils.warehouse import connect, write_pandas
 
 load_dotenv()
 
@@ -10,23 +10,23 @@ DATA_DIR = os.path.join(os.path.dirname(os.path.dirname(__file__)), 'data')
 
 def get_snowflake_conn():
     try:
-        conn = snowflake.connector.connect(
-            user=os.getenv('SNOWFLAKE_USER'),
-            password=os.getenv('SNOWFLAKE_PASSWORD'),
-            account=os.getenv('SNOWFLAKE_ACCOUNT'),
-            warehouse=os.getenv('SNOWFLAKE_WAREHOUSE'),
-            database=os.getenv('SNOWFLAKE_DATABASE'),
-            schema=os.getenv('SNOWFLAKE_SCHEMA')
-        )
+        conn = connect(schema=os.getenv('SNOWFLAKE_SCHEMA'))
         return conn
     except Exception as e:
         print(f"Could not connect to Snowflake: {e}")
         return None
 
+def sanitize_column(name):
+    return name.upper().replace(' ', '_').replace('(', '').replace(')', '').replace('-', '_')
+
 def upload_folder(conn, folder_name, schema_name='PUBLIC'):
-    """Upload CSV files from a folder to Snowflake with schema support."""
+    """
+    Upload a folder's tables to Snowflake with schema support.
+    Tables with a Parquet dataset (see DATA_FORMAT) are loaded from it with
+    PUT + COPY; the rest are read from CSV and loaded with write_pandas.
+    """
     folder_path = os.path.join(DATA_DIR, folder_name)
-    if not os.path.exists(folder_path):
+    if not os.path.exists(folder_path) and not list_tables(folder_name):
         return
 
     # Set the schema
@@ -34,38 +34,50 @@ def upload_folder(conn, folder_name, schema_name='PUBLIC'):
     cursor.execute(f"USE SCHEMA {schema_name}")
     cursor.close()
 
+    # Table name based on file name
+    # For CoinDesk: use the existing table names from migration
+    tables = {}
     for root, dirs, files in os.walk(folder_path):
         for file in files:
             if file.endswith(".csv"):
-                file_path = os.path.join(root, file)
-                print(f"Processing {file_path}...")
-                
-                try:
-                    df = pd.read_csv(file_path)
-                    
-                    # sanitize columns
-                    df.columns = [c.upper().replace(' ', '_').replace('(', '').replace(')', '').replace('-', '_') for c in df.columns]
-                    
-                    # Table name based on file name
-                    # For CoinDesk: use the existing table names from migration
-                    table_name = file.replace('.csv', '').upper()
-                    
-                    # Write to snowflake
-                    success, n_chunks, n_rows, _ = write_pandas(
-                        conn,
-                        df,
-                        table_name,
-                        auto_create_table=False,  # Tables created by migration
-                        quote_identifiers=False
-                    )
-                    
-                    if success:
-                        print(f"Uploaded {n_rows} rows to {schema_name}.{table_name}")
-                    else:
-                        print(f"Failed to upload {file} to {schema_name}.{table_name}")
-                        
-                except Exception as e:
-                    print(f"Error uploading {file}: {e}")
+                tables[file.replace('.csv', '').upper()] = os.path.join(root, file)
+    for name in list_tables(folder_name):
+        tables.setdefault(name.upper(), None)
+
+    for table_name, file_path in tables.items():
+        print(f"Processing {file_path or table_name}...")
+
+        try:
+            # Typed Parquet: one COPY matched by column name, no pandas round-trip
+            columns = parquet_columns(folder_name, table_name)
+            if columns and all(sanitize_column(c) == c.upper() for c in columns):
+                n_rows = copy_parquet_into(conn, parquet_files(folder_name, table_name), schema_name, table_name)
+                print(f"Uploaded {n_rows} rows to {schema_name}.{table_name} (Parquet COPY)")
+                continue
+
+            df = load_local(file_path or '', folder_name, table_name)
+            if df is None:
+                continue
+
+            # sanitize columns
+            df.columns = [sanitize_column(c) for c in df.columns]
+
+            # Write to snowflake
+            success, n_chunks, n_rows, _ = write_pandas(
+                conn,
+                df,
+                table_name,
+                auto_create_table=False,  # Tables created by migration
+                quote_identifiers=False
+            )
+
+            if success:
+                print(f"Uploaded {n_rows} rows to {schema_name}.{table_name}")
+            else:
+                print(f"Failed to upload {table_name} to {schema_name}.{table_name}")
+
+        except Exception as e:
+            print(f"Error uploading {table_name}: {e}")
 
 def main():
     conn = get_snowflake_conn()
@@ -0,0 +1,225 @@
+"""
+CryptoCompare endpoint registry.
+
+Every endpoint of config.yml is declared once with its parser, unique key,
+column dtypes, target table and (for histo endpoints) point interval:
+
+    register('histohour', HistoParser, unique_key='TIME', dtypes=OHLCV_DTYPES, interval=3600)
+
+A parser only knows how to pull rows out of one payload (rows()) and how to
+turn a list of rows into a frame (frame()). Endpoint.parse_many() gathers the
+rows of any number of payloads (the endpoints of several runs, or the
+backfill windows of one endpoint) and builds a single frame from them, so
+the columnar construction and dtype casts run once per batch. Parsing does
+no I/O; fetching, loading and exporting stay in fetch_coindesk.py.
+"""
+
+import logging
+from datetime import datetime, timezone
+from itertools import chain
+
+from utils.columnar import records_to_frame, rows_to_frame
+
+logger = logging.getLogger(__name__)
+
+OHLCV_DTYPES = {
+    'time': 'int64',
+    'open': 'float64',
+    'high': 'float64',
+    'low': 'float64',
+    'close': 'float64',
+    'volume': 'float64',
+}
+
+BALANCE_DISTRIBUTION_DTYPES = {
+    'time': 'int64',
+    'id': 'Int64',
+    'addressesCount': 'Int64',
+    'from': 'float64',
+    'to': 'float64',
+    'totalVolume': 'float64',
+}
+
+
+def payload_rows(payload):
+    """Returns the list of rows inside a CryptoCompare payload (Data.Data or Data)."""
+    data = payload.get('Data') if isinstance(payload, dict) else None
+    if isinstance(data, dict) and isinstance(data.get('Data'), list):
+        return data['Data']
+    if isinstance(data, list):
+        return data
+    return None
+
+
+class PayloadParser:
+    """
+    Generic parser: Data.Data or Data rows, a Data object as one row, or the
+    payload itself as one row.
+    """
+
+    def rows(self, payload):
+        rows = payload_rows(payload)
+        if rows is not None:
+            return rows
+        if isinstance(payload, dict) and isinstance(payload.get('Data'), dict):
+            return [payload['Data']]
+        if isinstance(payload, list):
+            return payload
+        return [payload]
+
+    def frame(self, rows):
+        return rows_to_frame(rows)
+
+
+class RowsParser(PayloadParser):
+    """Data.Data or Data row lists only (histo, social and news endpoints)."""
+
+    def rows(self, payload):
+        return payload_rows(payload) or []
+
+
+class HistoParser(RowsParser):
+    """OHLCV rows: volumeto becomes volume, conversion and volumefrom columns are dropped."""
+
+    DROP_COLUMNS = ['volumeto', 'volumefrom', 'conversionType', 'conversionSymbol']
+
+    def frame(self, rows):
+        df = rows_to_frame(rows)
+        if 'volumeto' in df.columns:
+            df['volume'] = df['volumeto']
+        return df.drop(columns=[c for c in self.DROP_COLUMNS if c in df.columns])
+
+
+class PriceSnapshotParser(PayloadParser):
+    """pricemultifull: one row per payload from RAW.BTC.USD."""
+
+    def rows(self, payload):
+        try:
+            raw_data = payload.get('RAW', {}).get('BTC', {}).get('USD', {})
+        except AttributeError:
+            return []
+        return [raw_data] if raw_data else []
+
+
+class BalanceDistributionParser(RowsParser):
+    """One row per day and balance bucket, flattened from the nested balance_distribution arrays."""
+
+    RECORD_KEY = 'balance_distribution'
+    META = ['id', 'symbol', 'partner_symbol', 'time']
+
+    def rows(self, payload):
+        data = payload.get('Data') if isinstance(payload, dict) else None
+        if isinstance(data, dict) and isinstance(data.get('Data'), list):
+            return data['Data']
+        return []
+
+    def frame(self, rows):
+        if rows and self.RECORD_KEY in rows[0]:
+            return records_to_frame(rows, self.RECORD_KEY, meta=self.META)
+        return rows_to_frame(rows)
+
+
+class TradingSignalsParser(PayloadParser):
+    """IntoTheBlock signals flattened to <signal>_sentiment / <signal>_value columns, one row per payload."""
+
+    # Map new API field names to old Snowflake column names
+    FIELD_MAPPING = {
+        'addressesNetGrowth': 'ltHandsTh',
+        'concentrationVar': 'concentration',
+        'largetxsVar': 'largeSurplus',
+        'inOutVar': 'inOutVar',
+    }
+
+    def rows(self, payload):
+        data = payload.get('Data') if isinstance(payload, dict) else None
+        if not isinstance(data, dict):
+            return []
+        flat_data = {}
+        for signal_name, signal_data in data.items():
+            mapped_name = self.FIELD_MAPPING.get(signal_name, signal_name)
+            if isinstance(signal_data, dict):
+                # Skip metadata fields, only keep sentiment and value
+                for k, v in signal_data.items():
+                    if k in ['sentiment', 'value']:
+                        flat_data[f"{mapped_name}_{k}"] = v
+            else:
+                flat_data[mapped_name] = signal_data
+        flat_data['fetched_at'] = datetime.now(timezone.utc).isoformat()
+        return [flat_data]
+
+
+class Endpoint:
+    """One CryptoCompare endpoint: URL template, parser, unique key, dtypes and target table."""
+
+    def __init__(self, key, parser, unique_key=None, dtypes=None, table=None, schema='COINDESK',
+                 interval=None, url=None):
+        self.key = key
+        self.parser = parser
+        self.unique_key = unique_key
+        self.dtypes = dtypes or {}
+        self.table = table or key.upper()
+        self.schema = schema
+        self.interval = interval
+        self.url = url
+
+    def with_url(self, url):
+        return Endpoint(self.key, self.parser, self.unique_key, self.dtypes, self.table, self.schema,
+                        self.interval, url)
+
+    def parse_many(self, payloads):
+        """
+        Parses a batch of payloads of this endpoint into one frame (None when
+        no rows were found). Rows of all payloads are gathered first and the
+        frame is built and typed once.
+        """
+        try:
+            rows = list(chain.from_iterable(self.parser.rows(payload) for payload in payloads))
+            if not rows:
+                return None
+            df = self.parser.frame(rows)
+            casts = {column: dtype for column, dtype in self.dtypes.items() if column in df.columns}
+            return df.astype(casts) if casts else df
+        except Exception as e:
+            logger.error(f"Error parsing {self.key}: {e}")
+            return None
+
+    def parse(self, payload):
+        return self.parse_many([payload])
+
+    def key_for(self, df):
+        """The unique key if all of its columns are in df (any case), else None."""
+        if not self.unique_key or df is None:
+            return None
+        keys = (self.unique_key,) if isinstance(self.unique_key, str) else self.unique_key
+        columns = {str(c).upper() for c in df.columns}
+        return self.unique_key if all(k.upper() in columns for k in keys) else None
+
+
+ENDPOINTS = {}
+
+
+def register(key, parser_class, **kwargs):
+    """Declares an endpoint. kwargs are passed to Endpoint."""
+    ENDPOINTS[key] = Endpoint(key, parser_class(), **kwargs)
+    return ENDPOINTS[key]
+
+
+def get_endpoint(key, url=None):
+    """The registered endpoint for key (a generic one for unknown keys), bound to url."""
+    endpoint = ENDPOINTS.get(key) or Endpoint(key, PayloadParser())
+    return endpoint.with_url(url) if url else endpoint
+
+
+def endpoints(config):
+    """{key: Endpoint} for the {key: url template} mapping of config.yml."""
+    return {key: get_endpoint(key, url) for key, url in config.items()}
+
+
+register('pricemultifull', PriceSnapshotParser)
+register('histoday', HistoParser, unique_key='TIME', dtypes=OHLCV_DTYPES, interval=86400)
+register('histohour', HistoParser, unique_key='TIME', dtypes=OHLCV_DTYPES, interval=3600)
+register('hourly_social_data', RowsParser, unique_key='TIME', dtypes={'time': 'int64'}, interval=3600)
+register('blockchain_balancedistribution', BalanceDistributionParser, unique_key=('TIME', 'FROM', 'TO'),
+         dtypes=BALANCE_DISTRIBUTION_DTYPES, interval=86400)
+register('tradingsignals', TradingSignalsParser)
+register('news', RowsParser, unique_key='ID')
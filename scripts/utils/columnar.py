@@ -0,0 +1,74 @@
+"""
+Columnar DataFrame construction for decoded API payloads.
+
+pd.DataFrame(list of dicts) goes through a row-major object matrix, and
+pd.json_normalize additionally builds one flattened dict per nested record
+before either gets to dtype inference. These helpers transpose the decoded
+rows into one sequence per column and turn numeric columns into typed numpy
+arrays directly; only columns numpy cannot type (strings, nulls, nested
+values) go through pandas' own inference, so dtypes match pd.DataFrame(rows).
+Nested record arrays are flattened the same way, with the parent fields
+repeated per record.
+"""
+
+from itertools import chain
+from operator import itemgetter
+
+import numpy as np
+import pandas as pd
+
+NUMERIC_KINDS = 'iuf'
+
+
+def row_keys(rows):
+    """Union of the keys of rows, in first-seen order."""
+    keys = {}
+    for row in rows:
+        for key in row:
+            keys[key] = None
+    return list(keys)
+
+
+def _column(values):
+    """Typed numpy array for numeric values, else the values for pandas to infer."""
+    try:
+        array = np.array(values)
+    except (ValueError, TypeError):
+        return list(values)
+    if array.ndim == 1 and array.dtype.kind in NUMERIC_KINDS:
+        return array
+    return list(values)
+
+
+def _columns(rows, columns):
+    """{column: values}; rows missing a column get None."""
+    if rows and all(len(row) == len(columns) for row in rows):
+        try:
+            if len(columns) == 1:
+                return {columns[0]: _column([row[columns[0]] for row in rows])}
+            return dict(zip(columns, map(_column, zip(*map(itemgetter(*columns), rows)))))
+        except KeyError:
+            pass
+    return {column: _column([row.get(column) for row in rows]) for column in columns}
+
+
+def rows_to_frame(rows, columns=None):
+    """Equivalent of pd.DataFrame(rows) for a list of flat dicts."""
+    columns = columns or row_keys(rows)
+    return pd.DataFrame(_columns(rows, columns), columns=columns)
+
+
+def records_to_frame(items, record_key, meta):
+    """
+    Equivalent of pd.json_normalize(items, record_path=[record_key], meta=meta,
+    errors='ignore'): one row per element of item[record_key], with the meta
+    fields of its parent item. Items without records contribute no rows.
+    """
+    groups = [item.get(record_key) or [] for item in items]
+    records = list(chain.from_iterable(groups))
+    columns = row_keys(records)
+    data = _columns(records, columns)
+    counts = [len(group) for group in groups]
+    for field in meta:
+        data[field] = pd.Series([item.get(field) for item in items]).repeat(counts).to_numpy()
+    return pd.DataFrame(data, columns=list(dict.fromkeys(columns + list(meta))))
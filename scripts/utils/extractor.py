@@ -0,0 +1,151 @@
+"""
+Compiled extractor for the NewHedge selectors.
+
+extract_element resolves every next_sibling / dashboard_* selector with its
+own doc.find_all(string=...) scan, and every CSS selector with its own
+select_one walk. CompiledExtractor walks the document once, indexing every
+string that contains one of the labels used in SELECTORS plus the first
+element per id and per class, and resolves selectors from that index with
+the same rules as extract_element. Compound CSS selectors (descendant
+combinators, pseudo-classes) are handed to a fallback (normally
+extract_element).
+"""
+
+import re
+import time
+
+INDEXED_TYPES = ('next_sibling', 'dashboard_primary', 'dashboard_secondary')
+CONTEXT_LEVELS = 5
+SIMPLE_CSS_RE = re.compile(r'^([#.])([\w-]+)$')
+INDEX_TIMING_KEY = '<index>'
+
+
+class CompiledExtractor:
+    """Resolves a SELECTORS mapping against a parsed page (see utils.parsers) in one indexed pass."""
+
+    def __init__(self, selectors):
+        self.selectors = selectors
+        labels = set()
+        for selector in selectors.values():
+            if isinstance(selector, dict) and selector.get('type') in INDEXED_TYPES:
+                for field in ('text', 'context'):
+                    if selector.get(field):
+                        labels.add(selector[field])
+        # Longest first so the alternation prefers the most specific label
+        self.labels = sorted(labels, key=len, reverse=True)
+        self._label_re = re.compile('|'.join(re.escape(label) for label in self.labels)) if self.labels else None
+        # Plain #id / .class selectors are answered from the same pass
+        self.ids, self.classes = set(), set()
+        for selector in selectors.values():
+            match = SIMPLE_CSS_RE.match(self._css(selector) or '')
+            if match:
+                (self.ids if match.group(1) == '#' else self.classes).add(match.group(2))
+
+    @staticmethod
+    def _css(selector):
+        if isinstance(selector, dict):
+            return selector.get('selector') if selector.get('type') == 'css' else None
+        return selector if isinstance(selector, str) else None
+
+    def build_index(self, doc):
+        """
+        Indexes the document in one pass and returns (labels, ids, classes):
+        {label: [strings containing it, in document order]} plus the first
+        element carrying each id and class used by a plain CSS selector.
+        """
+        labels = {label: [] for label in self.labels}
+        label_re = self._label_re
+        strings, ids, classes = doc.index(
+            lambda text: bool(label_re and text and label_re.search(text)), self.ids, self.classes
+        )
+        for string in strings:
+            for label in self.labels:
+                if label in string:
+                    labels[label].append(string)
+        return labels, ids, classes
+
+    def extract_all(self, doc, fallback, timings=None):
+        """
+        Returns {key: raw text or None} for every selector.
+        If timings is a dict, the seconds spent on each key are stored in it
+        and the shared index build under INDEX_TIMING_KEY.
+        """
+        started = time.perf_counter()
+        index, ids, classes = self.build_index(doc)
+        if timings is not None:
+            timings[INDEX_TIMING_KEY] = time.perf_counter() - started
+        text_cache = {}
+        results = {}
+        for key, selector in self.selectors.items():
+            started = time.perf_counter()
+            simple = SIMPLE_CSS_RE.match(self._css(selector) or '')
+            try:
+                if isinstance(selector, dict) and selector.get('type') in INDEXED_TYPES:
+                    results[key] = self._resolve(selector, index, text_cache)
+                elif simple:
+                    lookup = ids if simple.group(1) == '#' else classes
+                    element = lookup.get(simple.group(2))
+                    results[key] = self._text(element, text_cache).strip() if element else None
+                else:
+                    results[key] = fallback(doc, selector)
+            except Exception:
+                results[key] = None
+            if timings is not None:
+                timings[key] = time.perf_counter() - started
+        return results
+
+    @staticmethod
+    def _text(node, cache):
+        """get_text() memoized per node for the duration of one extraction."""
+        key = id(node)
+        if key not in cache:
+            cache[key] = node.get_text()
+        return cache[key]
+
+    def _resolve(self, selector, index, cache):
+        selector_type = selector.get('type')
+
+        if selector_type == 'next_sibling':
+            search_text = selector.get('text')
+            context = selector.get('context')
+
+            for elem in index.get(search_text, []):
+                if context:
+                    # Context must appear within the first few ancestors
+                    p = elem.find_parent()
+                    found = False
+                    for _ in range(CONTEXT_LEVELS):
+                        if not p:
+                            break
+                        if context in self._text(p, cache):
+                            found = True
+                            break
+                        p = p.find_parent()
+                    if not found:
+                        continue
+
+                parent = elem.find_parent()
+                if parent:
+                    next_elem = parent.find_next_sibling()
+                    if next_elem:
+                        text = self._text(next_elem, cache).strip()
+                        if text and text != search_text:
+                            return text
+                    container = parent.find_parent()
+                    if container:
+                        value_elem = container.find(class_='dashboard-primary-text')
+                        if value_elem:
+                            return self._text(value_elem, cache).strip()
+            return None
+
+        # dashboard_primary / dashboard_secondary: first string containing the context
+        matches = index.get(selector.get('context'), [])
+        if not matches:
+            return None
+        container = matches[0].find_parent().find_parent()
+        if container:
+            css_class = 'dashboard-primary-text' if selector_type == 'dashboard_primary' else 'dashboard-secondary-text'
+            value_elem = container.find(class_=css_class)
+            if value_elem:
+                return self._text(value_elem, cache).strip()
+        return None
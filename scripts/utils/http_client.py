@@ -0,0 +1,298 @@
+"""
+Pooled HTTP client shared by the fetch scripts.
+One keep-alive session per run, with a per-host concurrency limit, a
+token-bucket rate limiter, jittered exponential retries and a circuit
+breaker per endpoint.
+"""
+
+import json
+import logging
+import random
+import re
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor, as_completed
+from urllib.parse import urlsplit
+
+import requests
+from requests.adapters import HTTPAdapter
+
+try:
+    import orjson
+    json_loads = orjson.loads
+except ImportError:
+    json_loads = json.loads
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_MAX_PER_HOST = 8
+DEFAULT_TIMEOUT = (5, 30)  # (connect, read) seconds
+DEFAULT_MAX_RETRIES = 4
+BACKOFF_BASE = 0.5
+BACKOFF_CAP = 30.0
+RETRY_STATUSES = {429, 500, 502, 503, 504}
+# CryptoCompare error body, compact or pretty-printed (matched against the lower-cased head)
+ERROR_RESPONSE_RE = re.compile(rb'"response"\s*:\s*"error"')
+
+WINDOW_SECONDS = {'second': 1, 'minute': 60, 'hour': 3600}
+
+
+class CircuitOpenError(RuntimeError):
+    """Raised instead of calling an endpoint whose circuit is open."""
+
+
+class TokenBucket:
+    """
+    Thread-safe token bucket allowing `limit` requests per `period` seconds.
+    Callers reserve a token and sleep for the returned delay, so concurrent
+    workers queue up instead of overshooting the quota.
+    """
+
+    def __init__(self, limit, period):
+        self.capacity = float(limit)
+        self.fill_rate = float(limit) / period
+        self.tokens = float(limit)
+        self.updated = time.monotonic()
+        self.blocked_until = 0.0
+        self._lock = threading.Lock()
+
+    def _refill(self, now):
+        self.tokens = min(self.capacity, self.tokens + (now - self.updated) * self.fill_rate)
+        self.updated = now
+
+    def reserve(self):
+        """Takes one token and returns how long the caller must wait before using it."""
+        with self._lock:
+            now = time.monotonic()
+            self._refill(now)
+            self.tokens -= 1
+            wait = max(0.0, self.blocked_until - now)
+            if self.tokens < 0:
+                wait = max(wait, -self.tokens / self.fill_rate)
+            return wait
+
+    def sync(self, remaining):
+        """Lowers the local token count to what the server reports as remaining."""
+        with self._lock:
+            self._refill(time.monotonic())
+            self.tokens = min(self.tokens, float(remaining))
+
+    def pause(self, seconds):
+        with self._lock:
+            self.blocked_until = max(self.blocked_until, time.monotonic() + seconds)
+
+
+class RateLimiter:
+    """
+    One token bucket per quota window (second/minute/hour).
+    Buckets are re-synced from X-RateLimit-Remaining-<Window> headers and
+    paused on Retry-After when the API reports them.
+    """
+
+    def __init__(self, per_second=None, per_minute=None, per_hour=None):
+        limits = {'second': per_second, 'minute': per_minute, 'hour': per_hour}
+        self.buckets = {
+            window: TokenBucket(limit, WINDOW_SECONDS[window])
+            for window, limit in limits.items() if limit
+        }
+
+    def acquire(self):
+        wait = max((bucket.reserve() for bucket in self.buckets.values()), default=0.0)
+        if wait > 0:
+            time.sleep(wait)
+
+    def pause(self, seconds):
+        for bucket in self.buckets.values():
+            bucket.pause(seconds)
+
+    def update_from_headers(self, headers):
+        for window, bucket in self.buckets.items():
+            remaining = headers.get(f'X-RateLimit-Remaining-{window.capitalize()}')
+            if remaining is not None:
+                try:
+                    bucket.sync(int(remaining))
+                except ValueError:
+                    pass
+
+
+class CircuitBreaker:
+    """
+    Per-endpoint breaker: after `failure_threshold` consecutive failures the
+    endpoint is skipped for `reset_timeout` seconds, then one trial call is let
+    through (half-open) before the circuit closes again.
+    """
+
+    def __init__(self, failure_threshold=5, reset_timeout=60.0):
+        self.failure_threshold = failure_threshold
+        self.reset_timeout = reset_timeout
+        self._failures = {}
+        self._opened_at = {}
+        self._trials = {}
+        self._lock = threading.Lock()
+
+    def before_call(self, endpoint):
+        with self._lock:
+            opened_at = self._opened_at.get(endpoint)
+            if opened_at is None:
+                return
+            now = time.monotonic()
+            if now - opened_at < self.reset_timeout:
+                raise CircuitOpenError(f"Circuit open for {endpoint}")
+            # Half-open: only one trial call at a time; a trial that never
+            # reported back is given up on after another reset_timeout
+            trial_started = self._trials.get(endpoint)
+            if trial_started is not None and now - trial_started < self.reset_timeout:
+                raise CircuitOpenError(f"Circuit half-open for {endpoint}, trial call in flight")
+            self._trials[endpoint] = now
+
+    def record_success(self, endpoint):
+        with self._lock:
+            self._failures.pop(endpoint, None)
+            if self._trials.pop(endpoint, None) is not None:
+                self._opened_at.pop(endpoint, None)
+
+    def record_failure(self, endpoint):
+        with self._lock:
+            if self._trials.pop(endpoint, None) is not None:
+                # Failed trial: re-open for another reset_timeout
+                self._opened_at[endpoint] = time.monotonic()
+                logger.warning(f"Circuit re-opened for {endpoint} after failed trial call")
+                return
+            failures = self._failures.get(endpoint, 0) + 1
+            self._failures[endpoint] = failures
+            if failures >= self.failure_threshold:
+                self._opened_at[endpoint] = time.monotonic()
+                logger.warning(f"Circuit opened for {endpoint} after {failures} consecutive failures")
+
+
+def backoff_delay(attempt):
+    """Full-jitter exponential backoff."""
+    return random.uniform(0, min(BACKOFF_CAP, BACKOFF_BASE * (2 ** attempt)))
+
+
+def _retry_after(response):
+    value = response.headers.get('Retry-After')
+    try:
+        return float(value) if value is not None else None
+    except ValueError:
+        return None
+
+
+def _is_rate_limited(response):
+    """CryptoCompare answers over-quota calls with HTTP 200 and an error body."""
+    if response.status_code == 429:
+        return True
+    head = response.content[:512].lower()
+    return bool(ERROR_RESPONSE_RE.search(head)) and b'rate limit' in head
+
+
+class HttpClient:
+    """Keep-alive requests session that caps concurrent requests per host."""
+
+    def __init__(self, max_per_host=DEFAULT_MAX_PER_HOST, timeout=DEFAULT_TIMEOUT,
+                 rate_limiter=None, max_retries=DEFAULT_MAX_RETRIES, circuit_breaker=None):
+        self.max_per_host = max_per_host
+        self.timeout = timeout
+        self.rate_limiter = rate_limiter
+        self.max_retries = max_retries
+        self.circuit_breaker = circuit_breaker or CircuitBreaker()
+        self.session = requests.Session()
+        adapter = HTTPAdapter(pool_connections=4, pool_maxsize=max_per_host)
+        self.session.mount('https://', adapter)
+        self.session.mount('http://', adapter)
+        self._host_slots = {}
+        self._lock = threading.Lock()
+
+    def _host_slot(self, url):
+        """Returns the semaphore guarding concurrent requests to the URL's host."""
+        host = urlsplit(url).netloc
+        with self._lock:
+            if host not in self._host_slots:
+                self._host_slots[host] = threading.BoundedSemaphore(self.max_per_host)
+            return self._host_slots[host]
+
+    def get(self, url, **kwargs):
+        """
+        GET with rate limiting, retries on timeouts/connection errors/429/5xx
+        (honouring Retry-After) and a circuit breaker keyed by host + path.
+        """
+        kwargs.setdefault('timeout', self.timeout)
+        parts = urlsplit(url)
+        endpoint = f"{parts.netloc}{parts.path}"
+        self.circuit_breaker.before_call(endpoint)
+
+        error = None
+        for attempt in range(self.max_retries + 1):
+            if self.rate_limiter:
+                self.rate_limiter.acquire()
+
+            retry_after = None
+            try:
+                with self._host_slot(url):
+                    response = self.session.get(url, **kwargs)
+            except (requests.ConnectionError, requests.Timeout) as e:
+                error = e
+            else:
+                if self.rate_limiter:
+                    self.rate_limiter.update_from_headers(response.headers)
+                rate_limited = _is_rate_limited(response)
+                if not rate_limited and response.status_code not in RETRY_STATUSES:
+                    try:
+                        response.raise_for_status()
+                    except requests.HTTPError:
+                        # Client errors are not retried
+                        self.circuit_breaker.record_failure(endpoint)
+                        raise
+                    self.circuit_breaker.record_success(endpoint)
+                    return response
+
+                retry_after = _retry_after(response)
+                error = requests.HTTPError(
+                    f"{response.status_code} {'rate limited' if rate_limited else response.reason} for {endpoint}",
+                    response=response
+                )
+                if rate_limited and self.rate_limiter:
+                    self.rate_limiter.pause(retry_after or backoff_delay(attempt + 1))
+
+            if attempt == self.max_retries:
+                break
+            delay = retry_after if retry_after is not None else backoff_delay(attempt)
+            logger.warning(f"{error} - retry {attempt + 1}/{self.max_retries} in {delay:.1f}s")
+            time.sleep(delay)
+
+        self.circuit_breaker.record_failure(endpoint)
+        raise error
+
+    def get_json(self, url, **kwargs):
+        # Decodes the raw body (orjson when installed) instead of response.json(),
+        # which first builds the decoded text and then parses it
+        return json_loads(self.get(url, **kwargs).content)
+
+    def gather(self, tasks, max_workers=None):
+        """
+        Runs {key: callable} concurrently (callables typically issue one or more
+        requests through this client).
+        Returns {key: result}; keys whose task failed are logged and left out.
+        """
+        results = {}
+        if not tasks:
+            return results
+
+        with ThreadPoolExecutor(max_workers=max_workers or len(tasks)) as executor:
+            futures = {executor.submit(task): key for key, task in tasks.items()}
+            for future in as_completed(futures):
+                key = futures[future]
+                try:
+                    results[key] = future.result()
+                except Exception as e:
+                    logger.error(f"Error fetching {key}: {e}")
+        return results
+
+    def close(self):
+        self.session.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
@@ -0,0 +1,329 @@
+"""
+Declarative NewHedge table schema.
+
+Every core metric table is a list of columns, each naming its source
+selector key (utils/selectors.py), its cleaner and the resulting dtype:
+
+    'market_overview': [
+        Column('LIVE_PRICE'),                                       # numeric, source key = column name
+        Column('BTC_DOMINANCE_PCT', 'BTC_DOMINANCE', 'percentage'),
+        ...
+    ]
+
+CompiledSchema resolves the schema once into the distinct (source, cleaner)
+pairs it needs. transform() takes any number of extracted raw_data dicts
+(one live scrape, or thousands of archived snapshots), pulls one column of
+raw strings per source, cleans each distinct literal of a column once
+(snapshots repeat most values) and builds typed arrays, then assembles
+{table: DataFrame} with a TIMESTAMP column and the columns in schema order.
+"""
+
+import numpy as np
+import pandas as pd
+
+from utils.utils import (
+    clean_numeric_value, clean_integer_value, clean_percentage,
+    parse_date, extract_usd_with_percentage
+)
+
+# cleaner name -> (cleaner of one raw value, default dtype)
+CLEANERS = {
+    'numeric': (clean_numeric_value, 'float64'),
+    'integer': (clean_integer_value, 'Int64'),
+    'percentage': (clean_percentage, 'float64'),
+    'date': (parse_date, 'object'),
+    'text': (lambda value: value, 'object'),
+    'usd_amount': (lambda value: extract_usd_with_percentage(value)[0], 'float64'),
+    'usd_percentage': (lambda value: extract_usd_with_percentage(value)[1], 'float64'),
+    'null': (lambda value: None, 'float64'),
+}
+
+
+def clean_column(values, cleaner):
+    """Cleans a list of raw values, calling the cleaner once per distinct value."""
+    clean = CLEANERS[cleaner][0]
+    distinct = {value: clean(value) for value in dict.fromkeys(values)}
+    return [distinct[value] for value in values]
+
+
+def to_array(values, dtype):
+    """values (None for missing) as a typed array, or an object array when they don't fit dtype."""
+    try:
+        if dtype == 'object':
+            return np.array(values, dtype=object)
+        if dtype == 'float64':
+            return np.array(values, dtype='float64')
+        return pd.array(values, dtype=dtype)
+    except (OverflowError, TypeError, ValueError):  # e.g. integers beyond int64
+        return np.array(values, dtype=object)
+
+
+class Column:
+    """One output column: name, source selector key (defaults to name), cleaner and dtype."""
+
+    def __init__(self, name, source=None, cleaner='numeric', dtype=None):
+        if cleaner not in CLEANERS:
+            raise ValueError(f"Unknown cleaner '{cleaner}' for column {name}")
+        self.name = name
+        self.source = source if source is not None or cleaner == 'null' else name
+        self.cleaner = cleaner
+        self.dtype = dtype or CLEANERS[cleaner][1]
+
+    def __repr__(self):
+        return f"Column({self.name!r}, {self.source!r}, {self.cleaner!r}, {self.dtype!r})"
+
+
+class CompiledSchema:
+    """A table schema resolved into the distinct (source, cleaner, dtype) transforms it needs."""
+
+    def __init__(self, tables):
+        self.tables = tables
+        self.transforms = list(dict.fromkeys(
+            (c.source, c.cleaner, c.dtype) for columns in tables.values() for c in columns
+        ))
+
+    def transform(self, raw_rows, timestamps):
+        """
+        Cleans a batch of raw_data dicts (with the timestamp of each) into
+        {table: DataFrame}, one row per raw_data dict.
+        """
+        raw_rows = list(raw_rows)
+        arrays = {}
+        for source, cleaner, dtype in self.transforms:
+            values = [row.get(source) for row in raw_rows] if source else [None] * len(raw_rows)
+            arrays[(source, cleaner, dtype)] = to_array(clean_column(values, cleaner), dtype)
+        stamps = pd.Series(list(timestamps))
+
+        return {
+            table: pd.DataFrame(
+                {'TIMESTAMP': stamps, **{c.name: arrays[(c.source, c.cleaner, c.dtype)] for c in columns}}
+            )
+            for table, columns in self.tables.items()
+        }
+
+    def columns(self, table):
+        return ['TIMESTAMP'] + [column.name for column in self.tables[table]]
+
+
+SCHEMA = {
+    'market_overview': [
+        Column('24H_HIGH'),
+        Column('24H_LOW'),
+        Column('24H_VOL_BTC'),
+        Column('24H_VOL_USD'),
+        Column('LIVE_PRICE'),
+        Column('MARKET_CAP'),
+        Column('BTC_DOMINANCE_PCT', 'BTC_DOMINANCE', 'percentage'),
+        Column('SATS_PER_DOLLAR', cleaner='integer'),
+    ],
+    'blockchain_metrics': [
+        Column('BLOCK_HEIGHT', cleaner='integer'),
+        Column('TIME_SINCE_LAST_BLOCK', cleaner='text'),
+        Column('BLOCK_SPEED'),
+        Column('BLOCKS_24HRS', cleaner='integer'),
+        Column('OUTPUTS_24HRS', cleaner='integer'),
+    ],
+    'difficulty_adjustment': [
+        Column('PREVIOUS_DIFFICULTY'),
+        Column('PREVIOUS_DIFFICULTY_CHANGE_PCT', 'PREVIOUS_DIFFICULTY_CHANGE', 'percentage'),
+        Column('CURRENT_DIFFICULTY'),
+        Column('NEXT_DIFFICULTY_ESTIMATE'),
+        Column('NEXT_DIFFICULTY_CHANGE_PCT', cleaner='percentage'),
+        Column('NEXT_RETARGET', cleaner='text'),
+        Column('EPOCH', cleaner='integer'),
+    ],
+    'fear_greed': [
+        Column('INDEX_VALUE', 'FEAR_GREED_INDEX'),
+        Column('LABEL', 'FEAR_GREED_LABEL', 'text'),
+    ],
+    'mining_metrics': [
+        Column('HASHRATE_EHS', 'HASHRATE'),
+        Column('HASHPRICE_USD', 'HASHPRICE'),
+        Column('REVENUE_BTC_24H', 'REVENUE_BTC_24HRS'),
+        Column('REVENUE_USD_24H', 'REVENUE_USD_24HRS'),
+        Column('REWARD_PER_BLOCK_BTC'),
+        Column('REWARD_PER_BLOCK_USD'),
+        Column('REWARD_BTC_24HRS'),
+        Column('REWARD_USD_24HRS'),
+        Column('FEES_VS_REWARD_PCT', cleaner='percentage'),
+        Column('CURRENT_MONTH_SUBSIDY_USD'),
+        Column('CURRENT_MONTH_FEES_USD'),
+        Column('CURRENT_MONTH_TOTAL_USD'),
+    ],
+    'fee_metrics': [
+        Column('PER_TRANSACTION_SATS'),
+        Column('PER_TRANSACTION_USD'),
+        Column('FEES_BTC_24HRS'),
+        Column('FEES_USD_24HRS'),
+    ],
+    'supply_metrics': [
+        Column('CIRCULATING_SUPPLY'),
+        Column('PERCENTAGE_ISSUED_PCT', 'PERCENTAGE_ISSUED', 'percentage'),
+        Column('ISSUANCE_REMAINING'),
+        Column('TOTAL_MINED_BLOCKS', cleaner='integer'),
+        Column('ISSUANCE_BTC_24HRS'),
+    ],
+    'corporate_holdings': [
+        Column('PUBLIC_COMPANIES_COUNT', cleaner='integer'),
+        Column('PUBLIC_HOLDINGS_BTC'),
+        Column('PUBLIC_HOLDINGS_USD'),
+        Column('PRIVATE_COMPANIES_COUNT', cleaner='integer'),
+        Column('PRIVATE_HOLDINGS_BTC'),
+        Column('PRIVATE_HOLDINGS_USD'),
+        Column('TOTAL_CORPORATE_BTC'),
+        Column('TOTAL_CORPORATE_USD'),
+        Column('CORPORATE_PCT_TOTAL_SUPPLY', cleaner='percentage'),
+    ],
+    'government_holdings': [
+        Column('GOVERNMENTS_COUNT', cleaner='integer'),
+        Column('GOVERNMENT_TREASURY_BTC', 'GOVERNMENT_BTC_TREASURIES'),
+        Column('GOVERNMENT_TREASURY_USD', 'GOVERNMENT_USD_TREASURIES'),
+        Column('GOVERNMENT_PCT_TOTAL_SUPPLY', cleaner='percentage'),
+    ],
+    'transaction_metrics': [
+        Column('TRANSACTIONS_PER_SECOND'),
+        Column('TRANSACTIONS_PER_BLOCK'),
+        Column('TRANSACTIONS_PER_DAY'),
+        Column('TRANSACTIONS_CURRENT_MONTH'),
+        Column('TOTAL_TRANSACTIONS_ALL_TIME', cleaner='integer'),
+    ],
+    'utxo_metrics': [
+        Column('UTXOS_IN_PROFIT'),
+        Column('UTXOS_IN_LOSS'),
+        Column('UTXOS_IN_PROFIT_PCT', cleaner='percentage'),
+    ],
+    'profitable_days': [
+        Column('TOTAL_DAYS', cleaner='integer'),
+        Column('PROFITABLE_DAYS', cleaner='integer'),
+        Column('UNPROFITABLE_DAYS', cleaner='integer'),
+        Column('PERCENTAGE_PROFITABLE_PCT', 'PERCENTAGE_PROFITABLE', 'percentage'),
+    ],
+    'macro_liquidity': [
+        Column('GLOBAL_M2_SUPPLY'),
+        Column('GLOBAL_M2_GROWTH'),
+        Column('GLOBAL_M2_YOY_GROWTH_PCT', 'GLOBAL_M2_YOY_GROWTH', 'percentage'),
+        Column('GLOBAL_M2_10WEEK_LEAD'),
+        Column('US_M2_SUPPLY'),
+        Column('FEDERAL_FUNDS_RATE_PCT', 'FEDERAL_FUNDS_RATE', 'percentage'),
+    ],
+    'ath_details': [
+        Column('ATH_PRICE_USD', 'ATH_PRICE'),
+        Column('ATH_DATE', cleaner='date'),
+        Column('DAYS_SINCE_ATH', cleaner='integer'),
+        Column('PRICE_DRAWDOWN_PCT', 'PRICE_DRAWDOWN_SINCE_ATH', 'percentage'),
+    ],
+    'trading_metrics': [
+        Column('DAILY_BTC_TRADING_VOL_USD', 'DAILY_BTC_TRADING_VOL'),
+        Column('MONTHLY_BTC_TRADING_VOL_USD', 'MONTHLY_BTC_TRADING_VOL'),
+        Column('BINANCE_DOMINANCE_PCT', 'BINANCE_TRADING_DOMINANCE', 'percentage'),
+        Column('BTC_PAIRS_DOMINANCE_PCT', 'BTC_PAIRS_TRADING_DOMINANCE', 'percentage'),
+        Column('US_TRADING_VOL_USD', 'US_CRYPTO_TRADING_VOL', 'usd_amount'),
+        Column('US_TRADING_VOL_PCT', 'US_CRYPTO_TRADING_VOL', 'usd_percentage'),
+        Column('OFFSHORE_TRADING_VOL_USD', 'OFFSHORE_CRYPTO_TRADING_VOL', 'usd_amount'),
+        Column('OFFSHORE_TRADING_VOL_PCT', 'OFFSHORE_CRYPTO_TRADING_VOL', 'usd_percentage'),
+    ],
+    'price_performance': [
+        Column('DAILY_PERFORMANCE_PCT', 'DAILY_PRICE_PERFORMANCE', 'percentage'),
+        Column('WEEKLY_PERFORMANCE_PCT', 'WEEKLY_PRICE_PERFORMANCE', 'percentage'),
+        Column('MONTHLY_PERFORMANCE_PCT', 'MONTHLY_PRICE_PERFORMANCE', 'percentage'),
+        Column('QUARTERLY_PERFORMANCE_PCT', 'QUARTERLY_PRICE_PERFORMANCE', 'percentage'),
+    ],
+    'gold_comparison': [
+        Column('GOLD_PRICE_USD', 'GOLD_PRICE'),
+        Column('GOLD_MARKETCAP_USD', 'GOLD_MARKETCAP'),
+        Column('BTC_VS_GOLD_MARKETCAP_PCT', 'BTC_VS_GOLD_MARKETCAP', 'percentage'),
+        Column('GOLD_CORRELATION'),
+        Column('GOLD_SUPPLY_TONNES'),
+    ],
+    'realized_price': [
+        Column('REALIZED_PRICE_USD', 'REALIZED_PRICE'),
+        Column('REALIZED_MARKETCAP_USD', 'REALIZED_MARKETCAP'),
+        Column('STH_REALIZED_PRICE_USD', 'STH_REALIZED_PRICE'),
+        Column('LTH_REALIZED_PRICE_USD', 'LTH_REALIZED_PRICE'),
+    ],
+    'address_balances': [
+        Column('NEW_ADDRESSES', cleaner='integer'),
+        Column('BALANCE_1SAT_TO_001BTC', cleaner='integer'),
+        Column('BALANCE_001_TO_1BTC', cleaner='integer'),
+        Column('BALANCE_1_TO_10BTC', cleaner='integer'),
+        Column('BALANCE_10_TO_100BTC', cleaner='integer'),
+        Column('BALANCE_100_TO_1000BTC', cleaner='integer'),
+    ],
+    'correlations': [
+        Column('CORRELATION_SPX'),
+        Column('CORRELATION_GOLD'),
+        Column('CORRELATION_IWM'),
+        Column('CORRELATION_QQQ'),
+        Column('CORRELATION_TLT'),
+    ],
+    'onchain_supply': [
+        Column('LONG_TERM_HOLDER_SUPPLY'),
+        Column('SHORT_TERM_HOLDER_SUPPLY'),
+        Column('SUPPLY_IN_PROFIT_PCT', 'PERCENT_SUPPLY_IN_PROFIT', 'percentage'),
+        Column('TOTAL_SUPPLY_IN_PROFIT'),
+        Column('TOTAL_SUPPLY_IN_LOSS'),
+    ],
+    'halving_metrics': [
+        Column('PROJECTED_HALVING_DATE', cleaner='date'),
+        Column('HALVING_BLOCK_HEIGHT', 'HALVING_AT_BLOCK', 'integer'),
+        Column('BLOCKS_REMAINING', cleaner='integer'),
+        Column('BTC_UNTIL_HALVING'),
+        Column('CURRENT_EPOCH_PCT', cleaner='percentage'),
+    ],
+    'onchain_indicators': [
+        Column('COIN_DAYS_DESTROYED'),
+        Column('MVRV_Z_SCORE'),
+        Column('NVT_RATIO'),
+        Column('RHODL_RATIO'),
+        Column('RESERVE_RISK'),
+        Column('VDD_MULTIPLE'),
+        Column('NET_REALIZED_PROFIT_LOSS'),
+        Column('NUPL'),
+        Column('ASOL'),
+        Column('MSOL'),
+    ],
+    'node_metrics': [
+        Column('TOTAL_NODES', cleaner='integer'),
+        Column('TOR_NODES', cleaner='integer'),
+        Column('TOR_NODES_PCT', None, 'null'),  # Calculate if needed
+        Column('US_NODES', cleaner='integer'),
+        Column('GERMANY_NODES', cleaner='integer'),
+        Column('FRANCE_NODES', cleaner='integer'),
+        Column('CANADA_NODES', cleaner='integer'),
+        Column('FINLAND_NODES', cleaner='integer'),
+        Column('NETHERLANDS_NODES', cleaner='integer'),
+        Column('UK_NODES', cleaner='integer'),
+        Column('SWITZERLAND_NODES', cleaner='integer'),
+        Column('AUSTRALIA_NODES', cleaner='integer'),
+        Column('RUSSIA_NODES', cleaner='integer'),
+    ],
+    'futures_oi': [
+        Column('TOTAL_OPEN_INTEREST'),
+        Column('BINANCE_OI'),
+        Column('OKX_OI'),
+        Column('DERIBIT_OI'),
+        Column('BYBIT_OI'),
+        Column('BITMEX_OI'),
+        Column('BITGET_OI'),
+        Column('CRYPTOCOM_OI'),
+        Column('KUCOIN_OI'),
+        Column('GATEIO_OI'),
+        Column('HUOBI_OI'),
+        Column('BITFINEX_OI'),
+        Column('KRAKEN_OI'),
+    ],
+    'etf_trading': [
+        Column('SPOT_TRADING_VOLUME'),
+        Column('FUTURES_TRADING_VOLUME'),
+        Column('TOTAL_SPOT_AUM'),
+        Column('TOTAL_BTC_HOLDINGS'),
+    ],
+    'etf_holdings': [
+        Column('IBIT_BLACKROCK_BTC', 'IBIT_BLACKROCK'),
+        Column('FBTC_FIDELITY_BTC', 'FBTC_FIDELITY'),
+        Column('GBTC_GRAYSCALE_BTC', 'GBTC_GRAYSCALE'),
+    ],
+}
+
+
+COMPILED_SCHEMA = CompiledSchema(SCHEMA)
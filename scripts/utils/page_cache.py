@@ -0,0 +1,118 @@
+"""
+On-disk cache of scraped pages.
+
+Pages are stored gzip-compressed and content-addressed
+(<cache_dir>/objects/<sha256>.html.gz, so an unchanged page is kept once) and
+indexed by URL and time bucket (floor(fetch time / ttl)) in
+<cache_dir>/index.json. A run inside the bucket of a cached scrape gets the
+cached page back instead of scraping again; latest() returns the newest page
+of a URL regardless of age for explicit replays. Every hit refreshes the
+entry's last access, and when the stored objects exceed max_bytes the least
+recently used entries are evicted until they fit.
+"""
+
+import gzip
+import hashlib
+import os
+from datetime import datetime, timezone
+
+from utils.state import StateStore
+
+DEFAULT_TTL = 3600
+DEFAULT_MAX_BYTES = 200 * 1024 * 1024
+
+
+class PageCache:
+    """Content-addressed, TTL-bucketed, size-bounded cache of pages keyed by URL."""
+
+    def __init__(self, cache_dir, ttl=DEFAULT_TTL, max_bytes=DEFAULT_MAX_BYTES):
+        self.cache_dir = cache_dir
+        self.objects_dir = os.path.join(cache_dir, 'objects')
+        self.ttl = ttl
+        self.max_bytes = max_bytes
+        self.index = StateStore(os.path.join(cache_dir, 'index.json'))
+
+    def bucket(self, at=None):
+        at = at or datetime.now(timezone.utc)
+        return int(at.timestamp() // self.ttl) if self.ttl > 0 else None
+
+    @staticmethod
+    def entry_key(url, bucket):
+        return f"{url}#{bucket}"
+
+    def _object_path(self, digest):
+        return os.path.join(self.objects_dir, f"{digest}.html.gz")
+
+    def _read(self, key):
+        entry = self.index.get(key)
+        path = self._object_path(entry['object']) if entry else None
+        if not path or not os.path.exists(path):
+            return None
+        with gzip.open(path, 'rt', encoding='utf-8') as f:
+            html = f.read()
+        self.index.update(key, accessed_at=datetime.now(timezone.utc).isoformat())
+        return html, datetime.fromisoformat(entry['fetched_at'])
+
+    def get(self, url, at=None):
+        """(html, fetched_at) cached for url in the current time bucket, or None."""
+        bucket = self.bucket(at)
+        if bucket is None:
+            return None
+        return self._read(self.entry_key(url, bucket))
+
+    def latest(self, url):
+        """(html, fetched_at) of the newest cached page of url, whatever its age, or None."""
+        entries = [
+            (entry['fetched_at'], key) for key, entry in self.index.items()
+            if entry.get('url') == url
+        ]
+        for _, key in sorted(entries, reverse=True):
+            cached = self._read(key)
+            if cached:
+                return cached
+        return None
+
+    def put(self, url, html, at=None):
+        """Stores a freshly scraped page and evicts old entries if the cache is over budget."""
+        at = at or datetime.now(timezone.utc)
+        data = html.encode('utf-8')
+        digest = hashlib.sha256(data).hexdigest()
+        path = self._object_path(digest)
+        if not os.path.exists(path):
+            os.makedirs(self.objects_dir, exist_ok=True)
+            tmp_path = f"{path}.tmp"
+            with gzip.open(tmp_path, 'wb') as f:
+                f.write(data)
+            os.replace(tmp_path, path)
+        bucket = self.bucket(at)
+        key = self.entry_key(url, bucket if bucket is not None else 'latest')
+        self.index.update(
+            key,
+            url=url, object=digest, fetched_at=at.isoformat(), accessed_at=at.isoformat(),
+            size=os.path.getsize(path)
+        )
+        self.evict(keep=key)
+        return path
+
+    def evict(self, keep=None):
+        """
+        Drops least recently used entries (and their unreferenced objects) until
+        under max_bytes. The entry `keep` (the page just stored) is never evicted.
+        """
+        entries = sorted(self.index.items(), key=lambda item: item[1].get('accessed_at', ''))
+        sizes = {entry['object']: entry.get('size', 0) for _, entry in entries}
+        total = sum(sizes.values())
+        candidates = [item for item in entries if item[0] != keep]
+        while candidates and total > self.max_bytes:
+            key, entry = candidates.pop(0)
+            entries.remove((key, entry))
+            self.index.remove(key)
+            if not any(other['object'] == entry['object'] for _, other in entries):
+                total -= sizes[entry['object']]
+                try:
+                    os.remove(self._object_path(entry['object']))
+                except OSError:
+                    pass
+
+    def save(self):
+        self.index.save()
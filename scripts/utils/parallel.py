@@ -0,0 +1,56 @@
+"""
+Process-pool helpers for CPU-bound batch work (HTML parsing, cleaning).
+
+Work is dispatched in chunks, so every task spreads the pickling and
+scheduling cost over many items, and at most 2 * workers chunks are in
+flight, so inputs are read lazily. Results come back in input order, so the
+output never depends on the number of workers. workers=1 runs everything
+in-process (no pool).
+
+Workers are forked where the platform supports it, so they start with the
+parent's modules (schema, selectors) already imported. Elsewhere (Windows)
+they are spawned, which needs fn to be a module-level function (or a
+partial of one) and the calling script to guard its entry point with
+`if __name__ == "__main__"`.
+"""
+
+import multiprocessing
+from collections import deque
+from concurrent.futures import ProcessPoolExecutor
+from itertools import chain, islice
+
+
+def chunked(items, size):
+    """Splits an iterable into lists of up to size items."""
+    items = iter(items)
+    while chunk := list(islice(items, max(1, size))):
+        yield chunk
+
+
+def pool_context():
+    """fork where available, else spawn."""
+    methods = multiprocessing.get_all_start_methods()
+    return multiprocessing.get_context('fork' if 'fork' in methods else 'spawn')
+
+
+def map_ordered(fn, items, workers=1):
+    """Yields fn(item) for each item, in order, computed in `workers` processes."""
+    if workers <= 1:
+        yield from map(fn, items)
+        return
+    with ProcessPoolExecutor(max_workers=workers, mp_context=pool_context()) as executor:
+        pending = deque()
+        for item in items:
+            pending.append(executor.submit(fn, item))
+            if len(pending) >= 2 * workers:
+                yield pending.popleft().result()
+        while pending:
+            yield pending.popleft().result()
+
+
+def map_chunks(fn, items, workers=1, chunk_size=1):
+    """
+    Yields the per-item results of fn over chunks of items, in order.
+    fn takes a list of items and returns a list with one result per item.
+    """
+    return chain.from_iterable(map_ordered(fn, chunked(items, chunk_size), workers))
@@ -0,0 +1,257 @@
+"""
+HTML parser backends for the NewHedge scraper.
+
+parse_html() returns a document exposing the small BeautifulSoup-style API
+used by extract_element, scrape_table and CompiledExtractor (find, find_all,
+select_one, select, find_parent, find_next_sibling, find_next, get_text, get)
+plus index(), which collects text strings and the first element per id and
+class in one pass.
+
+The default backend is lxml (libxml2 + cssselect). BeautifulSoup with
+html.parser is kept as a fallback and as the reference the lxml backend is
+checked against (see scripts/benchmark_newhedge.py). The backend can be
+forced with NEWHEDGE_PARSER=lxml|bs4.
+"""
+
+import os
+from functools import lru_cache
+
+from bs4 import BeautifulSoup, NavigableString, Tag
+
+try:
+    import lxml.html
+    from lxml import etree
+    from lxml.cssselect import CSSSelector
+    HAS_LXML = True
+except ImportError:
+    HAS_LXML = False
+
+# Strings BeautifulSoup leaves out of get_text()
+NON_TEXT_PARENTS = ('script', 'style', 'template', 'rt', 'rp')
+
+
+class SoupDocument:
+    """BeautifulSoup (html.parser) backend; nodes are plain bs4 Tags."""
+
+    name = 'bs4'
+
+    def __init__(self, html):
+        self.root = BeautifulSoup(html, 'html.parser')
+
+    def index(self, string_filter, ids=(), classes=()):
+        """
+        Returns (strings, ids, classes): the strings accepted by string_filter
+        in document order, plus the first element carrying each requested id
+        and class.
+        """
+        wanted_ids, wanted_classes = set(ids), set(classes)
+        strings, found_ids, found_classes = [], {}, {}
+        for node in self.root.descendants:
+            if isinstance(node, Tag):
+                node_id = node.get('id')
+                if node_id in wanted_ids and node_id not in found_ids:
+                    found_ids[node_id] = node
+                for css_class in node.get('class') or ():
+                    if css_class in wanted_classes and css_class not in found_classes:
+                        found_classes[css_class] = node
+            elif isinstance(node, NavigableString) and string_filter(node):
+                strings.append(node)
+        return strings, found_ids, found_classes
+
+    def find(self, *args, **kwargs):
+        return self.root.find(*args, **kwargs)
+
+    def find_all(self, *args, **kwargs):
+        return self.root.find_all(*args, **kwargs)
+
+    def select_one(self, selector):
+        return self.root.select_one(selector)
+
+    def select(self, selector):
+        return self.root.select(selector)
+
+
+if HAS_LXML:
+    TEXT_NODES = etree.XPath('/descendant::node()[self::text() or self::comment()]')
+    ID_NODES = etree.XPath('//*[@id]')
+    GET_TEXT = etree.XPath(
+        'descendant::text()[not(ancestor::template)][not(parent::'
+        + ' or parent::'.join(NON_TEXT_PARENTS) + ')]'
+    )
+
+    @lru_cache(maxsize=512)
+    def _css(selector):
+        return CSSSelector(selector, translator='html')
+
+    @lru_cache(maxsize=512)
+    def _xpath(expression):
+        return etree.XPath(expression)
+
+    def _name_test(name):
+        if name is None:
+            return '*'
+        if isinstance(name, (list, tuple)):
+            return '*[' + ' or '.join(f'self::{n}' for n in name) + ']'
+        return name
+
+    def _find_xpath(axis, name=None, class_=None, id=None):
+        """Compiles a bs4-style find_all(name, class_=..., id=...) into an XPath."""
+        expression = f'{axis}::{_name_test(name)}'
+        if class_ is not None:
+            expression += f"[contains(concat(' ', normalize-space(@class), ' '), ' {class_} ')]"
+        if id is not None:
+            expression += f"[@id='{id}']"
+        return _xpath(expression)
+
+    class LxmlString(str):
+        """A text node; find_parent() returns the element that contains it."""
+
+        def __new__(cls, text, parent):
+            string = super().__new__(cls, text)
+            string.parent = parent
+            return string
+
+        def find_parent(self):
+            return self.parent
+
+    class LxmlElement:
+        """Wraps an lxml element with the bs4 Tag methods the scraper uses."""
+
+        __slots__ = ('el', 'doc')
+
+        def __init__(self, el, doc):
+            self.el = el
+            self.doc = doc
+
+        @property
+        def name(self):
+            return self.el.tag
+
+        def get(self, attr, default=None):
+            value = self.el.get(attr)
+            if value is None:
+                return default
+            # Multi-valued like in bs4
+            return value.split() if attr == 'class' else value
+
+        def get_text(self):
+            if self.el.tag in NON_TEXT_PARENTS:
+                return self.el.text_content()
+            return ''.join(GET_TEXT(self.el))
+
+        def find_parent(self):
+            return self.doc.wrap(self.el.getparent())
+
+        def find_next_sibling(self, name=None):
+            return self.doc.first(_find_xpath('following-sibling', name)(self.el))
+
+        def find_next(self, name=None):
+            # bs4 find_next() walks next_elements, i.e. descendants first
+            test = _name_test(name)
+            return self.doc.first(_xpath(f'(descendant::{test} | following::{test})[1]')(self.el))
+
+        def find(self, name=None, class_=None, id=None):
+            return self.doc.first(_find_xpath('descendant', name, class_, id)(self.el))
+
+        def find_all(self, name=None, class_=None, id=None):
+            return self.doc.wrap_all(_find_xpath('descendant', name, class_, id)(self.el))
+
+        def select(self, selector):
+            # CSSSelector also matches the context node, soupsieve does not
+            return self.doc.wrap_all(el for el in _css(selector)(self.el) if el is not self.el)
+
+        def select_one(self, selector):
+            return next(iter(self.select(selector)), None)
+
+    class LxmlDocument:
+        """lxml backend. Element wrappers are memoized so node identity is stable."""
+
+        name = 'lxml'
+
+        def __init__(self, html):
+            self.tree = lxml.html.document_fromstring(html).getroottree()
+            self._wrappers = {}
+            self._string_nodes = None
+            self.root = self.wrap(self.tree.getroot())
+
+        def wrap(self, el):
+            if el is None:
+                return None
+            node = self._wrappers.get(el)
+            if node is None:
+                node = self._wrappers[el] = LxmlElement(el, self)
+            return node
+
+        def wrap_all(self, els):
+            return [self.wrap(el) for el in els]
+
+        def first(self, els):
+            return self.wrap(els[0]) if els else None
+
+        def _strings(self):
+            """[(text, parent element)] for every text node and comment in document order."""
+            if self._string_nodes is None:
+                self._string_nodes = []
+                for node in TEXT_NODES(self.tree):
+                    if isinstance(node, str):
+                        parent = node.getparent()
+                        # Tail text belongs to the element around the one it follows
+                        self._string_nodes.append((node, parent.getparent() if node.is_tail else parent))
+                    elif node.text:
+                        self._string_nodes.append((node.text, node.getparent()))
+            return self._string_nodes
+
+        def _find_strings(self, predicate):
+            for text, parent in self._strings():
+                if predicate(text):
+                    yield LxmlString(text, self.wrap(parent))
+
+        def index(self, string_filter, ids=(), classes=()):
+            """
+            Returns (strings, ids, classes): the strings accepted by string_filter
+            in document order, plus the first element carrying each requested id
+            and class.
+            """
+            strings = list(self._find_strings(string_filter))
+            wanted_ids, found_ids = set(ids), {}
+            for el in ID_NODES(self.tree):
+                node_id = el.get('id')
+                if node_id in wanted_ids and node_id not in found_ids:
+                    found_ids[node_id] = self.wrap(el)
+            found_classes = {}
+            for css_class in classes:
+                node = self.find(class_=css_class)
+                if node is not None:
+                    found_classes[css_class] = node
+            return strings, found_ids, found_classes
+
+        def find(self, name=None, class_=None, id=None, string=None):
+            if string is not None:
+                return next(self._find_strings(string), None)
+            return self.first(_find_xpath('descendant-or-self', name, class_, id)(self.root.el))
+
+        def find_all(self, name=None, class_=None, id=None, string=None):
+            if string is not None:
+                return list(self._find_strings(string))
+            return self.wrap_all(_find_xpath('descendant-or-self', name, class_, id)(self.root.el))
+
+        def select_one(self, selector):
+            return next(iter(self.select(selector)), None)
+
+        def select(self, selector):
+            return self.wrap_all(_css(selector)(self.root.el))
+
+
+BACKENDS = {'bs4': SoupDocument}
+if HAS_LXML:
+    BACKENDS['lxml'] = LxmlDocument
+
+DEFAULT_BACKEND = os.getenv('NEWHEDGE_PARSER') or ('lxml' if HAS_LXML else 'bs4')
+
+
+def parse_html(html, backend=None):
+    """Parses a page with the requested (or default) backend."""
+    backend = backend or DEFAULT_BACKEND
+    if backend not in BACKENDS:
+        raise ValueError(f"Unknown or unavailable parser backend '{backend}' (available: {', '.join(BACKENDS)})")
+    return BACKENDS[backend](html)
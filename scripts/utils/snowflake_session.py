@@ -0,0 +1,109 @@
+"""
+Run-scoped Snowflake session.
+Opens one authenticated connection per run and caches table metadata
+(existence, row counts, column lists) for the pipeline schemas.
+"""
+
+import logging
+
+logger = logging.getLogger(__name__)
+
+PIPELINE_SCHEMAS = ('COINDESK', 'NEWHEDGE')
+
+METADATA_QUERY = """
+SELECT c.TABLE_SCHEMA, c.TABLE_NAME, c.COLUMN_NAME, t.ROW_COUNT
+FROM INFORMATION_SCHEMA.COLUMNS c
+JOIN INFORMATION_SCHEMA.TABLES t
+  ON t.TABLE_SCHEMA = c.TABLE_SCHEMA AND t.TABLE_NAME = c.TABLE_NAME
+WHERE t.TABLE_TYPE = 'BASE TABLE'
+  AND c.TABLE_SCHEMA IN ({schemas})
+  {table_filter}
+ORDER BY c.TABLE_SCHEMA, c.TABLE_NAME, c.ORDINAL_POSITION
+"""
+
+
+class SnowflakeSession:
+    """
+    Lazily opens a single connection through `connect` and reuses it for the
+    whole run. Table metadata for `schemas` is loaded in one batched
+    INFORMATION_SCHEMA query on first use.
+    """
+
+    def __init__(self, connect, schemas=PIPELINE_SCHEMAS):
+        self._connect = connect
+        self.schemas = tuple(s.upper() for s in schemas)
+        self._conn = None
+        self._connect_failed = False
+        self._tables = None
+
+    @property
+    def conn(self):
+        """Returns the shared connection, or None if it could not be opened."""
+        if self._conn is None and not self._connect_failed:
+            self._conn = self._connect()
+            self._connect_failed = self._conn is None
+        return self._conn
+
+    def _query_metadata(self, table_filter='', params=None):
+        schemas = ', '.join(f"'{s}'" for s in self.schemas)
+        cursor = self.conn.cursor()
+        try:
+            cursor.execute(METADATA_QUERY.format(schemas=schemas, table_filter=table_filter), params)
+            tables = {}
+            for schema, table, column, row_count in cursor.fetchall():
+                entry = tables.setdefault((schema.upper(), table.upper()), {'row_count': row_count or 0, 'columns': []})
+                entry['columns'].append(column.upper())
+            return tables
+        finally:
+            cursor.close()
+
+    def _load_metadata(self):
+        try:
+            self._tables = self._query_metadata()
+            logger.info(f"Cached metadata for {len(self._tables)} tables in {', '.join(self.schemas)}.")
+        except Exception as e:
+            logger.error(f"Error loading table metadata: {e}")
+            self._tables = {}
+
+    def table_status(self, schema_name, table_name):
+        """
+        Returns (exists, row_count) from the metadata cache.
+        """
+        if self._tables is None:
+            self._load_metadata()
+        entry = self._tables.get((schema_name.upper(), table_name.upper()))
+        return (True, entry['row_count']) if entry else (False, 0)
+
+    def table_columns(self, schema_name, table_name):
+        """
+        Returns the cached list of uppercase column names for the table.
+        """
+        if self._tables is None:
+            self._load_metadata()
+        entry = self._tables.get((schema_name.upper(), table_name.upper()))
+        return list(entry['columns']) if entry else []
+
+    def refresh(self, schema_name, table_name):
+        """Re-reads the metadata of a single table after it has been loaded."""
+        if self._tables is None:
+            return
+        key = (schema_name.upper(), table_name.upper())
+        try:
+            fresh = self._query_metadata(
+                "AND c.TABLE_SCHEMA = %s AND c.TABLE_NAME = %s", key
+            )
+            self._tables.pop(key, None)
+            self._tables.update(fresh)
+        except Exception as e:
+            logger.error(f"Error refreshing metadata for {table_name}: {e}")
+
+    def close(self):
+        if self._conn is not None:
+            self._conn.close()
+            self._conn = None
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
@@ -0,0 +1,63 @@
+"""
+Small JSON-backed state store for pipeline bookkeeping (watermarks, checkpoints).
+The file lives under data/ so it is committed together with the datasets and
+survives between CI runs.
+"""
+
+import json
+import os
+import threading
+
+
+class StateStore:
+    """Dict of {entry_key: {field: value}} persisted to a JSON file."""
+
+    def __init__(self, path):
+        self.path = path
+        self._lock = threading.Lock()
+        self._data = {}
+        if os.path.exists(path):
+            with open(path, 'r') as f:
+                self._data = json.load(f)
+
+    def get(self, key, field=None, default=None):
+        with self._lock:
+            entry = self._data.get(key, {})
+            if field is None:
+                return dict(entry)
+            return entry.get(field, default)
+
+    def update(self, key, **fields):
+        with self._lock:
+            self._data.setdefault(key, {}).update(fields)
+
+    def add_to_set(self, key, field, value):
+        """Adds value to the sorted list stored in field, atomically (safe from worker threads)."""
+        with self._lock:
+            entry = self._data.setdefault(key, {})
+            entry[field] = sorted(set(entry.get(field) or []) | {value})
+
+    def items(self):
+        """[(entry_key, copy of entry)] for every entry."""
+        with self._lock:
+            return [(key, dict(entry)) for key, entry in self._data.items()]
+
+    def remove(self, key, *fields):
+        """Drops the given fields of an entry, or the whole entry when no field is given."""
+        with self._lock:
+            if not fields:
+                self._data.pop(key, None)
+                return
+            entry = self._data.get(key, {})
+            for field in fields:
+                entry.pop(field, None)
+
+    def save(self):
+        """Writes the store atomically (temp file + rename)."""
+        with self._lock:
+            os.makedirs(os.path.dirname(self.path) or '.', exist_ok=True)
+            tmp_path = f"{self.path}.tmp"
+            with open(tmp_path, 'w') as f:
+                json.dump(self._data, f, indent=2, sort_keys=True, default=str)
+                f.write('\n')
+            os.replace(tmp_path, self.path)
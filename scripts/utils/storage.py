@@ -0,0 +1,435 @@
+"""
+Local dataset storage for data/.
+
+Tables can be kept as CSV (the historical layout), as typed Parquet
+datasets partitioned by year/month of their time column, or both
+(DATA_FORMAT=csv|parquet|both). Parquet datasets live under
+data/parquet/<source>/<table>/year=YYYY/month=MM/ and can be read back with
+column pruning and time-range predicates, and copied into Snowflake with
+PUT + COPY (TYPE = PARQUET) without going through pandas.
+
+Snapshot sources (NewHedge) additionally write every run as an immutable
+partition, <root>/<table>/date=YYYY-MM-DD/run=<ts>/, so loaders can pick up
+only the runs they have not seen (see write_partition / list_partitions).
+
+pyarrow ships with snowflake-connector-python[pandas]. The fetchers and the
+local storage treat it as optional (without it data/ stays on CSV), but
+load_newhedge_to_snowflake.py requires it, since it stages every load as a
+Parquet file.
+"""
+
+import logging
+import os
+import shutil
+import tempfile
+import uuid
+
+import pandas as pd
+
+try:
+    import pyarrow as pa
+    import pyarrow.dataset as ds
+    import pyarrow.parquet as pq
+    HAS_PYARROW = True
+except ImportError:
+    HAS_PYARROW = False
+
+logger = logging.getLogger(__name__)
+
+DATA_DIR = os.path.join(os.path.dirname(os.path.dirname(os.path.dirname(__file__))), 'data')
+PARQUET_DIR = os.path.join(DATA_DIR, 'parquet')
+DATA_FORMAT = os.getenv('DATA_FORMAT', 'csv').lower()
+
+TIME_COLUMNS = ('TIMESTAMP', 'TIME', 'FETCHED_AT')
+PARTITION_COLUMNS = ['year', 'month']
+COMPRESSION = 'zstd'
+
+PARQUET_FILE_FORMAT = "(TYPE = PARQUET USE_LOGICAL_TYPE = TRUE)"
+
+
+def parquet_enabled():
+    if DATA_FORMAT in ('parquet', 'both') and not HAS_PYARROW:
+        logger.warning(f"DATA_FORMAT={DATA_FORMAT} but pyarrow is not installed. Using CSV only.")
+        return False
+    return DATA_FORMAT in ('parquet', 'both')
+
+
+def csv_enabled():
+    return DATA_FORMAT != 'parquet' or not HAS_PYARROW
+
+
+def table_path(source, table, root=None):
+    return os.path.join(root or PARQUET_DIR, source, table.lower())
+
+
+def has_table(source, table, root=None):
+    return HAS_PYARROW and os.path.isdir(table_path(source, table, root))
+
+
+def find_time_column(columns):
+    """Returns the first of TIME_COLUMNS present (case-insensitive), or None."""
+    by_upper = {str(c).upper(): c for c in columns}
+    return next((by_upper[c] for c in TIME_COLUMNS if c in by_upper), None)
+
+
+def _as_datetime(series):
+    """Epoch seconds (TIME) or timestamp strings as UTC datetimes."""
+    if pd.api.types.is_numeric_dtype(series):
+        return pd.to_datetime(series, unit='s', utc=True, errors='coerce')
+    return pd.to_datetime(series, utc=True, errors='coerce')
+
+
+def _as_text(value):
+    if isinstance(value, str) or value is None:
+        return value
+    try:
+        if pd.isna(value):
+            return None
+    except (TypeError, ValueError):
+        pass
+    return str(value)
+
+
+def _to_arrow(df):
+    """Converts a frame to an Arrow table, falling back to strings for mixed-type columns."""
+    try:
+        return pa.Table.from_pandas(df, preserve_index=False)
+    except (pa.ArrowInvalid, pa.ArrowTypeError):
+        df = df.copy()
+        for col in df.columns:
+            try:
+                pa.array(df[col], from_pandas=True)
+            except (pa.ArrowInvalid, pa.ArrowTypeError):
+                df[col] = df[col].map(_as_text)
+        return pa.Table.from_pandas(df, preserve_index=False)
+
+
+def _dataset(path):
+    partitioning = ds.partitioning(pa.schema([('year', pa.int32()), ('month', pa.int32())]), flavor='hive')
+    dataset = ds.dataset(path, format='parquet', partitioning=partitioning)
+    fragments = list(dataset.get_fragments())
+    if len(fragments) > 1:
+        # Columns added over time only exist in newer partitions
+        schemas = [f.physical_schema for f in fragments] + [partitioning.schema]
+        try:
+            schema = pa.unify_schemas(schemas, promote_options='permissive')
+        except TypeError:  # pyarrow < 14
+            schema = pa.unify_schemas(schemas)
+        dataset = ds.dataset(path, format='parquet', partitioning=partitioning, schema=schema)
+    return dataset
+
+
+def write_parquet(df, path):
+    """Writes a frame to a single Parquet file."""
+    pq.write_table(_to_arrow(df.reset_index(drop=True)), path, compression=COMPRESSION)
+
+
+def write_table(df, source, table, time_column=None, key=None, replace=False, root=None):
+    """
+    Writes df into the Parquet dataset of source/table.
+    replace=True rewrites the whole dataset from df (df is the full table);
+    otherwise rows are merged into the year/month partitions they fall in,
+    keeping the last row per key (a column or a list of columns) when one is given.
+    root overrides PARQUET_DIR.
+    """
+    if df is None or df.empty:
+        return
+    path = table_path(source, table, root)
+    time_column = time_column or find_time_column(df.columns)
+
+    if not replace and os.path.isdir(path):
+        months = _months(df, time_column) if time_column else None
+        existing = read_table(source, table, months=months, root=root)
+        if existing is not None and not existing.empty:
+            df = pd.concat([existing, df], ignore_index=True)
+            keys = [key] if isinstance(key, str) else list(key or [])
+            if keys and all(k in df.columns for k in keys):
+                df = df.drop_duplicates(subset=keys, keep='last')
+
+    if time_column:
+        df = df.sort_values(time_column, kind='stable')
+        stamps = _as_datetime(df[time_column])
+        df = df.assign(
+            year=stamps.dt.year.fillna(0).astype(int).map('{:04d}'.format),
+            month=stamps.dt.month.fillna(0).astype(int).map('{:02d}'.format),
+        )
+
+    if replace or not time_column:
+        shutil.rmtree(path, ignore_errors=True)
+    os.makedirs(path, exist_ok=True)
+
+    arrow_table = _to_arrow(df.reset_index(drop=True))
+    if time_column:
+        pq.write_to_dataset(
+            arrow_table, root_path=path, partition_cols=PARTITION_COLUMNS,
+            existing_data_behavior='delete_matching', basename_template='part-{i}.parquet',
+            compression=COMPRESSION,
+        )
+    else:
+        pq.write_table(arrow_table, os.path.join(path, 'part-0.parquet'), compression=COMPRESSION)
+
+
+def _months(df, time_column):
+    stamps = _as_datetime(df[time_column]).dropna()
+    return sorted(set(zip(stamps.dt.year, stamps.dt.month)))
+
+
+def read_table(source, table, columns=None, start=None, end=None, time_column=None, months=None, root=None):
+    """
+    Reads source/table back as a DataFrame (None if there is no dataset).
+    columns prunes the columns read; start/end (inclusive, anything
+    pd.Timestamp accepts or epoch seconds) filter on the time column and
+    skip whole partitions outside the range; months limits the read to
+    [(year, month), ...] partitions.
+    """
+    if not has_table(source, table, root):
+        return None
+    dataset = _dataset(table_path(source, table, root))
+    data_columns = [name for name in dataset.schema.names if name not in PARTITION_COLUMNS]
+    time_column = time_column or find_time_column(data_columns)
+
+    expression = None
+
+    def _and(condition):
+        return condition if expression is None else expression & condition
+
+    if months:
+        month_filter = None
+        for year, month in months:
+            condition = (ds.field('year') == int(year)) & (ds.field('month') == int(month))
+            month_filter = condition if month_filter is None else month_filter | condition
+        expression = _and(month_filter)
+
+    if time_column and (start is not None or end is not None):
+        field_type = dataset.schema.field(time_column).type
+        for bound, op in ((start, 'ge'), (end, 'le')):
+            if bound is None:
+                continue
+            stamp = pd.Timestamp(bound, unit='s', tz='UTC') if isinstance(bound, (int, float)) else pd.Timestamp(bound)
+            if stamp.tzinfo is None:
+                stamp = stamp.tz_localize('UTC')
+            # Partition pruning on year/month, then the exact bound on the column
+            year, month = ds.field('year'), ds.field('month')
+            if op == 'ge':
+                expression = _and((year > stamp.year) | ((year == stamp.year) & (month >= stamp.month)))
+            else:
+                expression = _and((year < stamp.year) | ((year == stamp.year) & (month <= stamp.month)))
+            if pa.types.is_timestamp(field_type):
+                scalar = pa.scalar(stamp.to_pydatetime(), type=pa.timestamp('us', tz='UTC'))
+            elif pa.types.is_integer(field_type) or pa.types.is_floating(field_type):
+                scalar = int(stamp.timestamp())
+            else:
+                scalar = stamp.isoformat()
+            expression = _and(ds.field(time_column) >= scalar if op == 'ge' else ds.field(time_column) <= scalar)
+
+    selected = [c for c in columns if c in dataset.schema.names] if columns else data_columns
+    df = dataset.to_table(columns=selected, filter=expression).to_pandas()
+    if time_column in df.columns:
+        df = df.sort_values(time_column, kind='stable').reset_index(drop=True)
+    return df
+
+
+def save_local(df, csv_path, source, table=None, time_column=None, key=None, append=False, root=None):
+    """
+    Saves df in the configured DATA_FORMAT(s). table defaults to the CSV file name.
+    append=True adds df to the existing table (CSV mode='a' / partition merge),
+    otherwise df replaces it.
+    """
+    table = table or os.path.splitext(os.path.basename(csv_path))[0]
+    if csv_enabled():
+        if append:
+            df.to_csv(csv_path, mode='a', header=not os.path.isfile(csv_path), index=False)
+        else:
+            df.to_csv(csv_path, index=False)
+    if parquet_enabled():
+        write_table(df, source, table, time_column=time_column, key=key, replace=not append, root=root)
+
+
+def load_local(csv_path, source, table=None, columns=None, root=None):
+    """
+    Reads a local table, from Parquet when it is being written, else from CSV.
+    table defaults to the CSV file name. Returns None if neither exists.
+    """
+    table = table or os.path.splitext(os.path.basename(csv_path))[0]
+    if parquet_enabled() and has_table(source, table, root):
+        return read_table(source, table, columns=columns, root=root)
+    if os.path.exists(csv_path):
+        return pd.read_csv(csv_path, usecols=columns)
+    return None
+
+
+def parquet_columns(source, table, root=None):
+    """Returns the data columns of a dataset (without the partition keys), or None."""
+    if not has_table(source, table, root):
+        return None
+    return [name for name in _dataset(table_path(source, table, root)).schema.names if name not in PARTITION_COLUMNS]
+
+
+def list_tables(source, root=None):
+    """Returns the names of the Parquet datasets stored for a source."""
+    path = os.path.join(root or PARQUET_DIR, source)
+    if not HAS_PYARROW or not os.path.isdir(path):
+        return []
+    return sorted(name for name in os.listdir(path) if os.path.isdir(os.path.join(path, name)))
+
+
+def run_partition(timestamp):
+    """Partition id of one run: date=YYYY-MM-DD/run=YYYYMMDDTHHMMSSZ (UTC)."""
+    stamp = pd.Timestamp(timestamp)
+    stamp = stamp.tz_localize('UTC') if stamp.tzinfo is None else stamp.tz_convert('UTC')
+    return f"date={stamp:%Y-%m-%d}/run={stamp:%Y%m%dT%H%M%SZ}"
+
+
+def write_partition(df, root, table, timestamp):
+    """
+    Writes one run of a table as its own immutable partition,
+    root/<table>/date=YYYY-MM-DD/run=<ts>/part-0.(parquet|csv), and returns
+    the partition id. The partition is published with an atomic rename, so
+    readers never see a half-written run.
+    """
+    partition = run_partition(timestamp)
+    path = os.path.join(root, table.lower(), *partition.split('/'))
+    if os.path.exists(path):
+        raise FileExistsError(f"Partition {table.lower()}/{partition} already exists")
+    tmp_path = f"{path}.tmp-{uuid.uuid4().hex[:8]}"
+    os.makedirs(tmp_path)
+    try:
+        if parquet_enabled():
+            write_parquet(df, os.path.join(tmp_path, 'part-0.parquet'))
+        else:
+            df.to_csv(os.path.join(tmp_path, 'part-0.csv'), index=False)
+        os.replace(tmp_path, path)
+    except BaseException:
+        shutil.rmtree(tmp_path, ignore_errors=True)
+        raise
+    return partition
+
+
+def list_partitions(root, table):
+    """Returns the partition ids written for a table, oldest first."""
+    table_dir = os.path.join(root, table.lower())
+    if not os.path.isdir(table_dir):
+        return []
+    partitions = []
+    for date_dir in os.listdir(table_dir):
+        if not date_dir.startswith('date='):
+            continue
+        for run_dir in os.listdir(os.path.join(table_dir, date_dir)):
+            if run_dir.startswith('run=') and '.tmp-' not in run_dir:
+                partitions.append(f"{date_dir}/{run_dir}")
+    return sorted(partitions)
+
+
+def read_partitions(root, table, partitions):
+    """Reads the given partitions of a table into one frame (None if there are none)."""
+    frames = []
+    for partition in partitions:
+        path = os.path.join(root, table.lower(), *partition.split('/'))
+        for name in sorted(os.listdir(path)):
+            if name.endswith('.parquet') and HAS_PYARROW:
+                frames.append(pq.read_table(os.path.join(path, name)).to_pandas())
+            elif name.endswith('.csv'):
+                frames.append(pd.read_csv(os.path.join(path, name)))
+    return pd.concat(frames, ignore_index=True) if frames else None
+
+
+def _widen(schema):
+    """Snowflake sizes integer columns per result chunk; write them all as int64."""
+    return pa.schema([
+        field.with_type(pa.int64()) if pa.types.is_integer(field.type) else field for field in schema
+    ])
+
+
+def stream_batches(batches, csv_path=None, parquet_path=None):
+    """
+    Writes an iterable of Arrow tables/record batches to a CSV and/or Parquet
+    file one batch at a time, so memory stays bounded by the batch size.
+    Files are written next to their destination and renamed when complete;
+    an empty result leaves existing files untouched. Returns the number of
+    rows written.
+    """
+    outputs = [path for path in (csv_path, parquet_path) if path]
+    tmp_paths = {path: f"{path}.tmp-{uuid.uuid4().hex[:8]}" for path in outputs}
+    csv_file, parquet_writer, schema, rows = None, None, None, 0
+    try:
+        if csv_path:
+            csv_file = open(tmp_paths[csv_path], 'w', newline='')
+        for batch in batches:
+            if schema is None:
+                schema = _widen(batch.schema)
+            batch = batch.cast(schema) if batch.schema != schema else batch
+            if csv_file:
+                # pandas formatting, identical to the previous fetch_pandas_all().to_csv() exports
+                batch.to_pandas().to_csv(csv_file, index=False, header=rows == 0)
+            if parquet_path:
+                if parquet_writer is None:
+                    parquet_writer = pq.ParquetWriter(tmp_paths[parquet_path], schema, compression=COMPRESSION)
+                table = batch if isinstance(batch, pa.Table) else pa.Table.from_batches([batch])
+                parquet_writer.write_table(table)
+            rows += batch.num_rows
+        if csv_file:
+            csv_file.close()
+        if parquet_writer:
+            parquet_writer.close()
+        if rows:
+            for path in outputs:
+                if os.path.exists(tmp_paths[path]):
+                    os.replace(tmp_paths[path], path)
+        return rows
+    finally:
+        if csv_file and not csv_file.closed:
+            csv_file.close()
+        if parquet_writer:
+            parquet_writer.close()
+        for tmp_path in tmp_paths.values():
+            if os.path.exists(tmp_path):
+                os.unlink(tmp_path)
+
+
+def parquet_files(source, table, root=None):
+    """Returns the Parquet files of a dataset, sorted by partition."""
+    path = table_path(source, table, root)
+    files = []
+    for root, _, names in os.walk(path):
+        files.extend(os.path.join(root, name) for name in names if name.endswith('.parquet'))
+    return sorted(files)
+
+
+def copy_parquet_into(conn, files, schema_name, table_name, stage='TEMP_STAGE'):
+    """
+    PUTs Parquet files to a temporary stage and loads them with one
+    COPY ... MATCH_BY_COLUMN_NAME. Returns the number of rows loaded.
+    """
+    prefix = uuid.uuid4().hex
+    cursor = conn.cursor()
+    try:
+        cursor.execute(f"CREATE TEMPORARY STAGE IF NOT EXISTS {stage}")
+        for i, path in enumerate(files):
+            # Partition files share names, so give each its own sub-path
+            upload_path = os.path.abspath(path).replace('\\', '/')
+            cursor.execute(f"PUT 'file://{upload_path}' @{stage}/{prefix}/{i} AUTO_COMPRESS=FALSE OVERWRITE=TRUE")
+        cursor.execute(f"""
+            COPY INTO {schema_name}.{table_name}
+            FROM @{stage}/{prefix}/
+            FILE_FORMAT = {PARQUET_FILE_FORMAT}
+            MATCH_BY_COLUMN_NAME = CASE_INSENSITIVE
+            ON_ERROR = CONTINUE
+        """)
+        return sum(row[3] or 0 for row in cursor.fetchall() if len(row) > 3 and isinstance(row[3], int))
+    finally:
+        cursor.execute(f"REMOVE @{stage}/{prefix}/")
+        cursor.close()
+
+
+def copy_frame_into(conn, df, schema_name, table_name):
+    """Loads a frame through a temporary Parquet file and copy_parquet_into."""
+    fd, tmp_path = tempfile.mkstemp(suffix='.parquet')
+    os.close(fd)
+    try:
+        write_parquet(df, tmp_path)
+        return copy_parquet_into(conn, [tmp_path], schema_name, table_name)
+    finally:
+        try:
+            os.unlink(tmp_path)
+        except OSError:
+            pass
@@ -1,43 +1,48 @@
 import re
 from datetime import datetime
+from functools import lru_cache
+import numpy as np
+import pandas as pd
 from bs4 import BeautifulSoup
 
+_CURRENCY_RE = re.compile(r'[$€£¥,]')
+_NON_NUMERIC_RE = re.compile(r'[^\d.\-]')
+_SUFFIX_MULTIPLIERS = (
+    ('T', 1_000_000_000_000, True),   # (suffix, multiplier, ignored when the text contains 'BTC')
+    ('B', 1_000_000_000, True),
+    ('M', 1_000_000, False),
+    ('K', 1_000, False),
+)
+
+@lru_cache(maxsize=4096)
+def _clean_numeric_text(text):
+    """Parses one raw metric string. Memoized, since snapshots repeat the same literals."""
+    cleaned = _CURRENCY_RE.sub('', text.strip()).replace('%', '')
+
+    multiplier = 1
+    for suffix, factor, skip_btc in _SUFFIX_MULTIPLIERS:
+        if suffix in cleaned and not (skip_btc and 'BTC' in cleaned):
+            multiplier = factor
+            cleaned = cleaned.replace(suffix, '')
+            break
+
+    # Units such as 'EH/s' are dropped together with every other non-numeric character
+    cleaned = _NON_NUMERIC_RE.sub('', cleaned)
+
+    if not cleaned or cleaned == '.':
+        return None
+    try:
+        return float(cleaned) * multiplier
+    except ValueError:
+        return None
+
 def clean_numeric_value(value):
     """Cleans numeric values by removing currency symbols, commas, percentages, and units."""
     if value is None or value == '':
         return None
     
     try:
-        cleaned = str(value).strip()
-        cleaned = re.sub(r'[$€£¥,]', '', cleaned)
-        
-        is_percentage = '%' in cleaned
-        cleaned = cleaned.replace('%', '')
-        
-        multiplier = 1
-        if 'T' in cleaned and 'BTC' not in cleaned:
-            multiplier = 1_000_000_000_000
-            cleaned = cleaned.replace('T', '')
-        elif 'B' in cleaned and 'BTC' not in cleaned:
-            multiplier = 1_000_000_000
-            cleaned = cleaned.replace('B', '')
-        elif 'M' in cleaned:
-            multiplier = 1_000_000
-            cleaned = cleaned.replace('M', '')
-        elif 'K' in cleaned:
-            multiplier = 1_000
-            cleaned = cleaned.replace('K', '')
-        
-        if 'EH/s' in cleaned:
-            cleaned = cleaned.replace('EH/s', '').strip()
-        
-        cleaned = re.sub(r'[^\d.\-]', '', cleaned)
-        
-        if not cleaned or cleaned == '.':
-            return None
-            
-        result = float(cleaned) * multiplier
-        return result
+        return _clean_numeric_text(str(value))
     except (ValueError, AttributeError):
         return None
 
@@ -50,6 +55,40 @@ def clean_percentage(value):
     """Cleans percentage values."""
     return clean_numeric_value(value)
 
+def clean_numeric_series(values):
+    """
+    Vectorized clean_numeric_value: parses each distinct literal once and
+    broadcasts the results. Returns a float64 Series (NaN where the scalar
+    cleaner returns None).
+    """
+    series = values if isinstance(values, pd.Series) else pd.Series(values, dtype=object)
+    missing = series.isna().to_numpy()
+    # Factorize on the same str() form the scalar cleaner parses
+    codes, uniques = pd.factorize(series.astype(str))
+
+    # One extra trailing NaN for code -1 (values the string cast keeps as missing)
+    parsed = np.full(len(uniques) + 1, np.nan)
+    for i, text in enumerate(uniques):
+        result = _clean_numeric_text(text)
+        parsed[i] = np.nan if result is None else result
+
+    out = parsed[codes]
+    out[missing] = np.nan
+    return pd.Series(out, index=series.index, dtype='float64')
+
+def clean_integer_series(values):
+    """Vectorized clean_integer_value returning a nullable Int64 Series."""
+    numeric = clean_numeric_series(values)
+    truncated = np.trunc(numeric)
+    try:
+        return truncated.astype('Int64')
+    except (OverflowError, TypeError, ValueError):
+        return truncated.map(lambda v: None if pd.isna(v) else int(v)).astype(object)
+
+def clean_percentage_series(values):
+    """Vectorized clean_percentage."""
+    return clean_numeric_series(values)
+
 def parse_date(date_str):
     """Parses date strings in various formats."""
     if not date_str:
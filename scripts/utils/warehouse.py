@@ -0,0 +1,507 @@
+"""
+Warehouse connections for the load/merge/export scripts.
+
+connect() returns a Snowflake connection or, with WAREHOUSE_BACKEND=duckdb, an
+embedded DuckDB database (DUCKDB_PATH, data/warehouse.duckdb by default)
+behind a connection object that speaks the same subset of the Snowflake
+connector API the scripts use: cursor().execute() with %s parameters,
+fetchone/fetchall/fetch_pandas_all/fetch_arrow_batches, rowcount, and
+write_pandas() from this module.
+
+The DuckDB backend creates the schemas and tables of migrations/ on first
+use and emulates the Snowflake-specific statements of the pipeline:
+temporary stages (PUT, REMOVE, COPY INTO ... FROM @stage with CSV or Parquet
+files), CREATE TEMPORARY TABLE ... LIKE, MERGE with qualified SET targets,
+USE SCHEMA, HASH_AGG(*) over a subquery, and INFORMATION_SCHEMA.TABLES /
+COLUMNS with ROW_COUNT and LAST_ALTERED. That is enough to run, profile and
+load-test the whole pipeline locally without a Snowflake account.
+"""
+
+import glob
+import logging
+import os
+import re
+import shutil
+import tempfile
+import threading
+import uuid
+from datetime import datetime, timezone
+
+try:
+    import snowflake.connector
+    from snowflake.connector.pandas_tools import write_pandas as snowflake_write_pandas
+    HAS_SNOWFLAKE = True
+except ImportError:
+    HAS_SNOWFLAKE = False
+
+try:
+    import duckdb
+    HAS_DUCKDB = True
+except ImportError:
+    HAS_DUCKDB = False
+
+logger = logging.getLogger(__name__)
+
+ROOT_DIR = os.path.dirname(os.path.dirname(os.path.dirname(__file__)))
+MIGRATIONS_DIR = os.path.join(ROOT_DIR, 'migrations')
+
+DEFAULT_DUCKDB_PATH = os.path.join(ROOT_DIR, 'data', 'warehouse.duckdb')
+
+# Internal schema holding the migration log, change tracking and catalog views
+INTERNAL_SCHEMA = '_WAREHOUSE'
+
+# Snowflake column types of migrations/ and their DuckDB equivalents
+TYPE_MAP = [
+    (r'\bNUMBER\s*\(\s*\d+\s*,\s*0\s*\)', 'BIGINT'),
+    (r'\bNUMBER\s*\((\s*\d+\s*,\s*\d+\s*)\)', r'DECIMAL(\1)'),
+    # A bare NUMBER is NUMBER(38,0). BIGINT rather than DECIMAL(38,0)/HUGEINT, which DuckDB
+    # hands to pandas as float64 while Snowflake's fetch_pandas_all returns integers
+    (r'\bNUMBER\b', 'BIGINT'),
+    (r'\bINTEGER\b', 'BIGINT'),
+    (r'\bFLOAT\b', 'DOUBLE'),
+    (r'\bTIMESTAMP_TZ\b', 'TIMESTAMPTZ'),
+    (r'\bTIMESTAMP_LTZ\b', 'TIMESTAMPTZ'),
+    (r'\bTIMESTAMP_NTZ\b', 'TIMESTAMP'),
+    (r'\b(STRING|TEXT)\b', 'VARCHAR'),
+    (r'\b(VARIANT|OBJECT|ARRAY)\b', 'VARCHAR'),
+    (r'\bCURRENT_TIMESTAMP\(\)', 'CURRENT_TIMESTAMP'),
+]
+
+SCHEMA_RE = re.compile(r'CREATE\s+SCHEMA\s+IF\s+NOT\s+EXISTS\s+(\w+)\s*;', re.I)
+TABLE_RE = re.compile(r'CREATE\s+(?:OR\s+REPLACE\s+)?TABLE\s+([\w.]+)\s*\((.*?)\n\s*\)\s*;', re.I | re.S)
+PRIMARY_KEY_RE = re.compile(r',\s*PRIMARY\s+KEY\s*\([^)]*\)', re.I)
+ALTER_COLUMN_RE = re.compile(r'ALTER\s+TABLE\s+([\w.]+)\s+(ADD|DROP)\s+COLUMN\s+([^;]+);', re.I)
+
+USE_SCHEMA_RE = re.compile(r'^USE\s+SCHEMA\s+([\w."]+)\s*;?$', re.I)
+CREATE_STAGE_RE = re.compile(r'^CREATE\s+(?:OR\s+REPLACE\s+)?(?:TEMPORARY\s+)?STAGE\s+(?:IF\s+NOT\s+EXISTS\s+)?(\w+)', re.I)
+PUT_RE = re.compile(r"^PUT\s+'file://([^']+)'\s+@(\w+)(/\S*)?", re.I)
+REMOVE_RE = re.compile(r'^REMOVE\s+@(\w+)(/\S*)?', re.I)
+COPY_RE = re.compile(r'^COPY\s+INTO\s+([\w."]+)\s*(?:\(([^)]*)\))?\s+FROM\s+@(\w+)(/\S*)?(.*)$', re.I | re.S)
+CREATE_LIKE_RE = re.compile(r'^CREATE\s+(?:OR\s+REPLACE\s+)?(?:(?:TEMPORARY|TRANSIENT)\s+)?TABLE\s+([\w."]+)\s+LIKE\s+([\w."]+)', re.I)
+SHOW_TABLES_RE = re.compile(r'^SHOW\s+TABLES\s+IN\s+SCHEMA\s+([\w."]+)', re.I)
+DML_RE = re.compile(
+    r'^(?:MERGE\s+INTO|INSERT\s+(?:OVERWRITE\s+)?INTO|UPDATE|DELETE\s+FROM|TRUNCATE\s+(?:TABLE\s+)?(?:IF\s+EXISTS\s+)?)\s*([\w."]+)',
+    re.I
+)
+SET_TARGET_RE = re.compile(r'(^|,)\s*\w+\.("[^"]+"|\w+)\s*=(?!=)')
+# Order-independent content hash of a row set (XOR of the row hashes, 0 when empty)
+HASH_AGG_RE = re.compile(r'\bHASH_AGG\(\*\)\s+FROM\s+(\(.*\))\s*$', re.I | re.S)
+
+
+def warehouse_backend():
+    """WAREHOUSE_BACKEND: 'snowflake' (default) or 'duckdb'."""
+    return os.getenv('WAREHOUSE_BACKEND', 'snowflake').lower()
+
+
+def connect(schema=None):
+    """Opens a connection to the configured warehouse backend."""
+    if warehouse_backend() == 'duckdb':
+        if not HAS_DUCKDB:
+            raise ImportError("WAREHOUSE_BACKEND=duckdb needs the duckdb package (pip install duckdb pytz)")
+        return DuckDBConnection(os.getenv('DUCKDB_PATH', DEFAULT_DUCKDB_PATH), schema=schema)
+    if not HAS_SNOWFLAKE:
+        raise ImportError("The Snowflake backend needs snowflake-connector-python[pandas]")
+    return snowflake.connector.connect(
+        user=os.getenv('SNOWFLAKE_USER'),
+        password=os.getenv('SNOWFLAKE_PASSWORD'),
+        account=os.getenv('SNOWFLAKE_ACCOUNT'),
+        warehouse=os.getenv('SNOWFLAKE_WAREHOUSE'),
+        database=os.getenv('SNOWFLAKE_DATABASE'),
+        schema=schema or os.getenv('SNOWFLAKE_SCHEMA')
+    )
+
+
+def write_pandas(conn, df, table_name, **kwargs):
+    """snowflake.connector.pandas_tools.write_pandas for either backend."""
+    if isinstance(conn, DuckDBConnection):
+        return conn.write_pandas(df, table_name, **kwargs)
+    return snowflake_write_pandas(conn, df, table_name, **kwargs)
+
+
+def _unquote(name):
+    return name.strip().strip('"').upper()
+
+
+def _quoted(columns):
+    return ', '.join(f'"{column}"' for column in columns)
+
+
+def _split_name(name, default_schema):
+    parts = [_unquote(part) for part in name.split('.')]
+    return (parts[-2] if len(parts) > 1 else default_schema), parts[-1]
+
+
+def translate_migration(sql):
+    """
+    Returns the DuckDB statements for the schemas, tables and added/dropped
+    columns of a migration. Procedures, tasks, streams, grants and comments are
+    Snowflake-only and skipped. Primary keys are dropped because Snowflake does
+    not enforce them.
+    """
+    statements = [f'CREATE SCHEMA IF NOT EXISTS "{name.upper()}"' for name in SCHEMA_RE.findall(sql)]
+    for name, body in TABLE_RE.findall(sql):
+        schema, table = _split_name(name, 'PUBLIC')
+        body = PRIMARY_KEY_RE.sub('', body)
+        for pattern, replacement in TYPE_MAP:
+            body = re.sub(pattern, replacement, body, flags=re.I)
+        statements.append(f'CREATE OR REPLACE TABLE "{schema}"."{table}" ({body}\n)')
+    for name, action, column in ALTER_COLUMN_RE.findall(sql):
+        schema, table = _split_name(name, 'PUBLIC')
+        for pattern, replacement in TYPE_MAP:
+            column = re.sub(pattern, replacement, column, flags=re.I)
+        statements.append(f'ALTER TABLE "{schema}"."{table}" {action.upper()} COLUMN {column.strip()}')
+    return statements
+
+
+class DuckDBConnection:
+    """
+    Snowflake-compatible connection over an embedded DuckDB database.
+    Statements are serialized per connection; DuckDB parallelizes each one
+    internally.
+    """
+
+    def __init__(self, path, schema=None):
+        self.path = path
+        if path != ':memory:':
+            os.makedirs(os.path.dirname(os.path.abspath(path)), exist_ok=True)
+        self.db = duckdb.connect(path)
+        self.schema = (schema or os.getenv('SNOWFLAKE_SCHEMA') or 'PUBLIC').upper()
+        self.lock = threading.RLock()
+        self.stage_dir = tempfile.mkdtemp(prefix='warehouse_stage_')
+        self.stages = set()
+        self._bootstrap()
+
+    def _bootstrap(self):
+        db = self.db
+        db.execute(f'CREATE SCHEMA IF NOT EXISTS "{INTERNAL_SCHEMA}"')
+        db.execute('CREATE SCHEMA IF NOT EXISTS "PUBLIC"')
+        db.execute(f'CREATE TABLE IF NOT EXISTS "{INTERNAL_SCHEMA}".MIGRATIONS (SCRIPT VARCHAR PRIMARY KEY, APPLIED_AT TIMESTAMPTZ)')
+        db.execute(f"""
+            CREATE TABLE IF NOT EXISTS "{INTERNAL_SCHEMA}".TABLE_CHANGES (
+                TABLE_SCHEMA VARCHAR, TABLE_NAME VARCHAR, LAST_ALTERED TIMESTAMPTZ,
+                PRIMARY KEY (TABLE_SCHEMA, TABLE_NAME)
+            )
+        """)
+        # Emulated temporary tables are real tables dropped on close(); leftovers
+        # of a connection that was never closed are dropped here
+        db.execute(f'CREATE TABLE IF NOT EXISTS "{INTERNAL_SCHEMA}".TEMP_TABLES (TABLE_SCHEMA VARCHAR, TABLE_NAME VARCHAR)')
+        for schema, table in db.execute(f'SELECT * FROM "{INTERNAL_SCHEMA}".TEMP_TABLES').fetchall():
+            db.execute(f'DROP TABLE IF EXISTS "{schema}"."{table}"')
+        db.execute(f'DELETE FROM "{INTERNAL_SCHEMA}".TEMP_TABLES')
+        self.temp_tables = set()
+        db.execute(f"""
+            CREATE OR REPLACE VIEW "{INTERNAL_SCHEMA}".TABLES AS
+            SELECT upper(t.schema_name) AS TABLE_SCHEMA, upper(t.table_name) AS TABLE_NAME,
+                   'BASE TABLE' AS TABLE_TYPE, t.estimated_size AS ROW_COUNT, c.LAST_ALTERED AS LAST_ALTERED
+            FROM duckdb_tables() t
+            LEFT JOIN "{INTERNAL_SCHEMA}".TABLE_CHANGES c
+              ON c.TABLE_SCHEMA = upper(t.schema_name) AND c.TABLE_NAME = upper(t.table_name)
+            WHERE upper(t.schema_name) <> '{INTERNAL_SCHEMA}' AND NOT t.temporary
+              AND (upper(t.schema_name), upper(t.table_name)) NOT IN (SELECT * FROM "{INTERNAL_SCHEMA}".TEMP_TABLES)
+        """)
+        db.execute(f"""
+            CREATE OR REPLACE VIEW "{INTERNAL_SCHEMA}".COLUMNS AS
+            SELECT upper(schema_name) AS TABLE_SCHEMA, upper(table_name) AS TABLE_NAME,
+                   upper(column_name) AS COLUMN_NAME, column_index AS ORDINAL_POSITION, data_type AS DATA_TYPE
+            FROM duckdb_columns()
+            WHERE upper(schema_name) <> '{INTERNAL_SCHEMA}' AND database_name <> 'temp'
+              AND (upper(schema_name), upper(table_name)) NOT IN (SELECT * FROM "{INTERNAL_SCHEMA}".TEMP_TABLES)
+        """)
+        self.apply_migrations()
+
+    def apply_migrations(self):
+        """Creates the tables of migrations/ that have not been applied to this database yet."""
+        applied = {row[0] for row in self.db.execute(f'SELECT SCRIPT FROM "{INTERNAL_SCHEMA}".MIGRATIONS').fetchall()}
+        for path in sorted(glob.glob(os.path.join(MIGRATIONS_DIR, 'V*.sql'))):
+            script = os.path.basename(path)
+            if script in applied:
+                continue
+            with open(path) as f:
+                statements = translate_migration(f.read())
+            for statement in statements:
+                try:
+                    self.db.execute(statement)
+                except duckdb.Error as e:
+                    logger.warning(f"Skipping statement of {script}: {e}")
+            self.db.execute(f'INSERT INTO "{INTERNAL_SCHEMA}".MIGRATIONS VALUES (?, ?)',
+                            [script, datetime.now(timezone.utc)])
+            logger.info(f"Applied {script} to {self.path} ({len(statements)} statements)")
+
+    def cursor(self):
+        return DuckDBCursor(self)
+
+    def register_temp_table(self, schema, table):
+        """Hides schema.table from the catalog views and drops it on close()."""
+        self.temp_tables.add((schema, table))
+        self.db.execute(f'INSERT INTO "{INTERNAL_SCHEMA}".TEMP_TABLES VALUES (?, ?)', [schema, table])
+
+    def touch(self, schema, table):
+        """Records a write to schema.table (INFORMATION_SCHEMA.TABLES.LAST_ALTERED)."""
+        self.db.execute(
+            f'INSERT OR REPLACE INTO "{INTERNAL_SCHEMA}".TABLE_CHANGES VALUES (?, ?, ?)',
+            [schema, table, datetime.now(timezone.utc)]
+        )
+
+    def write_pandas(self, df, table_name, schema=None, auto_create_table=False, table_type='',
+                     overwrite=False, quote_identifiers=True, **kwargs):
+        """Same contract as Snowflake's write_pandas: returns (success, nchunks, nrows, output)."""
+        schema = (schema or self.schema).upper()
+        table = table_name if quote_identifiers else table_name.upper()
+        qualified = f'"{schema}"."{table}"'
+        frame = df if quote_identifiers else df.rename(columns=lambda c: str(c).upper())
+        with self.lock:
+            view = f"_write_pandas_{uuid.uuid4().hex[:8]}"
+            self.db.register(view, frame)
+            try:
+                if auto_create_table:
+                    self.db.execute(f'CREATE TABLE IF NOT EXISTS {qualified} AS SELECT * FROM {view} LIMIT 0')
+                    if table_type.upper() in ('TEMPORARY', 'TEMP'):
+                        self.register_temp_table(schema, table.upper())
+                if overwrite:
+                    self.db.execute(f'DELETE FROM {qualified}')
+                self.db.execute(f'INSERT INTO {qualified} BY NAME SELECT * FROM {view}')
+                self.touch(schema, table.upper())
+            finally:
+                self.db.unregister(view)
+        return True, 1, len(df), [(f'{table}.parquet', 'LOADED', len(df), len(df))]
+
+    def close(self):
+        if self.db is None:
+            return
+        with self.lock:
+            for schema, table in self.temp_tables:
+                self.db.execute(f'DROP TABLE IF EXISTS "{schema}"."{table}"')
+            self.db.execute(f'DELETE FROM "{INTERNAL_SCHEMA}".TEMP_TABLES')
+            self.db.close()
+            self.db = None
+        shutil.rmtree(self.stage_dir, ignore_errors=True)
+
+
+class DuckDBCursor:
+    """Cursor translating the Snowflake statements the pipeline issues."""
+
+    def __init__(self, conn):
+        self.conn = conn
+        # Each cursor gets its own DuckDB connection so results of cursors
+        # used from different threads do not overwrite each other
+        self.db = conn.db.cursor()
+        self.rowcount = -1
+        self.description = None
+        self._rows = None
+        self._result = None
+
+    def _stage_path(self, stage, path):
+        if stage.upper() not in self.conn.stages:
+            raise ValueError(f"Stage {stage} does not exist")
+        return os.path.join(self.conn.stage_dir, stage.upper(), (path or '/').lstrip('/'))
+
+    def _set_rows(self, rows, columns):
+        self._rows = list(rows)
+        self._result = None
+        self.rowcount = len(self._rows)
+        self.description = [(name, None, None, None, None, None, None) for name in columns]
+
+    def execute(self, sql, params=None):
+        statement = sql.strip().rstrip(';').strip()
+        with self.conn.lock:
+            for handler in (self._use, self._create_stage, self._put, self._remove, self._copy,
+                            self._create_like, self._show_tables):
+                if handler(statement):
+                    return self
+            self._execute_sql(statement, params)
+        return self
+
+    def _execute_sql(self, statement, params):
+        statement = re.sub(r'\bINFORMATION_SCHEMA\.(TABLES|COLUMNS)\b', rf'"{INTERNAL_SCHEMA}".\1', statement, flags=re.I)
+        if re.match(r'^MERGE\b', statement, re.I):
+            statement = self._merge_sql(statement)
+        statement = HASH_AGG_RE.sub(r'coalesce(bit_xor(hash(_rows)), 0) FROM \1 AS _rows', statement)
+        if params:
+            statement = statement.replace('%s', '?')
+
+        db = self.db
+        db.execute(f'USE "{self.conn.schema}"')
+        self._result = db.execute(statement, list(params) if params else None)
+        self._rows = None
+        self.description = self._result.description
+        self.rowcount = -1
+
+        dml = DML_RE.match(statement)
+        if dml:
+            # DuckDB returns the affected row count as the result of DML
+            self.rowcount = (self._result.fetchone() or [0])[0]
+            self._set_rows([(self.rowcount,)], ['number of rows affected'])
+            self.conn.touch(*_split_name(dml.group(1), self.conn.schema))
+
+    @staticmethod
+    def _merge_sql(statement):
+        """DuckDB does not accept qualified targets (t."COL" = ...) in UPDATE SET."""
+        match = re.search(r'(UPDATE\s+SET\s+)(.*?)(\s+WHEN\s+)', statement, re.I | re.S)
+        if not match:
+            return statement
+        assignments = SET_TARGET_RE.sub(r'\1 \2 =', match.group(2))
+        return statement[:match.start(2)] + assignments + statement[match.end(2):]
+
+    def _use(self, statement):
+        match = USE_SCHEMA_RE.match(statement)
+        if match:
+            self.conn.schema = _split_name(match.group(1), self.conn.schema)[1]
+            self._set_rows([('Statement executed successfully.',)], ['status'])
+        return bool(match)
+
+    def _create_stage(self, statement):
+        match = CREATE_STAGE_RE.match(statement)
+        if match:
+            stage = match.group(1).upper()
+            self.conn.stages.add(stage)
+            os.makedirs(os.path.join(self.conn.stage_dir, stage), exist_ok=True)
+            self._set_rows([(f'Stage area {stage} successfully created.',)], ['status'])
+        return bool(match)
+
+    def _put(self, statement):
+        match = PUT_RE.match(statement)
+        if not match:
+            return False
+        target = self._stage_path(match.group(2), match.group(3))
+        os.makedirs(target, exist_ok=True)
+        rows = []
+        for source in sorted(glob.glob(match.group(1))):
+            shutil.copy(source, os.path.join(target, os.path.basename(source)))
+            size = os.path.getsize(source)
+            rows.append((os.path.basename(source), os.path.basename(source), size, size, 'NONE', 'NONE', 'UPLOADED', ''))
+        self._set_rows(rows, ['source', 'target', 'source_size', 'target_size', 'source_compression',
+                              'target_compression', 'status', 'message'])
+        return True
+
+    def _remove(self, statement):
+        match = REMOVE_RE.match(statement)
+        if not match:
+            return False
+        path = self._stage_path(match.group(1), match.group(2))
+        removed = self._stage_files(path)
+        if os.path.isdir(path):
+            shutil.rmtree(path, ignore_errors=True)
+        else:
+            for name in removed:
+                os.remove(name)
+        self._set_rows([(name, 'removed') for name in removed], ['name', 'result'])
+        return True
+
+    def _stage_files(self, path):
+        """Staged files under a stage path (a directory or a file name prefix)."""
+        if os.path.isdir(path):
+            return sorted(
+                os.path.join(root, name) for root, _, names in os.walk(path) for name in names
+            )
+        return sorted(glob.glob(glob.escape(path) + '*'))
+
+    def _copy(self, statement):
+        match = COPY_RE.match(statement)
+        if not match:
+            return False
+        schema, table = _split_name(match.group(1), self.conn.schema)
+        columns = [_unquote(c) for c in match.group(2).split(',')] if match.group(2) else None
+        options = match.group(5)
+        base = self._stage_path(match.group(3), match.group(4))
+        files = self._stage_files(base)
+
+        listed = re.search(r"FILES\s*=\s*\(([^)]*)\)", options, re.I)
+        if listed:
+            names = {name.strip().strip("'") for name in listed.group(1).split(',')}
+            files = [f for f in files if os.path.relpath(f, base if os.path.isdir(base) else os.path.dirname(base)) in names]
+        pattern = re.search(r"PATTERN\s*=\s*'([^']*)'", options, re.I)
+        if pattern:
+            stage_root = self._stage_path(match.group(3), '')
+            files = [f for f in files if re.fullmatch(pattern.group(1), '/' + os.path.relpath(f, stage_root))]
+
+        file_type = re.search(r'TYPE\s*=\s*(\w+)', options, re.I)
+        file_type = file_type.group(1).upper() if file_type else 'CSV'
+        by_name = re.search(r'MATCH_BY_COLUMN_NAME\s*=\s*CASE_(?:IN)?SENSITIVE', options, re.I)
+        on_error = re.search(r'ON_ERROR\s*=\s*(\w+)', options, re.I)
+        continue_on_error = bool(on_error and on_error.group(1).upper() == 'CONTINUE')
+        if file_type == 'PARQUET' and not by_name:
+            raise ValueError("Unsupported COPY option for the DuckDB backend: TYPE = PARQUET requires "
+                             "MATCH_BY_COLUMN_NAME = CASE_INSENSITIVE or CASE_SENSITIVE")
+
+        db = self.db
+        qualified = f'"{schema}"."{table}"'
+        table_columns = [row[0] for row in db.execute(
+            'SELECT column_name FROM duckdb_columns() WHERE upper(schema_name) = ? AND upper(table_name) = ? ORDER BY column_index',
+            [schema, table]
+        ).fetchall()]
+        rows = []
+        for path in files:
+            source = "read_parquet(?)" if file_type == 'PARQUET' else "read_csv(?, header = true)"
+            try:
+                if by_name:
+                    file_columns = {c.upper(): c for c in db.execute(f'DESCRIBE SELECT * FROM {source}', [path]).fetchnumpy()['column_name']}
+                    matched = [c for c in table_columns if c.upper() in file_columns]
+                    select = ', '.join(f'"{file_columns[c.upper()]}" AS "{c}"' for c in matched)
+                    loaded = db.execute(
+                        f'INSERT INTO {qualified} ({_quoted(matched)}) SELECT {select} FROM {source}',
+                        [path]
+                    ).fetchone()[0]
+                else:
+                    target = f' ({_quoted(columns)})' if columns else ''
+                    loaded = db.execute(f'INSERT INTO {qualified}{target} SELECT * FROM {source}', [path]).fetchone()[0]
+                rows.append((os.path.basename(path), 'LOADED', loaded, loaded, 1, 0, None, None, None, None))
+            except duckdb.Error as e:
+                if not continue_on_error:
+                    raise
+                rows.append((os.path.basename(path), 'LOAD_FAILED', 0, 0, 1, 1, str(e), None, None, None))
+        self.conn.touch(schema, table)
+        self._set_rows(rows, ['file', 'status', 'rows_parsed', 'rows_loaded', 'error_limit', 'errors_seen',
+                              'first_error', 'first_error_line', 'first_error_character', 'first_error_column_name'])
+        return True
+
+    def _create_like(self, statement):
+        match = CREATE_LIKE_RE.match(statement)
+        if not match:
+            return False
+        schema, table = _split_name(match.group(1), self.conn.schema)
+        like_schema, like_table = _split_name(match.group(2), self.conn.schema)
+        qualified = f'"{schema}"."{table}"'
+        self.db.execute(f'CREATE OR REPLACE TABLE {qualified} AS SELECT * FROM "{like_schema}"."{like_table}" LIMIT 0')
+        if re.search(r'\bTEMPORARY\b', statement, re.I):
+            self.conn.register_temp_table(schema, table)
+        self._set_rows([(f'Table {table} successfully created.',)], ['status'])
+        return True
+
+    def _show_tables(self, statement):
+        match = SHOW_TABLES_RE.match(statement)
+        if not match:
+            return False
+        schema = _split_name(match.group(1), self.conn.schema)[1]
+        tables = self.db.execute(
+            f'SELECT TABLE_NAME, ROW_COUNT FROM "{INTERNAL_SCHEMA}".TABLES WHERE TABLE_SCHEMA = ? ORDER BY TABLE_NAME',
+            [schema]
+        ).fetchall()
+        self._set_rows([(None, name, None, schema, 'TABLE', '', '', rows) for name, rows in tables],
+                       ['created_on', 'name', 'database_name', 'schema_name', 'kind', 'comment', 'cluster_by', 'rows'])
+        return True
+
+    def fetchone(self):
+        if self._rows is not None:
+            return self._rows.pop(0) if self._rows else None
+        return self._result.fetchone() if self._result else None
+
+    def fetchall(self):
+        if self._rows is not None:
+            rows, self._rows = self._rows, []
+            return rows
+        return self._result.fetchall() if self._result else []
+
+    def fetch_pandas_all(self):
+        return self._result.df()
+
+    def fetch_arrow_batches(self, rows_per_batch=100000):
+        import pyarrow as pa
+        reader = self._result.to_arrow_reader(rows_per_batch) if hasattr(self._result, 'to_arrow_reader') \
+            else self._result.fetch_record_batch(rows_per_batch)
+        for batch in reader:
+            yield pa.Table.from_batches([batch])
+
+    def close(self):
+        self._result = None
+        self._rows = None
+        self.db.close()
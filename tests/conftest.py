@@ -0,0 +1,5 @@
+import os
+import sys
+
+# The scripts import their helpers as `utils.*`, with scripts/ on sys.path
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), 'scripts'))
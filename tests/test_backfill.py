@@ -0,0 +1,33 @@
+"""Window grid planned by backfill_coindesk.plan_windows."""
+
+import pytest
+
+from backfill_coindesk import MAX_LIMIT, plan_windows
+
+HOUR = 3600
+
+
+def covered(windows, interval):
+    """Timestamps the planned requests return (limit=n gives n+1 points)."""
+    return {to_ts - i * interval for to_ts, limit in windows for i in range(limit + 1)}
+
+
+@pytest.mark.parametrize('start,end', [
+    (0, 2001 * HOUR),
+    (0, 2000 * HOUR),
+    (0, 4001 * HOUR + 1800),
+    (5 * HOUR, 5 * HOUR),
+    (0, 10 * HOUR),
+])
+def test_windows_cover_range(start, end):
+    windows = plan_windows(start, end, HOUR)
+    assert all(1 <= limit <= MAX_LIMIT for _, limit in windows)
+    assert [to_ts for to_ts, _ in windows] == sorted((to_ts for to_ts, _ in windows), reverse=True)
+    wanted = set(range(start, end // HOUR * HOUR + 1, HOUR))
+    assert wanted <= covered(windows, HOUR)
+    # At most the one extra point from a clamped trailing window
+    assert len(covered(windows, HOUR) - wanted) <= 1
+
+
+def test_lone_trailing_point_uses_limit_one():
+    assert plan_windows(0, 2001 * HOUR, HOUR) == [(2001 * HOUR, MAX_LIMIT), (0, 1)]
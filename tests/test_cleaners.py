@@ -0,0 +1,118 @@
+"""
+Parity of the memoized scalar cleaners, the vectorized Series cleaners and the
+compiled NewHedge schema path with the original (pre-memoization) scalar cleaner.
+"""
+
+import math
+import re
+
+import pandas as pd
+import pytest
+
+from utils.newhedge_schema import clean_column
+from utils.utils import (
+    _clean_numeric_text, clean_integer_series, clean_integer_value, clean_numeric_series,
+    clean_numeric_value, clean_percentage, clean_percentage_series
+)
+
+
+def reference_clean_numeric_value(value):
+    """clean_numeric_value as it was before memoization, kept verbatim as the baseline."""
+    if value is None or value == '':
+        return None
+
+    try:
+        cleaned = str(value).strip()
+        cleaned = re.sub(r'[$€£¥,]', '', cleaned)
+
+        is_percentage = '%' in cleaned
+        cleaned = cleaned.replace('%', '')
+
+        multiplier = 1
+        if 'T' in cleaned and 'BTC' not in cleaned:
+            multiplier = 1_000_000_000_000
+            cleaned = cleaned.replace('T', '')
+        elif 'B' in cleaned and 'BTC' not in cleaned:
+            multiplier = 1_000_000_000
+            cleaned = cleaned.replace('B', '')
+        elif 'M' in cleaned:
+            multiplier = 1_000_000
+            cleaned = cleaned.replace('M', '')
+        elif 'K' in cleaned:
+            multiplier = 1_000
+            cleaned = cleaned.replace('K', '')
+
+        if 'EH/s' in cleaned:
+            cleaned = cleaned.replace('EH/s', '').strip()
+
+        cleaned = re.sub(r'[^\d.\-]', '', cleaned)
+
+        if not cleaned or cleaned == '.':
+            return None
+
+        result = float(cleaned) * multiplier
+        return result
+    except (ValueError, AttributeError):
+        return None
+
+
+def reference_clean_integer_value(value):
+    numeric = reference_clean_numeric_value(value)
+    return int(numeric) if numeric is not None else None
+
+
+INPUTS = [
+    None, float('nan'), '', ' ', '-', '—', '.', '1,234', '$1.2K', '3.4M', '5B', '2.1T', '12%', '-0.5%',
+    '(1.5)', '€1,000.50', '£3', '¥7', '650 EH/s', '19.8M BTC', '1.2K BTC', '0', '42', 42, 3.5, -7,
+    'N/A', 'abc', '1.2.3', '1-2', '--', '$', '%', 'KMB', '  12.5  ', '1e5',
+]
+
+
+def same(actual, expected):
+    """None and NaN both mean missing."""
+    if expected is None:
+        return actual is None or (isinstance(actual, float) and math.isnan(actual)) or actual is pd.NA
+    return actual == expected
+
+
+@pytest.mark.parametrize('value', INPUTS, ids=repr)
+def test_scalar_matches_reference(value):
+    assert same(clean_numeric_value(value), reference_clean_numeric_value(value))
+    assert same(clean_percentage(value), reference_clean_numeric_value(value))
+    assert same(clean_integer_value(value), reference_clean_integer_value(value))
+
+
+def test_memoized_repeat_calls_match_reference():
+    _clean_numeric_text.cache_clear()
+    for _ in range(3):
+        for value in INPUTS:
+            assert same(clean_numeric_value(value), reference_clean_numeric_value(value))
+    assert _clean_numeric_text.cache_info().hits > 0
+
+
+def test_series_matches_reference():
+    values = pd.Series(INPUTS * 2, dtype=object)
+    expected = [reference_clean_numeric_value(value) for value in values]
+    for actual, value in zip(clean_numeric_series(values), expected):
+        assert same(actual, value)
+    for actual, value in zip(clean_percentage_series(values), expected):
+        assert same(actual, value)
+    for actual, value in zip(clean_integer_series(values), [reference_clean_integer_value(v) for v in values]):
+        assert same(actual, value)
+
+
+def test_series_accepts_lists_and_all_missing():
+    assert clean_numeric_series(['1,234', None]).tolist()[0] == 1234.0
+    assert clean_numeric_series([None, float('nan')]).isna().all()
+    assert clean_integer_series([]).empty
+
+
+@pytest.mark.parametrize('cleaner,reference', [
+    ('numeric', reference_clean_numeric_value),
+    ('percentage', reference_clean_numeric_value),
+    ('integer', reference_clean_integer_value),
+])
+def test_schema_columns_match_reference(cleaner, reference):
+    values = INPUTS * 2
+    for actual, value in zip(clean_column(values, cleaner), values):
+        assert same(actual, reference(value))
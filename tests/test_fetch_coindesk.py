@@ -0,0 +1,50 @@
+"""Snapshot fingerprinting in fetch_coindesk.process_and_save."""
+
+import pandas as pd
+import pytest
+
+import fetch_coindesk
+from utils.state import StateStore
+
+
+@pytest.fixture
+def saved(monkeypatch):
+    """Replaces the warehouse step; records the keys that were saved."""
+    keys = []
+    monkeypatch.setattr(fetch_coindesk, 'parse_payload',
+                        lambda key, data: (pd.DataFrame(data), None))
+    monkeypatch.setattr(fetch_coindesk, 'save_dataset',
+                        lambda key, df, unique_key, session, state: keys.append(key) or True)
+    return keys
+
+
+def test_unchanged_snapshot_leaves_state_file_untouched(tmp_path, saved):
+    state = StateStore(str(tmp_path / '_state.json'))
+    heartbeat = StateStore(str(tmp_path / '_heartbeat.json'))
+    payload = {'PRICE': [100.0], 'FETCHED_AT': ['2026-01-01T00:00:00+00:00']}
+
+    fetch_coindesk.process_and_save('pricemultifull', payload, None, state, heartbeat)
+    state.save()
+    committed = (tmp_path / '_state.json').read_text()
+
+    # Same content, new fetch time: skipped, only the heartbeat moves
+    for run in range(2):
+        fetch_coindesk.process_and_save('pricemultifull', {**payload, 'FETCHED_AT': [f'2026-01-0{run + 2}']},
+                                        None, state, heartbeat)
+        state.save()
+    assert saved == ['pricemultifull']
+    assert (tmp_path / '_state.json').read_text() == committed
+    assert heartbeat.get('pricemultifull', 'unchanged_runs') == 2
+
+    fetch_coindesk.process_and_save('pricemultifull', {**payload, 'PRICE': [101.0]}, None, state, heartbeat)
+    assert saved == ['pricemultifull', 'pricemultifull']
+    assert heartbeat.get('pricemultifull', 'unchanged_runs') == 0
+
+
+def test_old_heartbeat_fields_are_dropped_on_change(tmp_path, saved):
+    state = StateStore(str(tmp_path / '_state.json'))
+    state.update('tradingsignals', fingerprint='old', checked_at='2025-01-01', unchanged_runs=7)
+    fetch_coindesk.process_and_save('tradingsignals', {'VALUE': [1.0]}, None, state)
+    entry = state.get('tradingsignals')
+    assert 'checked_at' not in entry and 'unchanged_runs' not in entry
+    assert entry['fingerprint'] != 'old'
@@ -0,0 +1,56 @@
+"""Tier bookkeeping of the NewHedge fetch (plain HTTP first, Firecrawl for missing sections)."""
+
+from datetime import datetime, timedelta, timezone
+
+import pytest
+
+pytest.importorskip('bs4')
+
+from fetch_newhedge import REQUIRED_ANCHORS, TIER_RECHECK_HOURS, needs_escalation, record_tiers
+from utils.state import StateStore
+
+ORDER = ['http', 'firecrawl']
+NOW = datetime(2026, 1, 1, tzinfo=timezone.utc)
+
+
+def page(**values):
+    """raw_data with the dashboard anchors present, plus the given metrics."""
+    return {**{key: '1' for key in REQUIRED_ANCHORS}, **values}
+
+
+@pytest.fixture
+def tiers(tmp_path):
+    return StateStore(str(tmp_path / '_tiers.json'))
+
+
+def test_missing_anchor_always_escalates(tiers):
+    assert needs_escalation({'MARKET_CAP': None, 'BTC_DOMINANCE': '1'}, {}, tiers, NOW)
+
+
+def test_missing_only_recorded_when_every_tier_ran(tiers):
+    record_tiers(tiers, {'HASHRATE': 'firecrawl'}, {'http': None, 'firecrawl': None}, ORDER, NOW)
+
+    # Firecrawl failed: the section keeps the tier that served it and keeps escalating
+    record_tiers(tiers, {'HASHRATE': 'missing'}, {'http': None}, ORDER, NOW)
+    assert tiers.get('HASHRATE', 'tier') == 'firecrawl'
+    assert needs_escalation(page(HASHRATE=None), {}, tiers, NOW)
+
+    # Both tiers returned a page without it: no more escalation for a while
+    record_tiers(tiers, {'HASHRATE': 'missing'}, {'http': None, 'firecrawl': None}, ORDER, NOW)
+    assert tiers.get('HASHRATE', 'tier') == 'missing'
+    assert not needs_escalation(page(HASHRATE=None), {}, tiers, NOW + timedelta(hours=1))
+
+
+def test_missing_sections_are_reprobed(tiers):
+    record_tiers(tiers, {'ETF_FLOWS': 'missing'}, {'http': None, 'firecrawl': None}, ORDER, NOW)
+    later = NOW + timedelta(hours=TIER_RECHECK_HOURS + 1)
+    assert needs_escalation(page(), {'ETF_FLOWS': []}, tiers, later)
+
+    # A skipped render (nothing needed it) does not refresh the miss
+    record_tiers(tiers, {'ETF_FLOWS': 'missing'}, {'http': None}, ORDER, later)
+    assert tiers.get('ETF_FLOWS', 'checked_at') == NOW.isoformat()
+
+
+def test_entries_without_check_time_escalate(tiers):
+    tiers.update('HASHRATE', tier='missing')  # written before checked_at existed
+    assert needs_escalation(page(HASHRATE=None), {}, tiers, NOW)
@@ -0,0 +1,65 @@
+"""Detection of CryptoCompare's HTTP 200 rate-limit answers and the circuit breaker."""
+
+import time
+
+import pytest
+import requests
+
+from utils.http_client import CircuitBreaker, CircuitOpenError, _is_rate_limited
+
+
+def response(body, status=200):
+    r = requests.Response()
+    r.status_code = status
+    r._content = body
+    return r
+
+
+@pytest.mark.parametrize('body', [
+    b'{"Response":"Error","Message":"You are over your rate limit please upgrade your account!"}',
+    b'{"Response": "Error", "Message": "Rate limit excedeed!"}',
+    b'{\n  "Response" : "Error",\n  "Message": "You are over your rate limit"\n}',
+])
+def test_error_bodies_are_rate_limited(body):
+    assert _is_rate_limited(response(body))
+
+
+@pytest.mark.parametrize('body,status', [
+    (b'{"Response": "Success", "Message": "no rate limit here"}', 200),
+    (b'{"Response": "Error", "Message": "fsym param is empty or null."}', 200),
+    (b'', 429),
+])
+def test_other_responses(body, status):
+    assert _is_rate_limited(response(body, status)) == (status == 429)
+
+
+def half_open_breaker():
+    breaker = CircuitBreaker(failure_threshold=2, reset_timeout=0.05)
+    breaker.record_failure('api/x')
+    breaker.record_failure('api/x')
+    with pytest.raises(CircuitOpenError):
+        breaker.before_call('api/x')
+    time.sleep(0.06)
+    return breaker
+
+
+def test_half_open_lets_one_trial_through():
+    breaker = half_open_breaker()
+    breaker.before_call('api/x')
+    with pytest.raises(CircuitOpenError):
+        breaker.before_call('api/x')
+    breaker.before_call('api/y')
+
+    breaker.record_success('api/x')
+    breaker.before_call('api/x')
+    breaker.before_call('api/x')
+
+
+def test_failed_trial_reopens_circuit():
+    breaker = half_open_breaker()
+    breaker.before_call('api/x')
+    breaker.record_failure('api/x')
+    with pytest.raises(CircuitOpenError):
+        breaker.before_call('api/x')
+    time.sleep(0.06)
+    breaker.before_call('api/x')
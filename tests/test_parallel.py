@@ -0,0 +1,33 @@
+"""Ordering and chunking of the process-pool helpers."""
+
+import multiprocessing
+
+import pytest
+
+from utils import parallel
+from utils.parallel import chunked, map_chunks, map_ordered
+
+
+def square(x):
+    return x * x
+
+
+def squares(chunk):
+    return [x * x for x in chunk]
+
+
+def test_chunked():
+    assert list(chunked(range(5), 2)) == [[0, 1], [2, 3], [4]]
+    assert list(chunked([], 3)) == []
+
+
+@pytest.mark.parametrize('workers', [1, 2])
+def test_results_keep_input_order(workers):
+    assert list(map_ordered(square, range(20), workers)) == [x * x for x in range(20)]
+    assert list(map_chunks(squares, range(20), workers, chunk_size=3)) == [x * x for x in range(20)]
+
+
+def test_spawn_when_fork_is_unavailable(monkeypatch):
+    monkeypatch.setattr(multiprocessing, 'get_all_start_methods', lambda: ['spawn'])
+    assert parallel.pool_context().get_start_method() == 'spawn'
+    assert list(map_ordered(square, range(6), 2)) == [x * x for x in range(6)]
@@ -0,0 +1,30 @@
+"""StateStore bookkeeping under the backfill's worker threads."""
+
+import threading
+
+from utils.state import StateStore
+
+
+def test_add_to_set_from_threads_loses_nothing(tmp_path):
+    store = StateStore(str(tmp_path / 'checkpoint.json'))
+
+    def worker(offset):
+        for to_ts in range(offset, offset + 200):
+            store.add_to_set('histoday', 'done', to_ts)
+            store.save()
+
+    threads = [threading.Thread(target=worker, args=(i * 1000,)) for i in range(8)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+
+    done = StateStore(store.path).get('histoday', 'done')
+    assert done == sorted(i * 1000 + j for i in range(8) for j in range(200))
+
+
+def test_add_to_set_ignores_duplicates():
+    store = StateStore('/nonexistent/state.json')
+    for to_ts in (3, 1, 3, 2):
+        store.add_to_set('histohour', 'done', to_ts)
+    assert store.get('histohour', 'done') == [1, 2, 3]
@@ -0,0 +1,220 @@
+"""
+The DuckDB warehouse backend against an in-memory database: translated
+migrations, the emulated Snowflake statements, and the coindesk / NewHedge
+load and export paths that run on top of them.
+"""
+
+import os
+
+import pandas as pd
+import pytest
+
+duckdb = pytest.importorskip('duckdb')
+pytest.importorskip('pyarrow')
+
+import fetch_coindesk
+import load_newhedge_to_snowflake as newhedge_loader
+from utils.snowflake_session import SnowflakeSession
+from utils.state import StateStore
+from utils.storage import write_partition
+from utils.warehouse import DuckDBConnection, connect, translate_migration
+
+
+@pytest.fixture
+def conn(monkeypatch):
+    monkeypatch.setenv('WAREHOUSE_BACKEND', 'duckdb')
+    monkeypatch.setenv('DUCKDB_PATH', ':memory:')
+    conn = connect('COINDESK')
+    yield conn
+    conn.close()
+
+
+def rows(conn, sql, params=None):
+    cursor = conn.cursor()
+    cursor.execute(sql, params)
+    return cursor.fetchall()
+
+
+def column_types(conn, schema, table):
+    return dict(rows(conn, 'SELECT COLUMN_NAME, DATA_TYPE FROM INFORMATION_SCHEMA.COLUMNS '
+                           'WHERE TABLE_SCHEMA = %s AND TABLE_NAME = %s', (schema, table)))
+
+
+def test_translate_migration_types():
+    statements = translate_migration("""
+CREATE SCHEMA IF NOT EXISTS DEMO;
+CREATE OR REPLACE TABLE DEMO.T (
+    A NUMBER(38,0),
+    B NUMBER,
+    C NUMBER(10,2),
+    D FLOAT,
+    E TIMESTAMP_TZ DEFAULT CURRENT_TIMESTAMP(),
+    F STRING,
+    G VARIANT,
+    PRIMARY KEY (A)
+);
+ALTER TABLE DEMO.T ADD COLUMN H NUMBER;
+""")
+    assert statements[0] == 'CREATE SCHEMA IF NOT EXISTS "DEMO"'
+    assert 'PRIMARY KEY' not in statements[1]
+    for expected in ('A BIGINT', 'B BIGINT', 'C DECIMAL(10,2)', 'D DOUBLE', 'E TIMESTAMPTZ DEFAULT CURRENT_TIMESTAMP',
+                     'F VARCHAR', 'G VARCHAR'):
+        assert expected in statements[1]
+    assert statements[2] == 'ALTER TABLE "DEMO"."T" ADD COLUMN H BIGINT'
+
+
+def test_migrated_column_types(conn):
+    balance = column_types(conn, 'COINDESK', 'BLOCKCHAIN_BALANCEDISTRIBUTION')
+    assert 'MERGE_KEY' not in balance  # dropped by V1.1.5
+    assert balance['TIME'] == balance['ID'] == balance['ADDRESSESCOUNT'] == 'BIGINT'
+    assert balance['FROM'] == balance['TOTALVOLUME'] == 'DOUBLE'
+    assert column_types(conn, 'COINDESK', 'PRICEMULTIFULL')['FETCHED_AT'] == 'TIMESTAMP WITH TIME ZONE'
+    assert column_types(conn, 'COINDESK', 'NEWS')['UPVOTES'] == 'BIGINT'
+    assert column_types(conn, 'NEWHEDGE', 'NODE_METRICS')['TIMESTAMP'] == 'TIMESTAMP WITH TIME ZONE'
+
+
+def test_merge_with_qualified_set_targets(conn):
+    conn.write_pandas(pd.DataFrame({'TIME': [1, 2], 'OPEN': [1.0, 2.0]}), 'HISTODAY', schema='COINDESK')
+    conn.write_pandas(pd.DataFrame({'TIME': [2, 3], 'OPEN': [20.0, 3.0]}), 'SRC', schema='PUBLIC',
+                      auto_create_table=True, table_type='TEMPORARY')
+    rows(conn, """
+        MERGE INTO COINDESK.HISTODAY t USING PUBLIC.SRC s ON t."TIME" = s."TIME"
+        WHEN MATCHED THEN UPDATE SET t."OPEN" = s."OPEN"
+        WHEN NOT MATCHED THEN INSERT ("TIME", "OPEN") VALUES (s."TIME", s."OPEN")
+    """)
+    assert rows(conn, 'SELECT "TIME", "OPEN" FROM COINDESK.HISTODAY ORDER BY 1') == [(1, 1.0), (2, 20.0), (3, 3.0)]
+
+
+def test_temporary_tables_are_hidden_and_dropped(tmp_path):
+    conn = DuckDBConnection(str(tmp_path / 'warehouse.duckdb'), schema='COINDESK')
+    rows(conn, 'CREATE TEMPORARY TABLE COINDESK.HISTODAY_STAGE LIKE COINDESK.HISTODAY')
+    listed = rows(conn, "SELECT TABLE_NAME FROM INFORMATION_SCHEMA.TABLES WHERE TABLE_SCHEMA = 'COINDESK'")
+    assert ('HISTODAY_STAGE',) not in listed and ('HISTODAY',) in listed
+    assert rows(conn, 'SELECT COUNT(*) FROM COINDESK.HISTODAY_STAGE') == [(0,)]
+    conn.close()
+
+    reopened = DuckDBConnection(str(tmp_path / 'warehouse.duckdb'), schema='COINDESK')
+    with pytest.raises(duckdb.Error):
+        rows(reopened, 'SELECT COUNT(*) FROM COINDESK.HISTODAY_STAGE')
+    reopened.close()
+
+
+def test_copy_files_pattern_and_match_by_column_name(conn, tmp_path):
+    for name, times in (('a', [1]), ('b', [2]), ('c', [3])):
+        pd.DataFrame({'time': times, 'close': [float(t) for t in times]}).to_parquet(tmp_path / f'{name}.parquet')
+    pd.DataFrame({'TIME': [4], 'OPEN': [1.0], 'HIGH': [1.0], 'LOW': [1.0], 'CLOSE': [4.0], 'VOLUME': [1.0]}) \
+        .to_csv(tmp_path / 'd.csv', index=False)
+    rows(conn, 'CREATE TEMPORARY STAGE IF NOT EXISTS TEST_STAGE')
+    rows(conn, f"PUT 'file://{tmp_path}/*' @TEST_STAGE/load/")
+
+    match = 'MATCH_BY_COLUMN_NAME = CASE_INSENSITIVE'
+    rows(conn, f"COPY INTO COINDESK.HISTODAY FROM @TEST_STAGE/load/ FILES = ('a.parquet') "
+               f"FILE_FORMAT = (TYPE = PARQUET) {match}")
+    rows(conn, f"COPY INTO COINDESK.HISTODAY FROM @TEST_STAGE PATTERN = '.*/c[.]parquet' "
+               f"FILE_FORMAT = (TYPE = PARQUET) {match}")
+    rows(conn, "COPY INTO COINDESK.HISTODAY FROM @TEST_STAGE/load/d.csv FILE_FORMAT = (TYPE = CSV SKIP_HEADER = 1)")
+    assert rows(conn, 'SELECT "TIME", "CLOSE" FROM COINDESK.HISTODAY ORDER BY 1') == [(1, 1.0), (3, 3.0), (4, 4.0)]
+
+    with pytest.raises(ValueError, match='MATCH_BY_COLUMN_NAME'):
+        rows(conn, "COPY INTO COINDESK.HISTODAY FROM @TEST_STAGE/load/ FILE_FORMAT = (TYPE = PARQUET)")
+
+
+def test_hash_agg_ignores_order_and_tracks_content(conn):
+    def hash_below(mark):
+        return rows(conn, 'SELECT HASH_AGG(*) FROM (SELECT DISTINCT * FROM COINDESK.HISTODAY WHERE "TIME" < %s)',
+                    (mark,))[0][0]
+
+    assert hash_below(10) == 0
+    conn.write_pandas(pd.DataFrame({'TIME': [2, 1], 'CLOSE': [2.0, 1.0]}), 'HISTODAY', schema='COINDESK')
+    first = hash_below(10)
+    rows(conn, 'DELETE FROM COINDESK.HISTODAY')
+    conn.write_pandas(pd.DataFrame({'TIME': [1, 2], 'CLOSE': [1.0, 2.0]}), 'HISTODAY', schema='COINDESK')
+    assert hash_below(10) == first
+    rows(conn, 'UPDATE COINDESK.HISTODAY SET "CLOSE" = 5 WHERE "TIME" = 1')
+    assert hash_below(10) != first
+
+
+def histoday(times, close):
+    return pd.DataFrame({'time': times, 'open': 1.0, 'high': 1.0, 'low': 1.0, 'close': close, 'volume': 1.0})
+
+
+def test_coindesk_append_merge_and_incremental_export(conn, tmp_path):
+    session = SnowflakeSession(lambda: conn)
+    state = StateStore(str(tmp_path / '_state.json'))
+    export_path = str(tmp_path / 'histoday.csv')
+
+    def load(df, expected_mode):
+        result, mode = fetch_coindesk.upload_and_fetch_from_snowflake(
+            session, df, 'COINDESK', 'HISTODAY', 'time', export_path, state=state, state_key='histoday'
+        )
+        assert mode == expected_mode
+        result.to_csv(export_path, index=False)
+        return result
+
+    # Empty table: bulk load, full export, boundary recorded FETCH_OVERLAP marks before the newest point
+    first = load(histoday(list(range(10)), 1.0), 'full')
+    assert first['TIME'].tolist() == list(range(10))
+    assert state.get('histoday', 'export_mark') == 9 - fetch_coindesk.FETCH_OVERLAP
+
+    # Second load in the same session: MERGE (updated and new rows, no duplicates), incremental export
+    second = load(histoday([9, 10], 2.0), 'incremental')
+    assert sorted(second['TIME']) == list(range(11))
+    assert second.set_index('TIME')['CLOSE'].to_dict()[9] == 2.0
+    assert rows(conn, 'SELECT COUNT(*) FROM COINDESK.HISTODAY') == [(11,)]
+
+    # A row rewritten below the boundary changes the content hash: full resync picks it up
+    rows(conn, 'UPDATE COINDESK.HISTODAY SET "CLOSE" = 99 WHERE "TIME" = 0')
+    third = load(histoday([11], 3.0), 'full')
+    assert third.set_index('TIME')['CLOSE'].to_dict()[0] == 99.0
+    assert len(third) == 12
+
+
+def test_coindesk_resync_never_shrinks_local_copy(conn, tmp_path):
+    session = SnowflakeSession(lambda: conn)
+    export_path = str(tmp_path / 'histoday.csv')
+    histoday(list(range(5)), 1.0).rename(columns=str.upper).to_csv(export_path, index=False)
+    result = fetch_coindesk.upload_and_fetch_from_snowflake(
+        session, histoday([7], 1.0), 'COINDESK', 'HISTODAY', 'time', export_path
+    )
+    assert result is None
+
+
+def test_coindesk_balance_distribution_keeps_integers(conn, tmp_path, monkeypatch):
+    monkeypatch.setattr(fetch_coindesk, 'OUTPUT_DIR', str(tmp_path))
+    payload = {'Data': {'Data': [{
+        'id': 1, 'symbol': 'BTC', 'partner_symbol': 'BTC', 'time': 86400,
+        'balance_distribution': [{'from': 0, 'to': 0.001, 'totalVolume': 5.5, 'addressesCount': 10}],
+    }]}}
+    fetch_coindesk.process_and_save('blockchain_balancedistribution', payload, SnowflakeSession(lambda: conn),
+                                    StateStore(str(tmp_path / '_state.json')))
+    exported = pd.read_csv(tmp_path / 'blockchain_balancedistribution.csv')
+    assert exported[['TIME', 'ID', 'ADDRESSESCOUNT']].values.tolist() == [[86400, 1, 10]]
+    assert exported['ID'].dtype.kind == 'i'
+
+
+def test_newhedge_load_and_export(conn, tmp_path, monkeypatch):
+    newhedge_dir = tmp_path / 'newhedge'
+    runs_dir = newhedge_dir / '_runs'
+    monkeypatch.setattr(newhedge_loader, 'DATA_DIR', str(tmp_path))
+    monkeypatch.setattr(newhedge_loader, 'NEWHEDGE_DIR', str(newhedge_dir))
+    monkeypatch.setattr(newhedge_loader, 'RUNS_DIR', str(runs_dir))
+    monkeypatch.setattr(newhedge_loader, 'MANIFEST_FILE', str(runs_dir / '_manifest.json'))
+
+    def run(timestamp, nodes):
+        stamp = pd.Timestamp(timestamp, tz='UTC')
+        write_partition(pd.DataFrame({'TIMESTAMP': [stamp], 'TOTAL_NODES': [nodes]}), str(runs_dir), 'node_metrics', stamp)
+
+    run('2025-01-01T00:00:00', 100)
+    run('2025-01-02T00:00:00', 110)
+    newhedge_loader.load_newhedge_data(conn)
+    # Already loaded runs are skipped; a new run is merged next to them
+    run('2025-01-03T00:00:00', 120)
+    newhedge_loader.load_newhedge_data(conn)
+    assert [n for _, n in rows(conn, 'SELECT TIMESTAMP, TOTAL_NODES FROM NEWHEDGE.NODE_METRICS ORDER BY 1')] == [100, 110, 120]
+
+    newhedge_loader.export_snowflake_to_csv(conn)
+    exported = pd.read_csv(tmp_path / 'newhedge_export' / 'node_metrics.csv')
+    assert exported['TOTAL_NODES'].tolist() == [120, 110, 100]
+    state = StateStore(str(tmp_path / 'newhedge_export' / '_export_state.json'))
+    assert state.get('NODE_METRICS', 'rows') == 3
+    assert not os.path.exists(tmp_path / 'newhedge_export' / 'market_data.csv')  # empty tables are not exported